@@ -0,0 +1,534 @@
+import re
+
+import numpy as np
+import pandas as pd
+from scipy import sparse
+
+from pipeline import WEEKDAYS, concat_frames, message_days
+from profiling import profiled
+
+
+def clean_users(users):
+    # Eliminar nulos, IDs numéricos y espacios en blanco
+    return [u for u in users if isinstance(u, str) and not u.strip().isdigit() and len(u.strip()) > 0]
+
+
+def name_index(users):
+    """(token, user id) pairs: every lowercase word of a name points to that user."""
+    # Message words are \w+ runs, so a name token with other characters never matches
+    pairs = [
+        (token, uid)
+        for uid, name in enumerate(users)
+        for token in name.lower().split()
+        if re.fullmatch(r'\w+', token)
+    ]
+    return pd.DataFrame(pairs, columns=['token', 'target'])
+
+
+@profiled('mentions')
+def _mention_hits(df, users):
+    # (day, sender id, target id) of every mention, one row per hit
+    hits = pd.DataFrame({
+        'day': np.array([], dtype='datetime64[us]'),
+        'sender': np.array([], dtype=np.int64),
+        'target': np.array([], dtype=np.int64),
+    })
+    index = name_index(users)
+    if df.empty or index.empty:
+        return hits
+
+    # Only name words are extracted from the messages, never the full vocabulary
+    names = sorted(index['token'].unique(), key=len, reverse=True)
+    pattern = re.compile(r'\b(?:' + '|'.join(map(re.escape, names)) + r')\b')
+    found = df['message'].astype(str).str.lower().str.findall(pattern).reset_index(drop=True)
+    found = found.explode().dropna()
+    found = pd.DataFrame({'msg': found.index, 'token': found.to_numpy()}).drop_duplicates()
+    found = found.merge(index, on='token')
+
+    sender_ids = pd.Series(np.arange(len(users)), index=users)
+    found['sender'] = sender_ids.reindex(df['user'].to_numpy()).to_numpy()[found['msg'].to_numpy()]
+    found = found[found['sender'].notna()]
+    found = found[found['sender'].astype(np.int64) != found['target']]
+    days = df['datetime'].dt.normalize().to_numpy()[found['msg'].to_numpy()]
+    return pd.DataFrame({
+        'day': days,
+        'sender': found['sender'].to_numpy(dtype=np.int64),
+        'target': found['target'].to_numpy(dtype=np.int64),
+    })
+
+
+class MentionCounts:
+    """Who mentions whom, kept per (day, sender, target) so any date range is a slice.
+
+    A message mentions a user once per distinct word of the message that is a
+    word of that user's name; self-mentions and senders outside ``users`` are
+    ignored.
+    """
+
+    def __init__(self, df, users=None, per_day=None):
+        if users is None:
+            users = clean_users(df['user'].dropna().unique().tolist())
+        self.users = list(users)
+        if per_day is None:
+            hits = _mention_hits(df, self.users)
+            per_day = hits.groupby(['day', 'sender', 'target']).size().rename('mentions').reset_index()
+        self.per_day = per_day.sort_values('day', kind='stable').reset_index(drop=True)
+        self._days = self.per_day['day'].to_numpy()
+
+    def append(self, tail):
+        """Counts with the tail messages added; None if the tail adds users."""
+        if set(clean_users(tail['user'].dropna().unique().tolist())) - set(self.users):
+            # Earlier messages may mention the new user: only a full rebuild is exact
+            return None
+        added = MentionCounts(tail, self.users)
+        per_day = (
+            pd.concat([self.per_day, added.per_day], ignore_index=True)
+            .groupby(['day', 'sender', 'target'])['mentions'].sum()
+            .reset_index()
+        )
+        return MentionCounts(None, self.users, per_day)
+
+    def _slice(self, start=None, end=None):
+        lo, hi = day_bounds(self._days, start, end)
+        return self.per_day.iloc[lo:hi]
+
+    def matrix(self, start=None, end=None):
+        """Sender x target DataFrame of mention counts for days in [start, end]."""
+        rows = self._slice(start, end)
+        n = len(self.users)
+        flat = np.bincount(
+            rows['sender'].to_numpy() * n + rows['target'].to_numpy(),
+            weights=rows['mentions'].to_numpy(), minlength=n * n,
+        ).astype(np.int64)
+        return pd.DataFrame(flat.reshape(n, n), index=self.users, columns=self.users)
+
+    def per_period(self, period='M', start=None, end=None):
+        """Mentions per period with columns period, sender, target, mentions."""
+        rows = self._slice(start, end)
+        names = np.asarray(self.users, dtype=object)
+        return (
+            pd.DataFrame({
+                'period': pd.DatetimeIndex(rows['day']).to_period(period),
+                'sender': names[rows['sender'].to_numpy()],
+                'target': names[rows['target'].to_numpy()],
+                'mentions': rows['mentions'].to_numpy(),
+            })
+            .groupby(['period', 'sender', 'target'])['mentions'].sum()
+            .reset_index()
+        )
+
+
+def _count_matrix(rows, cols, shape, data=None):
+    data = np.ones(len(rows), dtype=np.int32) if data is None else data
+    return sparse.csr_matrix((data, (rows, cols)), shape=shape)
+
+
+def day_bounds(days, start=None, end=None):
+    """[lo, hi) positions of the calendar days start..end (inclusive) in a sorted datetime64 array."""
+    lo = 0 if start is None else int(np.searchsorted(days, np.datetime64(pd.Timestamp(start).normalize()), 'left'))
+    hi = len(days) if end is None else int(np.searchsorted(days, np.datetime64(pd.Timestamp(end).normalize()), 'right'))
+    return lo, max(lo, hi)
+
+
+class DateRangeIndex:
+    """Row positions and prefix sums over a frame sorted by datetime.
+
+    bounds() turns a calendar-day range into [lo, hi) row positions with two
+    binary searches, so the filtered frame is just df.iloc[lo:hi]; totals()
+    sums the per-message counters over those rows in constant time.
+    """
+
+    COUNTERS = {'words': 'num_words', 'media': 'has_media', 'links': 'num_links'}
+
+    def __init__(self, df):
+        self.datetimes = df['datetime'].to_numpy()
+        self._prefix = {
+            name: np.concatenate([[0], np.cumsum(df[col].to_numpy(dtype=np.int64))])
+            for name, col in self.COUNTERS.items()
+        }
+
+    def append(self, tail):
+        index = DateRangeIndex.__new__(DateRangeIndex)
+        index.datetimes = np.concatenate([self.datetimes, tail['datetime'].to_numpy()])
+        index._prefix = {
+            name: np.concatenate([prefix, prefix[-1] + np.cumsum(tail[self.COUNTERS[name]].to_numpy(dtype=np.int64))])
+            for name, prefix in self._prefix.items()
+        }
+        return index
+
+    def bounds(self, start=None, end=None):
+        """[lo, hi) rows of the messages sent on calendar days start..end (inclusive)."""
+        lo = 0 if start is None else int(np.searchsorted(
+            self.datetimes, np.datetime64(pd.Timestamp(start).normalize()), 'left'))
+        hi = len(self.datetimes) if end is None else int(np.searchsorted(
+            self.datetimes, np.datetime64(pd.Timestamp(end).normalize() + pd.Timedelta(days=1)), 'left'))
+        return lo, max(lo, hi)
+
+    def totals(self, lo, hi):
+        """Messages, words, media and links in rows [lo, hi)."""
+        return {'messages': hi - lo, **{name: int(p[hi] - p[lo]) for name, p in self._prefix.items()}}
+
+
+class ActivityCube:
+    """Messages, words, links, media and sentiment summed per (day, hour, user).
+
+    The cells are sorted by day, so a date range is a slice, and every count
+    tabs 1-3 show (per day, hour, user, weekday, month or pairs of them) is a
+    groupby over the cells instead of over the messages.
+    """
+
+    MEASURES = {'messages': 'user', 'words': 'num_words', 'links': 'num_links', 'media': 'has_media',
+                'sentiment': 'sentiment'}
+    KEYS = ['day', 'hour', 'user']
+
+    def __init__(self, df, cells=None):
+        if cells is None:
+            cells = self._cells(df)
+        self.cells = cells
+        self._days = cells['day'].to_numpy()
+
+    @classmethod
+    def _cells(cls, df):
+        frame = pd.DataFrame({'day': message_days(df), **{key: df[key] for key in cls.KEYS[1:]}})
+        for name, col in cls.MEASURES.items():
+            frame[name] = 1 if name == 'messages' else df[col].to_numpy(dtype=np.float64 if name == 'sentiment' else np.int64)
+        return frame.groupby(cls.KEYS, observed=True, sort=True).sum().reset_index()
+
+    def append(self, tail):
+        """Cube with the tail messages added; only cells of the tail's days are regrouped."""
+        added = self._cells(tail)
+        if added.empty:
+            return self
+        split = int(np.searchsorted(self._days, added['day'].to_numpy()[0], 'left'))
+        overlap = concat_frames([self.cells.iloc[split:], added])
+        overlap = overlap.groupby(self.KEYS, observed=True, sort=True).sum().reset_index()
+        return type(self)(None, concat_frames([self.cells.iloc[:split], overlap]))
+
+    def without(self, users):
+        """Cube without the cells of the given users (e.g. to leave out your own messages)."""
+        return type(self)(None, self.cells[~self.cells['user'].isin(users)].reset_index(drop=True))
+
+    def _key(self, cells, key):
+        if key == 'weekday':
+            return pd.Series(pd.Categorical.from_codes(cells['day'].dt.dayofweek, WEEKDAYS), index=cells.index,
+                             name='weekday')
+        if key == 'month':
+            return cells['day'].dt.to_period('M').rename('month')
+        return cells[key]
+
+    def reduce(self, by, measure='messages', start=None, end=None):
+        """measure summed per key(s) for days in [start, end].
+
+        by is one of day, hour, user, weekday, month or a list of them; only
+        keys with messages are returned.
+        """
+        lo, hi = day_bounds(self._days, start, end)
+        cells = self.cells.iloc[lo:hi]
+        keys = [self._key(cells, k) for k in ([by] if isinstance(by, str) else by)]
+        return cells.groupby(keys, observed=True, sort=True)[measure].sum()
+
+    def mean(self, by, measure, start=None, end=None):
+        """Per-message mean of measure per key(s), e.g. words per message per user."""
+        return self.reduce(by, measure, start, end) / self.reduce(by, 'messages', start, end)
+
+
+class ToneCube(ActivityCube):
+    """Messages and sentiment summed per (day, user, tone), without the 'other' tone."""
+
+    MEASURES = {'messages': 'user', 'sentiment': 'sentiment'}
+    KEYS = ['day', 'user', 'tone']
+
+    @classmethod
+    def _cells(cls, df):
+        return super()._cells(df[df['tone'] != 'other'])
+
+
+class ItemCounts:
+    """Sparse counts of items (words, emojis) found in messages, per (day, user) cell.
+
+    msg_ids are row positions in df and items the matching labels. Cells are
+    sorted by day, so any date range is a contiguous block of rows and per-user
+    or per-item totals for it are one sparse reduction. Items are kept sorted;
+    users keep their order of appearance. A column-major copy, built on the
+    first lookup of one item, serves item_column in time proportional to that
+    item's cells.
+    """
+
+    def __init__(self, df, msg_ids, items):
+        item_codes, items = pd.factorize(pd.Series(items, dtype=object), sort=True)
+        self.items = pd.Index(items, dtype=object)
+        user_codes, users = pd.factorize(df['user'].astype(str))
+        self.users = pd.Index(users, dtype=object)
+        day_codes, days = pd.factorize(df['datetime'].dt.normalize().to_numpy(), sort=True)
+
+        n_users = max(len(self.users), 1)
+        cell_codes, cell_keys = pd.factorize(day_codes * n_users + user_codes, sort=True)
+        self.cell_days = np.asarray(days)[cell_keys // n_users]
+        self.cell_users = cell_keys % n_users
+        self.cell_messages = np.bincount(cell_codes, minlength=len(cell_keys))
+
+        msg_ids = np.asarray(msg_ids, dtype=np.int64)
+        self.cell_items = _count_matrix(cell_codes[msg_ids], item_codes, (len(cell_keys), len(self.items)))
+        self.totals = np.asarray(self.cell_items.sum(axis=0)).ravel()
+        self._by_item = None
+
+    def append(self, tail, msg_ids, items):
+        """Counts with the tail messages added (msg_ids are positions in tail)."""
+        added = ItemCounts(tail, msg_ids, items)
+        merged = ItemCounts.__new__(ItemCounts)
+        merged.items = self.items.union(added.items)
+        merged.users = self.users.append(added.users.difference(self.users, sort=False))
+
+        # Stack both cell lists on the merged vocabulary, then fold cells that
+        # appear in both (the day the previous export ended)
+        cell_days = np.concatenate([self.cell_days, added.cell_days])
+        cell_users = np.concatenate([
+            merged.users.get_indexer(self.users)[self.cell_users],
+            merged.users.get_indexer(added.users)[added.cell_users],
+        ])
+        shape = (len(cell_days), len(merged.items))
+        old, new = self.cell_items.tocoo(), added.cell_items.tocoo()
+        stacked = sparse.csr_matrix((
+            np.concatenate([old.data, new.data]),
+            (
+                np.concatenate([old.row, new.row + self.cell_items.shape[0]]),
+                np.concatenate([merged.items.get_indexer(self.items)[old.col],
+                                merged.items.get_indexer(added.items)[new.col]]),
+            ),
+        ), shape=shape)
+
+        day_codes, days = pd.factorize(cell_days, sort=True)
+        n_users = max(len(merged.users), 1)
+        cell_codes, cell_keys = pd.factorize(day_codes * n_users + cell_users, sort=True)
+        fold = _count_matrix(cell_codes, np.arange(len(cell_codes)), (len(cell_keys), len(cell_codes)))
+        merged.cell_days = np.asarray(days)[cell_keys // n_users]
+        merged.cell_users = cell_keys % n_users
+        merged.cell_messages = np.bincount(
+            cell_codes, weights=np.concatenate([self.cell_messages, added.cell_messages]), minlength=len(cell_keys)
+        ).astype(np.int64)
+        merged.cell_items = (fold @ stacked).tocsr()
+        merged.totals = np.asarray(merged.cell_items.sum(axis=0)).ravel()
+        merged._by_item = None
+        return merged
+
+    def __len__(self):
+        return len(self.items)
+
+    def _block(self, start, end):
+        return day_bounds(self.cell_days, start, end)
+
+    def frequencies(self, start=None, end=None):
+        """Item counts (array aligned with items), optionally for days in [start, end]."""
+        if start is None and end is None:
+            return self.totals
+        lo, hi = self._block(start, end)
+        return np.asarray(self.cell_items[lo:hi].sum(axis=0)).ravel()
+
+    def user_items(self, start=None, end=None):
+        """(users x items) sparse counts for days in [start, end]."""
+        lo, hi = self._block(start, end)
+        by_user = _count_matrix(self.cell_users[lo:hi], np.arange(hi - lo), (len(self.users), hi - lo))
+        return (by_user @ self.cell_items[lo:hi]).tocsr()
+
+    def user_messages(self, start=None, end=None):
+        lo, hi = self._block(start, end)
+        return np.bincount(
+            self.cell_users[lo:hi], weights=self.cell_messages[lo:hi], minlength=len(self.users)
+        ).astype(np.int64)
+
+    def ranked(self, counts, n=None):
+        """Series item -> count of the non-zero counts, largest first."""
+        nonzero = np.flatnonzero(counts)
+        order = nonzero[np.argsort(-counts[nonzero], kind='stable')][:n]
+        return pd.Series(counts[order], index=self.items[order])
+
+    def user_row(self, user, start=None, end=None):
+        i = self.users.get_indexer([user])[0]
+        if i < 0:
+            return np.zeros(len(self.items), dtype=np.int64)
+        lo, hi = self._block(start, end)
+        cells = lo + np.flatnonzero(self.cell_users[lo:hi] == i)
+        return np.asarray(self.cell_items[cells].sum(axis=0)).ravel()
+
+    def item_column(self, item, start=None, end=None):
+        """Series user -> count of the item (users with zero are left out)."""
+        j = self.items.get_indexer([item])[0]
+        if j < 0:
+            return pd.Series(dtype=np.int64)
+        if self._by_item is None:
+            self._by_item = self.cell_items.tocsc()
+        a, b = self._by_item.indptr[j], self._by_item.indptr[j + 1]
+        cells, counts = self._by_item.indices[a:b], self._by_item.data[a:b]
+        lo, hi = self._block(start, end)
+        keep = (cells >= lo) & (cells < hi)
+        per_user = np.bincount(
+            self.cell_users[cells[keep]], weights=counts[keep], minlength=len(self.users)
+        ).astype(np.int64)
+        nonzero = np.flatnonzero(per_user)
+        return pd.Series(per_user[nonzero], index=self.users[nonzero])
+
+
+class Sessions:
+    """Conversations: runs of messages with at most gap_minutes between consecutive ones.
+
+    One pass over the sorted timeline (diff of the timestamps, cumsum of the
+    gaps longer than gap_minutes) gives every session; a reply is a message
+    from a different sender than the previous one in the same session, and
+    its latency is that gap. Sessions and replies are kept by message
+    position, so a [lo, hi) row range (DateRangeIndex.bounds) is a slice:
+    sessions are counted when they start in it, replies when they are in it.
+    """
+
+    @profiled('sessions')
+    def __init__(self, df, gap_minutes=30):
+        self.gap_minutes = gap_minutes
+        users = pd.Categorical(df['user'])
+        self.users = np.asarray(users.categories, dtype=object)
+        codes = users.codes.astype(np.int64)
+        times = df['datetime'].to_numpy()
+        gaps = np.diff(times).astype('timedelta64[ms]').astype(np.float64) / 1000
+        breaks = np.concatenate([[True], gaps > gap_minutes * 60])[:len(df)]
+
+        self.starts = np.flatnonzero(breaks)
+        self.ends = np.append(self.starts[1:] - 1, len(df) - 1)[:len(self.starts)]
+        self.start_times, self.end_times = times[self.starts], times[self.ends]
+        self.starters, self.enders = codes[self.starts], codes[self.ends]
+        # Distinct senders per session, from the distinct (session, user) pairs
+        session_of = np.cumsum(breaks) - 1
+        pairs = pd.unique(session_of * max(len(self.users), 1) + codes)
+        self.participants = np.bincount(pairs // max(len(self.users), 1), minlength=len(self.starts))
+
+        self.reply_rows = np.flatnonzero(~breaks[1:] & (codes[1:] != codes[:-1])) + 1
+        self.repliers, self.replied_to = codes[self.reply_rows], codes[self.reply_rows - 1]
+        self.latencies = gaps[self.reply_rows - 1]
+
+    def _slice(self, rows, lo=None, hi=None):
+        a = 0 if lo is None else int(np.searchsorted(rows, lo, 'left'))
+        b = len(rows) if hi is None else int(np.searchsorted(rows, hi, 'left'))
+        return slice(a, max(a, b))
+
+    def table(self, lo=None, hi=None):
+        """One row per session: start, end, minutes, messages, users, starter and ender."""
+        s = self._slice(self.starts, lo, hi)
+        return pd.DataFrame({
+            'start': self.start_times[s],
+            'end': self.end_times[s],
+            'minutes': (self.end_times[s] - self.start_times[s]).astype('timedelta64[s]').astype(np.float64) / 60,
+            'messages': self.ends[s] - self.starts[s] + 1,
+            'users': self.participants[s],
+            'starter': self.users[self.starters[s]],
+            'ender': self.users[self.enders[s]],
+        })
+
+    def by_user(self, lo=None, hi=None):
+        """Sessions started and ended, replies and reply latency (median, p90, minutes) per user."""
+        s, r = self._slice(self.starts, lo, hi), self._slice(self.reply_rows, lo, hi)
+        n = len(self.users)
+        latency = pd.Series(self.latencies[r] / 60).groupby(self.repliers[r])
+        stats = pd.DataFrame({
+            'started': np.bincount(self.starters[s], minlength=n),
+            'ended': np.bincount(self.enders[s], minlength=n),
+            'replies': np.bincount(self.repliers[r], minlength=n),
+            'median_reply_minutes': latency.median().reindex(range(n)).to_numpy(),
+            'p90_reply_minutes': latency.quantile(0.9).reindex(range(n)).to_numpy(),
+        }, index=pd.Index(self.users, name='user'))
+        return stats[stats[['started', 'ended', 'replies']].sum(axis=1) > 0]
+
+    def pairs(self, lo=None, hi=None):
+        """Replies and reply latency (median, p90, minutes) per (replied_to, replier) pair."""
+        r = self._slice(self.reply_rows, lo, hi)
+        latency = pd.Series(self.latencies[r] / 60).groupby(
+            [self.users[self.replied_to[r]], self.users[self.repliers[r]]]
+        )
+        stats = pd.DataFrame({
+            'replies': latency.size(),
+            'median_minutes': latency.median(),
+            'p90_minutes': latency.quantile(0.9),
+        })
+        return stats.rename_axis(['replied_to', 'replier']).sort_values('replies', ascending=False, kind='stable')
+
+    def reply_matrix(self, lo=None, hi=None):
+        """Replies between users: rows are who was answered, columns who answered."""
+        r = self._slice(self.reply_rows, lo, hi)
+        n = len(self.users)
+        counts = np.bincount(self.replied_to[r] * n + self.repliers[r], minlength=n * n).reshape(n, n)
+        rows, cols = counts.sum(axis=1) > 0, counts.sum(axis=0) > 0
+        return pd.DataFrame(
+            counts[rows][:, cols],
+            index=pd.Index(self.users[rows], name='prev_user'),
+            columns=pd.Index(self.users[cols], name='user'),
+        )
+
+
+@profiled('replies')
+def count_replies(df, max_gap_minutes=10):
+    """Replies between users: rows are who was answered, columns who answered.
+
+    A message is a reply when its sender differs from the previous message's
+    and it was sent at most max_gap_minutes later.
+    """
+    return Sessions(df, max_gap_minutes).reply_matrix()
+
+
+def _runs(mask):
+    # (row, start column, length) of every run of True in each row of a 2-D mask
+    rows, cols = mask.shape
+    padded = np.zeros((rows, cols + 2), dtype=np.int8)
+    padded[:, 1:-1] = mask
+    edges = np.diff(padded, axis=1)
+    # nonzero walks row-major, so the k-th start and k-th end belong together
+    run_rows, starts = np.nonzero(edges == 1)
+    _, ends = np.nonzero(edges == -1)
+    return run_rows, starts, ends - starts
+
+
+def _top_runs(rows, starts, lengths, n):
+    # Longest first, earliest first on ties, at most n per row
+    order = np.lexsort((starts, -lengths, rows))
+    rows, starts, lengths = rows[order], starts[order], lengths[order]
+    first = np.searchsorted(rows, rows)
+    keep = np.arange(len(rows)) - first < n
+    return rows[keep], starts[keep], lengths[keep], (np.arange(len(rows)) - first)[keep] + 1
+
+
+@profiled('streaks')
+def activity_streaks(df, n=5, by_user=False):
+    """Top-n runs of consecutive days with messages ('active') and without ('silent').
+
+    Days span the whole chat, first to last message, also for each user. One
+    row per streak with columns user (only by_user), kind, rank, start, end,
+    days.
+    """
+    columns = (['user'] if by_user else []) + ['kind', 'rank', 'start', 'end', 'days']
+    if df.empty:
+        return pd.DataFrame(columns=columns)
+    day_ns = df['datetime'].dt.normalize().to_numpy().astype('datetime64[D]')
+    first = day_ns.min()
+    day_codes = (day_ns - first).astype(np.int64)
+    n_days = int(day_codes.max()) + 1
+
+    if by_user:
+        user_codes, users = pd.factorize(df['user'].astype(str))
+        n_rows = len(users)
+    else:
+        user_codes, users, n_rows = np.zeros(len(df), dtype=np.int64), None, 1
+    counts = np.bincount(user_codes * n_days + day_codes, minlength=n_rows * n_days)
+    active = counts.reshape(n_rows, n_days) > 0
+
+    frames = []
+    for kind, mask in (('active', active), ('silent', ~active)):
+        rows, starts, lengths, rank = _top_runs(*_runs(mask), n)
+        start = first + starts.astype('timedelta64[D]')
+        frame = {
+            'kind': kind,
+            'rank': rank,
+            'start': pd.to_datetime(start),
+            'end': pd.to_datetime(start + (lengths - 1).astype('timedelta64[D]')),
+            'days': lengths,
+        }
+        if by_user:
+            frame = {'user': np.asarray(users, dtype=object)[rows], **frame}
+        frames.append(pd.DataFrame(frame))
+    streaks = pd.concat(frames, ignore_index=True)
+    sort = ['user', 'kind', 'rank'] if by_user else ['kind', 'rank']
+    return streaks.sort_values(sort, kind='stable').reset_index(drop=True)[columns]
@@ -1,230 +1,564 @@
 # Create the complete WhatsApp Chat Analyzer app including all requested features
 
+import os
+import time
 import streamlit as st
 import pandas as pd
-import re
-from urlextract import URLExtract
-from textblob import TextBlob
-from textblob.sentiments import PatternAnalyzer
-from collections import Counter
-import matplotlib.pyplot as plt
-import seaborn as sns
-import emoji
-from wordcloud import WordCloud
-from datetime import datetime
 import numpy as np
+from analytics import ActivityCube, DateRangeIndex, MentionCounts, Sessions, ToneCube, activity_streaks
+from chart_cache import ChartCache
+from chat_cache import ChatCache, DiskChatCache
+from emoji_stats import EmojiStats
+from lazy_imports import LazyModule, import_report
+from pipeline import (
+    WEEKDAYS, ChatDataset, build_chat_dataset, build_chat_datasets, chat_key, memory_report,
+    update_chat_dataset,
+)
+from profiling import ENABLED as PROFILING_ENABLED, TRACE_MEMORY, Profiler, activate, stage, unprofiled
+from search_index import ChatSearchIndex
+from term_frequency import TermFrequencyStore
+from tone import KEYWORDS_PATH, load_tone_classifier
 
 st.set_page_config(page_title="WhatsApp Chat Analyzer", layout="wide")
+
+# seaborn (con scipy.stats) tarda ~1.5 s en importarse: solo al dibujar el primer gráfico
+sns = LazyModule("seaborn")
+
+# Widgets de las secciones: solo se dibujan en la sección visible y Streamlit
+# borra el estado de los que no se dibujan en un rerun; reasignarlo al
+# principio de cada rerun lo conserva al cambiar de sección
+SECTION_WIDGET_KEYS = ["session_gap", "search_query", "search_user", "search_month", "compare_user"]
+for widget_key in SECTION_WIDGET_KEYS:
+    if widget_key in st.session_state:
+        st.session_state[widget_key] = st.session_state[widget_key]
+
+# Perfilado por etapas de cada rerun: WHATSAPP_ANALYZER_PROFILE=1 (tiempos) o
+# =memory (también memoria); sin la variable no se registra nada
+profiler = activate(Profiler(TRACE_MEMORY)) if PROFILING_ENABLED else None
 st.title("📱 WhatsApp Chat Analyzer")
 
 uploaded_file = st.sidebar.file_uploader("Upload your WhatsApp chat file (.txt)", type=["txt"])
 
-def get_sentiment(text):
-    # You could use langdetect or similar to detect language
-    # For now, only analyze if Spanish
-    # Otherwise, return None or a default value
-    return TextBlob(text, analyzer=PatternAnalyzer()).sentiment[0]
+# Máximo de chats procesados que se mantienen en memoria
+CHAT_CACHE_MAX_ENTRIES = 4
 
-if uploaded_file:
-    chat_data = uploaded_file.read().decode("utf-8")
-
-    pattern = r'^(\d{1,2}/\d{1,2}/\d{2,4}), (\d{1,2}:\d{2}) - ([^:]+): (.*)$'
-    lines = chat_data.splitlines()
-
-    data = []
-    for line in lines:
-        match = re.match(pattern, line)
-        if match:
-            date, time, user, message = match.groups()
-            try:
-                datetime_obj = datetime.strptime(f"{date} {time}", "%d/%m/%Y %H:%M")
-            except ValueError:
-                try:
-                    datetime_obj = datetime.strptime(f"{date} {time}", "%d/%m/%y %H:%M")
-                except:
-                    continue
-            data.append({
-                'datetime': datetime_obj,
-                'user': user.strip(),
-                'message': message.strip()
-            })
+# Chats del comparador en memoria (aparte, para no desplazar al chat principal)
+COMPARE_CACHE_MAX_ENTRIES = 16
 
-    df = pd.DataFrame(data)
-    if df.empty:
-        st.warning("No messages parsed. Please check your file format.")
-        st.stop()
+# Caché en disco (Arrow IPC): sobrevive a reinicios del servidor
+CHAT_DISK_CACHE_DIR = os.environ.get("WHATSAPP_ANALYZER_CACHE_DIR", os.path.join(".cache", "chats"))
+CHAT_DISK_CACHE_MAX_BYTES = int(os.environ.get("WHATSAPP_ANALYZER_CACHE_MAX_MB", "2048")) * 1024 ** 2
 
-    df['date'] = df['datetime'].dt.date
-    df['time'] = df['datetime'].dt.time
-    df['hour'] = df['datetime'].dt.hour
-    df['day'] = df['datetime'].dt.date
-    df['month'] = df['datetime'].dt.to_period('M')
-    df['weekday'] = df['datetime'].dt.day_name()
+# Minutos sin mensajes que cierran una conversación (opciones del selector)
+SESSION_GAPS = [5, 10, 15, 30, 60, 120, 240, 480, 1440]
+DEFAULT_SESSION_GAP = 30
 
-    min_date = df['datetime'].min().date()
-    max_date = df['datetime'].max().date()
-    
-    start_date, end_date = st.sidebar.date_input(
+# Gráficos ya renderizados (PNG) que se reutilizan mientras sus datos no cambien
+CHART_CACHE_MAX_BYTES = 64 * 1024 ** 2
+
+
+@st.cache_resource
+def get_chat_cache():
+    return ChatCache(max_entries=CHAT_CACHE_MAX_ENTRIES)
+
+
+@st.cache_resource
+def get_compare_cache():
+    return ChatCache(max_entries=COMPARE_CACHE_MAX_ENTRIES)
+
+
+@st.cache_resource
+def get_disk_cache():
+    return DiskChatCache(CHAT_DISK_CACHE_DIR, CHAT_DISK_CACHE_MAX_BYTES)
+
+
+@st.cache_resource
+def get_chart_cache():
+    return ChartCache(max_bytes=CHART_CACHE_MAX_BYTES)
+
+
+def show_chart(name, draw, *data, figsize=None):
+    # Solo se dibuja si cambian los datos; la figura se cierra al renderizar
+    st.image(get_chart_cache().render(name, draw, *data, figsize=figsize))
+
+
+def show_profile(profiler):
+    # Etapas del rerun actual; la traza se abre en chrome://tracing o en Perfetto
+    with st.sidebar.expander("⏱️ Perfilado"):
+        st.caption(f"Rerun: {profiler.elapsed() * 1000:.0f} ms")
+        st.dataframe(profiler.summary().round(2), hide_index=True)
+        imports = import_report()
+        if imports:
+            st.caption("Importaciones diferidas: " + ", ".join(f"{name} {seconds:.2f} s" for name, seconds in imports))
+        st.download_button(
+            "Descargar traza (Chrome)", profiler.chrome_trace(), file_name="trace.json", mime="application/json"
+        )
+
+
+def drop_stale_choice(key, options):
+    # Valor guardado que ya no es una opción (p. ej. usuario o mes de otro chat): vuelve al de por defecto
+    if key in st.session_state and st.session_state[key] not in options:
+        del st.session_state[key]
+
+
+def remember_compare_files():
+    # Los archivos subidos no se pueden restaurar en el uploader: se guardan aparte
+    st.session_state["compare_files"] = [(f.name, f.getvalue()) for f in st.session_state["compare_chats"] or []]
+
+
+def load_from_disk(disk, key):
+    # key[3] es la huella del CSV de tonos; se comprueba también en los metadatos del archivo
+    hit = disk.get(key, tone=key[3])
+    if hit is None:
+        return None
+    df, meta = hit
+    return ChatDataset(df, meta.get('raw_length', 0), meta.get('name'))
+
+
+def load_tone_classifier_safe():
+    # El CSV de keywords se carga e indexa una sola vez por versión del archivo
+    try:
+        tone_classifier = load_tone_classifier(KEYWORDS_PATH)
+    except Exception as e:
+        return None, f"Error loading keyword file: {e}"
+    if tone_classifier is None:
+        return None, f"Keyword file not found: {KEYWORDS_PATH}"
+    return tone_classifier, None
+
+
+def find_previous_export(cache, disk, dataset_key, name):
+    # Versiones anteriores del mismo chat (mismo nombre de archivo y mismos
+    # ajustes): primero las de memoria, después las del disco. Si una no es
+    # este chat, read_new_messages lo descarta parseando solo el final del archivo
+    seen = set()
+    for key, dataset in cache.items():
+        if key[1:] == dataset_key[1:] and dataset.name == name:
+            seen.add(key)
+            yield dataset
+    for key in disk.keys():
+        if key[1:] == dataset_key[1:] and key not in seen and (disk.metadata(key) or {}).get('name') == name:
+            dataset = load_from_disk(disk, key)
+            if dataset is not None:
+                yield dataset
+
+
+def load_chat(dataset_key, raw, name, tone_classifier, sentiment_method):
+    # Clave: hash del contenido + versión del pipeline; si el archivo no cambia
+    # no se vuelve a parsear ni a enriquecer
+    cache = get_chat_cache()
+    dataset = cache.get(dataset_key)
+    if dataset is None:
+        disk = get_disk_cache()
+        dataset = load_from_disk(disk, dataset_key)
+        if dataset is None:
+            with st.spinner("Procesando chat..."):
+                # Reexportación del mismo chat: solo se procesan los mensajes nuevos
+                for previous in find_previous_export(cache, disk, dataset_key, name):
+                    dataset = update_chat_dataset(previous, raw, tone_classifier, sentiment_method, name)
+                    if dataset is not None:
+                        break
+                else:
+                    dataset = build_chat_dataset(raw, tone_classifier, sentiment_method, name)
+            disk.put(dataset_key, dataset.df, raw_length=dataset.raw_length, name=name, tone=dataset_key[3])
+        cache.put(dataset_key, dataset)
+    return dataset
+
+
+def find_cached_chat(dataset_key):
+    # Vista principal, comparador y, por último, disco (memory-mapped)
+    dataset = get_chat_cache().get(dataset_key) or get_compare_cache().get(dataset_key)
+    if dataset is None:
+        dataset = load_from_disk(get_disk_cache(), dataset_key)
+        if dataset is not None:
+            get_compare_cache().put(dataset_key, dataset)
+    return dataset
+
+
+def load_compare_chats(files, tone_classifier, sentiment_method):
+    # files: (nombre, bytes). Solo se procesan los chats que no están en
+    # ninguna caché, todos a la vez en procesos separados
+    raws = [raw for _, raw in files]
+    keys = [chat_key(raw, sentiment_method, tone_classifier) for raw in raws]
+    datasets = [find_cached_chat(key) for key in keys]
+    missing = [i for i, dataset in enumerate(datasets) if dataset is None]
+    if missing:
+        with st.spinner(f"Procesando {len(missing)} chat(s)..."):
+            built = build_chat_datasets(
+                [raws[i] for i in missing], KEYWORDS_PATH if tone_classifier is not None else None,
+                sentiment_method, [files[i][0] for i in missing],
+            )
+        for i, dataset in zip(missing, built):
+            get_disk_cache().put(
+                keys[i], dataset.df, raw_length=dataset.raw_length, name=dataset.name, tone=keys[i][3]
+            )
+            get_compare_cache().put(keys[i], dataset)
+            datasets[i] = dataset
+    return keys, datasets
+
+
+def get_search_index(dataset):
+    return dataset.aggregate('search_index', ChatSearchIndex, ChatSearchIndex.append)
+
+
+def get_mentions(dataset):
+    return dataset.aggregate('mentions', MentionCounts, MentionCounts.append)
+
+
+def get_date_index(dataset):
+    return dataset.aggregate('date_index', DateRangeIndex, DateRangeIndex.append)
+
+
+def get_sessions(dataset, gap_minutes):
+    # Una sesión por chat y umbral: mover el selector a un valor ya visto no recorre el chat
+    return dataset.aggregate(('sessions', gap_minutes), lambda df: Sessions(df, gap_minutes))
+
+
+def game_messages(df):
+    """Positions of the messages the guessing game can show."""
+    mask = ~df['has_media'] & (df['num_links'] == 0) & (df['message'].str.len() > 10)
+    return np.flatnonzero(mask.to_numpy())
+
+
+def get_game_messages(dataset):
+    return dataset.aggregate('game_messages', game_messages)
+
+
+def get_tone_cube(dataset):
+    return dataset.aggregate('tone_cube', ToneCube, ToneCube.append)
+
+
+def get_tone_tables(dataset, date_range):
+    # Conteos por (día, usuario, tono) sin 'other': cualquier rango de fechas es un corte del cubo
+    cube = get_tone_cube(dataset)
+    tone_counts = cube.reduce('tone', 'messages', *date_range).sort_values(ascending=False, kind='stable')
+    return {
+        'counts': tone_counts,
+        'by_user': cube.reduce(['user', 'tone'], 'messages', *date_range).unstack(fill_value=0),
+        'daily': cube.reduce(['day', 'tone'], 'messages', *date_range).unstack(fill_value=0),
+        'sentiment_by_user': cube.mean('user', 'sentiment', *date_range).sort_values(),
+    }
+
+
+def get_activity_cube(dataset, dataset_key):
+    # El cubo se guarda en disco junto al chat: tras un reinicio no se recalcula
+    disk, cube_key = get_disk_cache(), dataset_key + ('activity_cube',)
+
+    def build(df):
+        hit = disk.get(cube_key, tone=dataset_key[3])
+        if hit is not None:
+            return ActivityCube(None, hit[0])
+        cube = ActivityCube(df)
+        disk.put(cube_key, cube.cells, tone=dataset_key[3])
+        return cube
+
+    return dataset.aggregate('activity_cube', build, ActivityCube.append)
+
+
+def get_emoji_stats(dataset):
+    return dataset.aggregate('emoji_stats', EmojiStats, EmojiStats.append)
+
+
+def get_term_store(dataset):
+    return dataset.aggregate('term_store', TermFrequencyStore, TermFrequencyStore.append)
+
+
+# Los reruns de un fragmento no vuelven a dibujar el perfil: no registran nada
+@st.fragment
+@unprofiled
+def who_said_it_game(valid_msgs, all_users):
+    # Fragmento: los botones del juego solo vuelven a ejecutar el juego
+    st.header("🎮 WhatsApp Chat Game: ¿Quién lo dijo?")
+    st.write("Adivina quién envió el mensaje. ¡Pon a prueba tu memoria del chat!")
+
+    if valid_msgs.empty:
+        st.info("No hay suficientes mensajes para jugar.")
+    else:
+        # Inicializar estado del juego
+        if 'game_score' not in st.session_state:
+            st.session_state['game_score'] = 0
+        if 'game_attempts' not in st.session_state:
+            st.session_state['game_attempts'] = 0
+        # Al cambiar el rango de fechas el índice guardado puede quedar fuera
+        if st.session_state.get('game_idx', len(valid_msgs)) >= len(valid_msgs):
+            st.session_state['game_idx'] = np.random.randint(len(valid_msgs))
+
+        # Seleccionar mensaje actual
+        msg_row = valid_msgs.iloc[st.session_state['game_idx']]
+        st.write(f"**Mensaje:** _{msg_row['message']}_")
+
+        # Opciones de usuario (4 aleatorias, incluyendo la correcta)
+        opciones = set(np.random.choice(all_users, min(4, len(all_users)), replace=False))
+        opciones.add(msg_row['user'])
+        opciones = list(opciones)
+        np.random.shuffle(opciones)
+
+        respuesta = st.radio(
+            "¿Quién lo dijo?",
+            opciones,
+            key=f"radio_game_{st.session_state['game_idx']}_{st.session_state['game_attempts']}"
+        )
+
+        col1, col2 = st.columns(2)
+        with col1:
+            if st.button("Comprobar"):
+                st.session_state['game_attempts'] += 1
+                if respuesta == msg_row['user']:
+                    st.success("¡Correcto! 🎉")
+                    st.session_state['game_score'] += 1
+                else:
+                    st.error(f"Incorrecto. Era: {msg_row['user']}")
+        with col2:
+            if st.button("Siguiente"):
+                st.session_state['game_idx'] = np.random.randint(len(valid_msgs))
+
+        st.write(f"Puntaje: {st.session_state['game_score']} / {st.session_state['game_attempts']}")
+
+
+@st.fragment
+@unprofiled
+def word_game(term_store, date_range):
+    st.header("🎲 ¿Quién dijo esta palabra más veces?")
+    st.write("Adivina quién ha dicho más veces una palabra elegida al azar.")
+
+    if len(term_store.frequencies(*date_range)):
+        if 'word_game_score' not in st.session_state:
+            st.session_state['word_game_score'] = 0
+        if 'word_game_attempts' not in st.session_state:
+            st.session_state['word_game_attempts'] = 0
+        if 'word_game_word' not in st.session_state:
+            st.session_state['word_game_word'] = term_store.random_term(*date_range)
+
+        word = st.session_state['word_game_word']
+        st.write(f"**Palabra:** _{word}_")
+
+        # Contar ocurrencias por usuario
+        user_counts = term_store.user_counts(word, *date_range)
+        opciones_word = user_counts.index.tolist()
+
+        if len(opciones_word) < 2:
+            st.info("No hay suficientes usuarios que hayan dicho esta palabra. Se elige otra palabra.")
+            st.session_state['word_game_word'] = term_store.random_term(*date_range)
+        else:
+            np.random.shuffle(opciones_word)
+            respuesta_word = st.radio(
+                "¿Quién dijo esta palabra más veces?",
+                opciones_word,
+                key=f"radio_word_{word}_{st.session_state['word_game_attempts']}"
+            )
+
+            colw1, colw2 = st.columns(2)
+            with colw1:
+                if st.button("Comprobar palabra"):
+                    st.session_state['word_game_attempts'] += 1
+                    ganador = user_counts.idxmax()
+                    if respuesta_word == ganador:
+                        st.success(f"¡Correcto! {ganador} dijo '{word}' {user_counts.max()} veces.")
+                        st.session_state['word_game_score'] += 1
+                    else:
+                        st.error(f"Incorrecto. Era: {ganador} ({user_counts.max()} veces).")
+            with colw2:
+                if st.button("Siguiente palabra"):
+                    st.session_state['word_game_word'] = term_store.random_term(*date_range)
+
+            st.write(f"Puntaje: {st.session_state['word_game_score']} / {st.session_state['word_game_attempts']}")
+    else:
+        st.info("No hay suficientes palabras para jugar a este juego.")
+
+
+tone_classifier, tone_error = load_tone_classifier_safe()
+
+# Exacto: TextBlob/Pattern completo; rápido: media vectorizada del léxico
+SENTIMENT_METHODS = {"Exacto (TextBlob)": "pattern", "Rápido (léxico)": "lexicon"}
+sentiment_method = SENTIMENT_METHODS[st.sidebar.radio("Análisis de sentimiento", list(SENTIMENT_METHODS))]
+
+if uploaded_file:
+    raw = uploaded_file.getvalue()
+    # Incluye la huella del CSV de tonos: si cambia, el chat se vuelve a etiquetar
+    dataset_key = chat_key(raw, sentiment_method, tone_classifier)
+    with stage("load_chat"):
+        dataset = load_chat(dataset_key, raw, uploaded_file.name, tone_classifier, sentiment_method)
+    if dataset.df.empty:
+        st.warning("No messages parsed. Please check your file format.")
+        st.stop()
+    st.sidebar.caption(f"Formato detectado: {dataset.df.attrs.get('chat_format', 'desconocido')}")
+    if dataset.appended is not None:
+        st.sidebar.caption(f"Actualización incremental: {dataset.appended} mensajes nuevos")
+    if st.sidebar.checkbox("Mostrar uso de memoria"):
+        report = memory_report(dataset.df)
+        st.sidebar.caption(f"{report['bytes_per_message'].sum():.0f} bytes por mensaje")
+        st.sidebar.dataframe(report.round(1))
+        chart_stats = get_chart_cache().stats()
+        st.sidebar.caption(
+            f"Gráficos en caché: {chart_stats['charts']} ({chart_stats['bytes'] / 1024 ** 2:.1f} MiB), "
+            f"{chart_stats['hits']} reutilizados / {chart_stats['misses']} dibujados en "
+            f"{chart_stats['render_seconds']:.1f} s, figuras abiertas: {chart_stats['open_figures']}"
+        )
+
+    # Mensajes ordenados por fecha: el rango se resuelve con dos búsquedas
+    # binarias y el frame filtrado es un slice, sin recorrer todas las filas
+    date_index = get_date_index(dataset)
+    min_date = dataset.df['datetime'].iloc[0].date()
+    max_date = dataset.df['datetime'].iloc[-1].date()
+
+    selected_dates = st.sidebar.date_input(
         "Filtrar por rango de fechas",
         value=(min_date, max_date),
         min_value=min_date,
-        max_value=max_date
+        max_value=max_date,
+        key=f"date_range_{dataset_key[0]}",
     )
+    # Mientras se elige el rango solo hay una fecha: se toma hasta el final
+    if not isinstance(selected_dates, (list, tuple)):
+        selected_dates = (selected_dates,)
+    start_date = selected_dates[0] if len(selected_dates) > 0 else min_date
+    end_date = selected_dates[1] if len(selected_dates) > 1 else max_date
+    # (None, None) = chat completo; los agregados precalculados lo resuelven sin filtrar
+    date_range = (None, None) if (start_date, end_date) == (min_date, max_date) else (start_date, end_date)
+
+    lo, hi = date_index.bounds(*date_range)
+    # Copia superficial: las columnas que añade cada rerun no llegan a la
+    # versión cacheada, y las columnas del disco siguen mapeadas en memoria
+    df = dataset.df.iloc[lo:hi].copy(deep=False)
+    if df.empty:
+        st.warning("No hay mensajes en el rango de fechas seleccionado.")
+        st.stop()
 
+    # Cubo día x hora x usuario: las pestañas 1-3 son reducciones del cubo
+    cube = get_activity_cube(dataset, dataset_key)
+    daily_msgs = cube.reduce('day', 'messages', *date_range)
+    hourly_msgs = cube.reduce('hour', 'messages', *date_range)
+    user_msg_count = cube.reduce('user', 'messages', *date_range).sort_values(ascending=False, kind='stable')
 
-    # Extract URLs
-    extractor = URLExtract()
-    df['num_words'] = df['message'].apply(lambda x: len(x.split()))
-    df['has_media'] = df['message'].str.contains('edia')
-    df['num_links'] = df['message'].apply(lambda x: len(extractor.find_urls(x)))
-
-    # Sentiment
-    df['sentiment'] = df['message'].apply(get_sentiment)
 
-    tab1, tab2, tab3, tab4, tab5, tab6, tab7, tab8, tab9 = st.tabs([
-        "📊 Estadísticas", "📈 Actividad", "🗣️ Participación", "😂 Emojis & Wordcloud", "🔍 Avanzado", 
+    # st.tabs ejecuta todas las pestañas en cada rerun: con el selector solo
+    # se calcula la sección visible
+    tab1, tab2, tab3, tab4, tab5, tab6, tab7, tab8, tab9 = SECTIONS = [
+        "📊 Estadísticas", "📈 Actividad", "🗣️ Participación", "😂 Emojis & Wordcloud", "🔍 Avanzado",
         "🧠 NLP", "🧠 Chat Assistant", "🎮 Game", "📬 Comparador de Xats"
-    ])
+    ]
+    section = st.radio("Sección", SECTIONS, horizontal=True, key="section", label_visibility="collapsed")
+    section_start = time.perf_counter()
 
 
-    with tab1:
+    if section == tab1:
         st.header("📊 Estadísticas")
         col1, col2, col3, col4 = st.columns(4)
-        col1.metric("Total mensajes", len(df))
-        col2.metric("Total palabras", df['num_words'].sum())
-        col3.metric("Archivos multimedia", df['has_media'].sum())
-        col4.metric("Enlaces compartidos", df['num_links'].sum())
+        totals = date_index.totals(lo, hi)
+        col1.metric("Total mensajes", totals['messages'])
+        col2.metric("Total palabras", totals['words'])
+        col3.metric("Archivos multimedia", totals['media'])
+        col4.metric("Enlaces compartidos", totals['links'])
         #top days, hours, users
         st.subheader("Top 5 días con más mensajes")
-        top_days = df['day'].value_counts().head(5)
+        top_days = daily_msgs.sort_values(ascending=False, kind='stable').head(5)
+        top_days.index = top_days.index.date
         st.write(top_days)
         st.subheader("Top 5 horas con más mensajes")
-        top_hours = df['hour'].value_counts().head(5)
+        top_hours = hourly_msgs.sort_values(ascending=False, kind='stable').head(5)
         st.write(top_hours)
         st.subheader("Top 5 usuarios")
-        top_users = df['user'].value_counts().head(5)
+        top_users = user_msg_count.head(5)
         st.write(top_users)
         # Rachas de más días consecutivos con y sin mensajes (y qué fechas son)
-        st.subheader("Rachas de días consecutivos sin mensajes")
-        # Crear un rango completo de fechas
-        all_days = pd.date_range(df['day'].min(), df['day'].max())
-        msg_per_day = df.groupby('day').size().reindex(all_days, fill_value=0)
-        # Encontrar rachas de días sin mensajes
-        no_msg_streaks = []
-        current_streak = []
-        for date, count in msg_per_day.items():
-            if count == 0:
-                current_streak.append(date)
-            else:
-                if len(current_streak) > 0:
-                    no_msg_streaks.append(list(current_streak))
-                    current_streak = []
-        if len(current_streak) > 0:
-            no_msg_streaks.append(list(current_streak))
-        # Mostrar las rachas más largas
-        no_msg_streaks = sorted(no_msg_streaks, key=len, reverse=True)
-        if no_msg_streaks and len(no_msg_streaks[0]) > 0:
-            st.write(f"Mayor racha sin mensajes: {len(no_msg_streaks[0])} días, desde {no_msg_streaks[0][0].date()} hasta {no_msg_streaks[0][-1].date()}")
-        else:
-            st.write("No hubo días consecutivos sin mensajes.")
-
-        st.subheader("Rachas de días consecutivos con mensajes")
-        msg_streaks = []
-        current_streak = []
-        for date, count in msg_per_day.items():
-            if count > 0:
-                current_streak.append(date)
-            else:
-                if len(current_streak) > 0:
-                    msg_streaks.append(list(current_streak))
-                    current_streak = []
-        if len(current_streak) > 0:
-            msg_streaks.append(list(current_streak))
-        msg_streaks = sorted(msg_streaks, key=len, reverse=True)
-        if msg_streaks and len(msg_streaks[0]) > 0:
-            st.write(f"Mayor racha con mensajes: {len(msg_streaks[0])} días, desde {msg_streaks[0][0].date()} hasta {msg_streaks[0][-1].date()}")
-        else:
-            st.write("No hubo días consecutivos con mensajes.")
+        streaks = activity_streaks(df, n=5)
+        streak_labels = {"start": "Desde", "end": "Hasta", "days": "Días"}
+        for kind, title, found, none in (
+            ("silent", "Rachas de días consecutivos sin mensajes", "Mayor racha sin mensajes",
+             "No hubo días consecutivos sin mensajes."),
+            ("active", "Rachas de días consecutivos con mensajes", "Mayor racha con mensajes",
+             "No hubo días consecutivos con mensajes."),
+        ):
+            st.subheader(title)
+            top = streaks[streaks['kind'] == kind]
+            if top.empty:
+                st.write(none)
+                continue
+            best = top.iloc[0]
+            st.write(f"{found}: {best['days']} días, desde {best['start'].date()} hasta {best['end'].date()}")
+            st.dataframe(top[['start', 'end', 'days']].rename(columns=streak_labels), hide_index=True)
+
+        st.subheader("Rachas por usuario")
+        user_streaks = activity_streaks(df, n=1, by_user=True)
+        user_streaks = user_streaks.pivot(index='user', columns='kind', values='days')
+        st.dataframe(user_streaks.rename(columns={"active": "Mayor racha activa", "silent": "Mayor racha en silencio"}))
 
 
         # Longitud media de mensajes
         st.subheader("Longitud media de mensajes")
-        df['message_length'] = df['message'].apply(lambda x: len(x.split()))
-        avg_length = df['message_length'].mean()
+        avg_length = totals['words'] / totals['messages']
 
         col_a, col_b = st.columns([1, 2])
         with col_a:
             st.write(f"Longitud media de mensajes: {avg_length:.2f} palabras")
             # Top 3 usuarios con mayor longitud media de mensajes
             st.write("Top 3 usuarios con mayor longitud media de mensajes:")
-            avg_length_by_user = df.groupby('user')['message_length'].mean().sort_values(ascending=False).head(3)
+            avg_length_by_user = cube.mean('user', 'words', *date_range).sort_values(ascending=False).head(3)
             st.write(avg_length_by_user)
 
         with col_b:
-            fig1, ax1 = plt.subplots()
-            sns.histplot(df['message_length'], bins=30, ax=ax1)
-            ax1.set_xlabel("Longitud del mensaje (palabras)")
-            ax1.set_ylabel("Frecuencia")
-            st.pyplot(fig1)
+            def draw(ax, num_words):
+                sns.histplot(num_words, bins=30, ax=ax)
+                ax.set_xlabel("Longitud del mensaje (palabras)")
+                ax.set_ylabel("Frecuencia")
+            show_chart("words_histogram", draw, df['num_words'])
 
-    with tab2:
+    if section == tab2:
         st.header("📈 Actividad")
         st.subheader("Mensajes por hora")
-        fig, ax = plt.subplots()
-        sns.histplot(df['hour'], bins=24, ax=ax)
-        ax.set_xlabel("Hora del día")
-        ax.set_ylabel("Número de mensajes")
-        st.pyplot(fig)
+        def draw(ax, hourly):
+            sns.histplot(x=hourly.index, weights=hourly.to_numpy(), bins=24, ax=ax)
+            ax.set_xlabel("Hora del día")
+            ax.set_ylabel("Número de mensajes")
+        show_chart("hour_histogram", draw, hourly_msgs)
 
         st.subheader("Mensajes por semana/mes")
-        st.line_chart(df.groupby('month').size())
+        st.line_chart(cube.reduce('month', 'messages', *date_range))
 
         st.subheader("Actividad diaria")
-        st.line_chart(df.groupby('day').size())
+        st.line_chart(daily_msgs)
 
         st.subheader("Sentimiento medio por día")
-        st.line_chart(df.groupby('day')['sentiment'].mean())
+        st.line_chart(cube.mean('day', 'sentiment', *date_range))
 
         st.subheader("Heatmap: Mensajes por hora y día de la semana")
-        pivot = pd.pivot_table(df, index='weekday', columns='hour', values='message', aggfunc='count').fillna(0)
+        pivot = cube.reduce(['weekday', 'hour'], 'messages', *date_range).unstack(fill_value=0)
         # Reorder weekdays
-        ordered_days = ['Monday', 'Tuesday', 'Wednesday', 'Thursday', 'Friday', 'Saturday', 'Sunday']
-        pivot = pivot.reindex(ordered_days)
-        fig2, ax2 = plt.subplots(figsize=(12, 4))
-        sns.heatmap(pivot, cmap="YlGnBu", ax=ax2)
-        ax2.set_xlabel("Hora del día")
-        ax2.set_ylabel("Día de la semana")
-        st.pyplot(fig2)
+        pivot = pivot.reindex(WEEKDAYS)
+        def draw(ax, pivot):
+            sns.heatmap(pivot, cmap="YlGnBu", ax=ax)
+            ax.set_xlabel("Hora del día")
+            ax.set_ylabel("Día de la semana")
+        show_chart("weekday_hour_heatmap", draw, pivot, figsize=(12, 4))
 
         # Evolución del número de mensajes en el tiempo (acumulado y rolling mean)
         st.subheader("Evolución acumulada de mensajes")
-        cumulative_msgs = df.groupby('day').size().cumsum()
+        cumulative_msgs = daily_msgs.cumsum()
         st.line_chart(cumulative_msgs)
 
         st.subheader("Media móvil de mensajes (7 días)")
-        rolling_msgs = df.groupby('day').size().rolling(window=30, min_periods=1).mean()
+        rolling_msgs = daily_msgs.rolling(window=30, min_periods=1).mean()
         st.line_chart(rolling_msgs)
 
 
-    with tab3:
+    if section == tab3:
         st.header("🗣️ Participación")
         st.subheader("Mensajes por user")
-        user_msg_count = df['user'].value_counts()
         st.bar_chart(user_msg_count)
 
         st.subheader("Participación (%)")
-        fig3, ax3 = plt.subplots()
-        user_msg_count.plot.pie(autopct='%1.1f%%', ax=ax3)
-        ax3.set_ylabel("")
-        st.pyplot(fig3)
+        def draw(ax, counts):
+            counts.plot.pie(autopct='%1.1f%%', ax=ax)
+            ax.set_ylabel("")
+        show_chart("participation_pie", draw, user_msg_count)
 
         # Lineplot de mensajes por usuario en el tiempo (acumulado y rolling mean)
         st.subheader("Evolución acumulada de mensajes por usuario")
-        user_cum_msgs = df.groupby(['day', 'user']).size().unstack(fill_value=0).cumsum()
+        user_daily_msgs = cube.reduce(['day', 'user'], 'messages', *date_range).unstack(fill_value=0)
+        user_cum_msgs = user_daily_msgs.cumsum()
         st.line_chart(user_cum_msgs)
 
         st.subheader("Media móvil de mensajes por usuario (7 días)")
-        user_rolling_msgs = df.groupby(['day', 'user']).size().unstack(fill_value=0).rolling(window=30, min_periods=1).mean()
+        user_rolling_msgs = user_daily_msgs.rolling(window=30, min_periods=1).mean()
         st.line_chart(user_rolling_msgs)
 
         
@@ -232,32 +566,44 @@ if uploaded_file:
 
         
 
-    with tab4:
+    if section == tab4:
         st.subheader("Palabras más comunes")
-        all_words = ' '.join(df['message'].tolist())
-        words = re.findall(r'\b\w+\b', all_words.lower())
-        words = [word for word in words if len(word) > 3]
-        words = [word for word in words if word not in ["multimedia", "media", "omitido", "enlace", "link", "null", "mensaje", "este", "eliminado", "elimino", "eliminó", "omitted", "https", "status", "deleted"]]
-        common_words = Counter(words).most_common(10)
-        st.write(pd.DataFrame(common_words, columns=["Palabra", "Frecuencia"]))
+        term_store = get_term_store(dataset)
+        common_words = term_store.top_terms(10, *date_range)
+        st.write(pd.DataFrame({"Palabra": common_words.index, "Frecuencia": common_words.to_numpy()}))
 
         st.header("😂 Emojis & Wordcloud")
-        emoji_list = [c for c in all_words if c in emoji.EMOJI_DATA]
-        emoji_freq = Counter(emoji_list).most_common(10)
+        emoji_stats = get_emoji_stats(dataset)
+        emoji_freq = emoji_stats.top(10, *date_range)
         st.subheader("Emojis más usados")
-        st.write(pd.DataFrame(emoji_freq, columns=["Emoji", "Frecuencia"]))
+        st.write(pd.DataFrame({"Emoji": emoji_freq.index, "Frecuencia": emoji_freq.to_numpy()}))
+
+        st.subheader("Perfil de emojis por usuario")
+        emoji_profiles = emoji_stats.profiles(3, *date_range)
+        emoji_profiles.columns = ["Usuario", "Emojis", "Emojis por mensaje", "Favoritos"]
+        st.dataframe(emoji_profiles.round({"Emojis por mensaje": 2}))
 
         st.subheader("Nube de palabras")
-        wordcloud = WordCloud(width=800, height=400, background_color='white').generate(' '.join(words))
-        fig_wc, ax_wc = plt.subplots(figsize=(10, 5))
-        ax_wc.imshow(wordcloud, interpolation='bilinear')
-        ax_wc.axis('off')
-        st.pyplot(fig_wc)
+        word_freq = term_store.frequencies(*date_range)
+        if not word_freq.empty:
+            # La nube solo se genera de nuevo si cambian las frecuencias
+            def draw(ax, word_freq):
+                from wordcloud import WordCloud
+
+                wordcloud = WordCloud(width=800, height=400, background_color='white').generate_from_frequencies(
+                    word_freq.to_dict()
+                )
+                ax.imshow(wordcloud, interpolation='bilinear')
+                ax.axis('off')
+            show_chart("wordcloud", draw, word_freq, figsize=(10, 5))
+        else:
+            st.info("No hay palabras suficientes para la nube.")
 
-    with tab5:
+    if section == tab5:
         st.header("🔍 Avanzado")
         st.subheader("Mensajes con enlaces")
         top_link_users = df[df['num_links'] > 0]['user'].value_counts()
+        top_link_users = top_link_users[top_link_users > 0]
         if not top_link_users.empty:
             st.write(f"Usuario(s) que más han enviado enlaces: {top_link_users.idxmax()} ({top_link_users.max()} enlaces)")
         else:
@@ -265,165 +611,128 @@ if uploaded_file:
 
         st.subheader("Mensajes con archivos multimedia")
         top_media_users = df[df['has_media']]['user'].value_counts()
+        top_media_users = top_media_users[top_media_users > 0]
         if not top_media_users.empty:
             st.write(f"Usuario(s) que más han enviado archivos multimedia: {top_media_users.idxmax()} ({top_media_users.max()} archivos)")
         else:
             st.write("No se encontraron mensajes con archivos multimedia.")
 
-        st.subheader("Quién responde a quién (últimos 10 minutos)")
-        # Ordena por datetime por si acaso
-        df_sorted = df.sort_values('datetime').reset_index(drop=True)
-        df_sorted['prev_user'] = df_sorted['user'].shift(1)
-        df_sorted['prev_time'] = df_sorted['datetime'].shift(1)
-        df_sorted['time_diff'] = (df_sorted['datetime'] - df_sorted['prev_time']).dt.total_seconds() / 60  # minutos
-
-        # Solo cuenta si el usuario cambia y la diferencia es menor a 10 minutos
-        mask = (df_sorted['user'] != df_sorted['prev_user']) & (df_sorted['time_diff'] <= 10)
-        reply_pairs = df_sorted.loc[mask, ['prev_user', 'user']]
-
-        # Cuenta las respuestas
-        reply_counts = reply_pairs.groupby(['prev_user', 'user']).size().reset_index(name='responses')
-        reply_matrix = reply_counts.pivot(index='prev_user', columns='user', values='responses').fillna(0).astype(int)
+        st.subheader("Conversaciones")
+        st.session_state.setdefault("session_gap", DEFAULT_SESSION_GAP)
+        session_gap = st.select_slider(
+            "Minutos sin mensajes que cierran una conversación", SESSION_GAPS, key="session_gap"
+        )
+        # Sesiones del chat completo; el rango de fechas es un slice por posición
+        sessions = get_sessions(dataset, session_gap)
+        session_table = sessions.table(lo, hi)
+        if session_table.empty:
+            st.info("Ninguna conversación empieza en el rango seleccionado.")
+        else:
+            col1, col2, col3 = st.columns(3)
+            col1.metric("Conversaciones", len(session_table))
+            col2.metric("Mensajes por conversación (mediana)", f"{session_table['messages'].median():.0f}")
+            col3.metric("Duración mediana (min)", f"{session_table['minutes'].median():.0f}")
+
+        st.subheader("Quién inicia, quién cierra y cuánto tarda en responder")
+        st.dataframe(sessions.by_user(lo, hi).round(1).rename(columns={
+            "started": "Inicia", "ended": "Cierra", "replies": "Respuestas",
+            "median_reply_minutes": "Latencia mediana (min)", "p90_reply_minutes": "Latencia p90 (min)",
+        }))
+
+        st.subheader("Conversaciones más largas")
+        st.dataframe(
+            session_table.nlargest(5, 'messages').rename(columns={
+                "start": "Inicio", "end": "Fin", "minutes": "Minutos", "messages": "Mensajes",
+                "users": "Participantes", "starter": "Inicia", "ender": "Cierra",
+            }).round({"Minutos": 1}),
+            hide_index=True,
+        )
+
+        st.subheader("Quién responde a quién (misma conversación)")
+        reply_matrix = sessions.reply_matrix(lo, hi)
 
         st.dataframe(reply_matrix)
 
+        st.subheader("Latencia de respuesta por pareja")
+        st.dataframe(sessions.pairs(lo, hi).round(1).rename(columns={
+            "replies": "Respuestas", "median_minutes": "Mediana (min)", "p90_minutes": "p90 (min)",
+        }).rename_axis(["Recibe", "Responde"]))
+
         # Heatmap de respuestas absolutas
         st.subheader("Heatmap de respuestas (número absoluto)")
-        fig_abs, ax_abs = plt.subplots(figsize=(6, 4))
-        sns.heatmap(reply_matrix, annot=True, fmt="d", cmap="Blues", ax=ax_abs)
-        ax_abs.set_xlabel("Responde")
-        ax_abs.set_ylabel("Recibe")
-        st.pyplot(fig_abs)
+        def draw(ax, matrix):
+            sns.heatmap(matrix, annot=True, fmt="d", cmap="Blues", ax=ax)
+            ax.set_xlabel("Responde")
+            ax.set_ylabel("Recibe")
+        show_chart("reply_heatmap", draw, reply_matrix, figsize=(6, 4))
 
         # Heatmap de respuestas en porcentaje
         st.subheader("Heatmap de respuestas (%)")
         reply_matrix_pct = reply_matrix.div(reply_matrix.sum(axis=1), axis=0).fillna(0) * 100
-        fig_pct, ax_pct = plt.subplots(figsize=(6, 4))
-        sns.heatmap(reply_matrix_pct, annot=True, fmt=".1f", cmap="YlOrRd", ax=ax_pct)
-        ax_pct.set_xlabel("Responde")
-        ax_pct.set_ylabel("Recibe")
-        st.pyplot(fig_pct)
+        def draw(ax, matrix):
+            sns.heatmap(matrix, annot=True, fmt=".1f", cmap="YlOrRd", ax=ax)
+            ax.set_xlabel("Responde")
+            ax.set_ylabel("Recibe")
+        show_chart("reply_pct_heatmap", draw, reply_matrix_pct, figsize=(6, 4))
 
         st.subheader("Distribución de sentimiento")
-        fig4, ax4 = plt.subplots()
-        sns.histplot(df['sentiment'], bins=20, ax=ax4)
-        ax4.set_xlabel("Sentimiento (polarity)")
-        st.pyplot(fig4)
+        def draw(ax, sentiment):
+            sns.histplot(sentiment, bins=20, ax=ax)
+            ax.set_xlabel("Sentimiento (polarity)")
+        show_chart("sentiment_histogram", draw, df['sentiment'])
 
 
         st.subheader("Menciones entre usuarios")
 
-        import re
-        from collections import defaultdict
-
-        # Limpiar usuarios: eliminar nulos, IDs numéricos y espacios en blanco
-        users = df['user'].dropna().unique().tolist()
-        users_clean = [u for u in users if isinstance(u, str) and not u.strip().isdigit() and len(u.strip()) > 0]
-
-        # Mapear nombres en minúscula a nombres completos
-        name_map = defaultdict(list)
-        for full_name in users_clean:
-            tokens = full_name.lower().split()
-            for token in tokens:
-                name_map[token].append(full_name)
-
-        # Inicializar matriz de menciones
-        mention_counts = pd.DataFrame(0, index=users_clean, columns=users_clean)
-
-        # Recorrer mensajes
-        for _, row in df.iterrows():
-            msg = str(row['message']).lower()
-            sender = row['user']
-            if sender not in users_clean:
-                continue
-
-            # Extraer palabras de mensaje (sin signos)
-            words = set(re.findall(r'\b\w+\b', msg))
-
-            # Comparar cada palabra con tokens de nombres conocidos
-            for token in words:
-                if token in name_map:
-                    for target in name_map[token]:
-                        if target != sender:
-                            mention_counts.loc[sender, target] += 1
+        # Menciones por día calculadas una vez por chat; el rango solo recorta
+        mentions = get_mentions(dataset)
+        mention_matrix = mentions.matrix(*date_range)
+        mentions_by_month = mentions.per_period('M', *date_range)
 
         # Mostrar tabla
-        st.dataframe(mention_counts)
+        st.dataframe(mention_matrix)
+
+        st.subheader("Menciones recibidas por mes")
+        if not mentions_by_month.empty:
+            st.line_chart(
+                mentions_by_month.pivot_table(index='period', columns='target', values='mentions', aggfunc='sum')
+                .fillna(0).to_timestamp()
+            )
 
 
         # Heatmap
         st.subheader("Heatmap de menciones (por primer nombre)")
-        fig_mentions, ax_mentions = plt.subplots(figsize=(6, 4))
-        sns.heatmap(mention_counts, annot=True, fmt="d", cmap="Greens", ax=ax_mentions)
-        ax_mentions.set_xlabel("Mencionado")
-        ax_mentions.set_ylabel("Quien menciona")
-        st.pyplot(fig_mentions)
+        def draw(ax, matrix):
+            sns.heatmap(matrix, annot=True, fmt="d", cmap="Greens", ax=ax)
+            ax.set_xlabel("Mencionado")
+            ax.set_ylabel("Quien menciona")
+        show_chart("mention_heatmap", draw, mention_matrix, figsize=(6, 4))
 
 
 
 
     
-    with tab6:
+    if section == tab6:
         st.header("🧠 Análisis NLP: Tono Emocional y Relaciones")
 
-        import nltk
-        from nltk.tokenize import word_tokenize
-        from rapidfuzz import fuzz
-        from collections import defaultdict
-        import os
-
-        nltk.download('punkt')
-
-        keywords_path = "data/emotion_keywords.csv"
-
-        if not os.path.exists(keywords_path):
-            st.error(f"Keyword file not found: {keywords_path}")
-            st.stop()
-
-        try:
-            keywords_df = pd.read_csv(keywords_path)
-            keywords_df['tone'] = keywords_df['tone'].str.strip()
-            keywords_df['word'] = keywords_df['word'].str.strip().str.lower()
-        except Exception as e:
-            st.error(f"Error loading keyword file: {e}")
+        # El tono se calcula al cargar el chat (columna cacheada 'tone')
+        if tone_error:
+            st.error(tone_error)
             st.stop()
 
-        # Diccionario: tone -> list of words
-        tone_keywords = defaultdict(list)
-        for _, row in keywords_df.iterrows():
-            tone_keywords[row['tone']].append(row['word'])
-
-        import re
-        from collections import defaultdict
-        from rapidfuzz import fuzz
-
-        def simple_tokenize(text):
-            return re.findall(r'\b\w{2,}\b', text.lower())
-
-        def classify_tone_fuzzy(msg, threshold=85):
-            tokens = simple_tokenize(msg)
-            matches = defaultdict(int)
-            for tone, words in tone_keywords.items():
-                for word in words:
-                    for token in tokens:
-                        if fuzz.partial_ratio(token, word) >= threshold:
-                            matches[tone] += 1
-            return max(matches, key=matches.get) if matches else 'other'
-
-        df['tone'] = df['message'].apply(classify_tone_fuzzy)
-        # Remove 'other' category from tone column
-        df = df[df['tone'] != 'other']
+        # Tablas de tono a partir del cubo de tonos del chat
+        tone_tables = get_tone_tables(dataset, date_range)
 
         # Visualización principal
         st.subheader("Overall Tone Distribution")
-        st.bar_chart(df['tone'].value_counts())
+        st.bar_chart(tone_tables['counts'])
 
         st.subheader("Tone by User")
-        tone_user = df.groupby(['user', 'tone']).size().unstack(fill_value=0)
+        tone_user = tone_tables['by_user']
         st.dataframe(tone_user.style.highlight_max(axis=1))
 
         st.subheader("Tone Evolution Over Time")
-        tone_daily = df.groupby(['day', 'tone']).size().unstack(fill_value=0)
+        tone_daily = tone_tables['daily']
         st.area_chart(tone_daily)
 
         st.subheader("Top Tone per Day")
@@ -432,46 +741,54 @@ if uploaded_file:
             st.write(top_tone_day)
 
         st.subheader("Average Sentiment by User")
-        st.bar_chart(df.groupby('user')['sentiment'].mean().sort_values())
+        st.bar_chart(tone_tables['sentiment_by_user'])
 
         st.subheader("Tone Heatmap per User")
-        import seaborn as sns
-        import random
-        import matplotlib.pyplot as plt
-        fig, ax = plt.subplots(figsize=(10, 5))
-        sns.heatmap(tone_user, cmap='YlOrRd', annot=True, fmt='d', ax=ax)
-        st.pyplot(fig)
+        if tone_user.empty:
+            st.info("Ningún mensaje del rango seleccionado tiene un tono reconocido.")
+        else:
+            def draw(ax, tone_user):
+                sns.heatmap(tone_user, cmap='YlOrRd', annot=True, fmt='d', ax=ax)
+            show_chart("tone_heatmap", draw, tone_user, figsize=(10, 5))
 
 
 
 
 
-    with tab7:
+    if section == tab7:
         st.header("🧠 Chat Assistant (Búsqueda)")
 
-        st.markdown("Haz una pregunta o escribe palabras clave. Te mostraremos los mensajes relacionados.")
+        st.markdown(
+            "Haz una pregunta o escribe palabras clave. Te mostraremos los mensajes relacionados. "
+            "Usa `AND`/`OR` para combinar palabras, `cumple*` para buscar por prefijo y "
+            "`\"frase exacta\"` entre comillas."
+        )
 
         # Input del usuario
-        consulta = st.text_input("🔍 ¿Qué quieres saber del chat?", "")
+        consulta = st.text_input("🔍 ¿Qué quieres saber del chat?", key="search_query")
+
+        # Índice invertido persistente por chat (filtros de usuario/mes precalculados)
+        index = get_search_index(dataset)
 
         # Filtro opcional por usuario
-        usuarios = df['user'].dropna().unique().tolist()
-        usuario_filtrado = st.selectbox("👤 Filtrar por usuario (opcional)", ["Todos"] + usuarios)
+        usuarios = ["Todos"] + list(index.user_bitmaps)
+        drop_stale_choice("search_user", usuarios)
+        usuario_filtrado = st.selectbox("👤 Filtrar por usuario (opcional)", usuarios, key="search_user")
 
         # Filtro opcional por año o mes
-        fechas = df['datetime'].dt.to_period('M').astype(str).unique().tolist()
-        fecha_filtrada = st.selectbox("🗓️ Filtrar por mes (opcional)", ["Todos"] + fechas)
-
-        # Filtrado de DataFrame
-        resultados = df.copy()
-        if usuario_filtrado != "Todos":
-            resultados = resultados[resultados['user'] == usuario_filtrado]
-        if fecha_filtrada != "Todos":
-            resultados = resultados[resultados['datetime'].dt.to_period('M').astype(str) == fecha_filtrada]
+        meses = ["Todos"] + index.months
+        drop_stale_choice("search_month", meses)
+        fecha_filtrada = st.selectbox("🗓️ Filtrar por mes (opcional)", meses, key="search_month")
 
         if consulta.strip():
-            palabras = consulta.lower().split()
-            resultados = resultados[resultados['message'].str.lower().apply(lambda m: any(p in m for p in palabras))]
+            ids, _ = index.search(
+                consulta,
+                user=None if usuario_filtrado == "Todos" else usuario_filtrado,
+                month=None if fecha_filtrada == "Todos" else fecha_filtrada,
+                doc_range=(lo, hi),
+            )
+            # Ordenados por relevancia (BM25); ids son posiciones del chat completo
+            resultados = dataset.df.iloc[ids]
 
             if resultados.empty:
                 st.info("No se encontraron mensajes con esa consulta.")
@@ -486,321 +803,98 @@ if uploaded_file:
             st.info("Escribe algo arriba para buscar en el chat.")
             
 
-    with tab8:
-        st.header("🎮 WhatsApp Chat Game: ¿Quién lo dijo?")
-        st.write("Adivina quién envió el mensaje. ¡Pon a prueba tu memoria del chat!")
-
-
-        # Selecciona mensajes aleatorios que no sean multimedia ni enlaces ni vacíos
-        valid_msgs = df[
-            (~df['has_media']) &
-            (df['num_links'] == 0) &
-            (df['message'].str.len() > 10)
-        ]
-        if valid_msgs.empty:
-            st.info("No hay suficientes mensajes para jugar.")
-        else:
-            if 'game_idx' not in st.session_state:
-                st.session_state['game_idx'] = random.randint(0, len(valid_msgs) - 1)
-                st.session_state['score'] = 0
-                st.session_state['attempts'] = 0
-
-            msg_row = valid_msgs.iloc[st.session_state['game_idx']]
-            st.write(f"**Mensaje:** _{msg_row['message']}_")
-
-            opciones = list(df['user'].dropna().unique())
-            random.shuffle(opciones)
-            if msg_row['user'] not in opciones[:4]:
-                opciones = opciones[:3] + [msg_row['user']]
-                random.shuffle(opciones)
-            else:
-                opciones = opciones[:4]
-
-            respuesta = st.radio(
-                "¿Quién lo dijo?", 
-                opciones, 
-                key=f"radio_1_{st.session_state['game_idx']}"
-            )
+    if section == tab8:
+        # Mensajes válidos para el juego (sin multimedia ni enlaces, más de 10 caracteres), por chat
+        game_positions = get_game_messages(dataset)
+        game_positions = game_positions[np.searchsorted(game_positions, lo):np.searchsorted(game_positions, hi)]
+        who_said_it_game(dataset.df.iloc[game_positions].reset_index(drop=True), user_msg_count.index.tolist())
+        # Palabras candidatas y conteos por usuario desde el índice de términos
+        word_game(get_term_store(dataset), date_range)
 
-            if st.button("Comprobar"):
-                st.session_state['attempts'] += 1
-                if respuesta == msg_row['user']:
-                    st.success("¡Correcto! 🎉")
-                    st.session_state['score'] += 1
-                else:
-                    st.error(f"Incorrecto. Era: {msg_row['user']}")
-                # Siguiente pregunta
-                st.session_state['game_idx'] = random.randint(0, len(valid_msgs) - 1)
-
-            st.write(f"Puntaje: {st.session_state['score']} / {st.session_state['attempts']}")
-
-        st.header("🎲 ¿Quién dijo esta palabra más veces?")
-        st.write("Adivina quién ha dicho más veces una palabra elegida al azar.")
-
-        # Palabras candidatas (excluyendo palabras comunes)
-        all_words = ' '.join(df['message'].tolist())
-        words = re.findall(r'\b\w+\b', all_words.lower())
-        stopwords = set([
-            "multimedia", "media", "omitido", "enlace", "link", "null", "mensaje", "este", "eliminado",
-            "elimino", "eliminó", "omitted", "https", "status", "deleted", "para", "pero", "como", "todo",
-            "esta", "esta", "con", "que", "los", "las", "por", "una", "unos", "unas", "del", "sus", "muy",
-            "más", "menos", "tiene", "tienen", "fue", "son", "era", "eres", "soy", "han", "hay", "aqui",
-            "aquí", "ese", "esa"
-        ])
-        words = [w for w in words if len(w) > 3 and w not in stopwords]
-        if words:
-            if 'word_game_word' not in st.session_state:
-                st.session_state['word_game_word'] = random.choice(words)
-                st.session_state['word_game_score'] = 0
-                st.session_state['word_game_attempts'] = 0
-
-            word = st.session_state['word_game_word']
-
-            st.write(f"**Palabra:** _{word}_")
-
-            # Contar ocurrencias por usuario
-            word_counts = df['message'].str.lower().str.count(rf'\b{re.escape(word)}\b')
-            user_counts = df.groupby('user').apply(lambda x: x['message'].str.lower().str.count(rf'\b{re.escape(word)}\b').sum())
-            user_counts = user_counts[user_counts > 0]
-            opciones_word = user_counts.index.tolist()
-            if len(opciones_word) < 2:
-                st.info("No hay suficientes usuarios que hayan dicho esta palabra. Se elige otra palabra.")
-                st.session_state['word_game_word'] = random.choice(words)
-            else:
-                random.shuffle(opciones_word)
-                respuesta_word = st.radio(
-    "¿Quién dijo esta palabra más veces?", 
-    opciones_word, 
-    key=f"radio_2_{word}_{st.session_state['word_game_attempts']}"
-)
-
-                if st.button("Comprobar palabra"):
-                    st.session_state['word_game_attempts'] += 1
-                    ganador = user_counts.idxmax()
-                    if respuesta_word == ganador:
-                        st.success(f"¡Correcto! {ganador} dijo '{word}' {user_counts.max()} veces.")
-                        st.session_state['word_game_score'] += 1
-                    else:
-                        st.error(f"Incorrecto. Era: {ganador} ({user_counts.max()} veces).")
-                    # Siguiente palabra
-                    st.session_state['word_game_word'] = random.choice(words)
-
-                st.write(f"Puntaje: {st.session_state['word_game_score']} / {st.session_state['word_game_attempts']}")
-        else:
-            st.info("No hay suficientes palabras para jugar a este juego.")
-    with tab8:
-        st.header("🎮 WhatsApp Chat Game: ¿Quién lo dijo?")
-        st.write("Adivina quién envió el mensaje. ¡Pon a prueba tu memoria del chat!")
-
-        # Filtrar mensajes válidos para el juego
-        valid_msgs = df[
-            (~df['has_media']) &
-            (df['num_links'] == 0) &
-            (df['message'].str.len() > 10)
-        ].reset_index(drop=True)
-
-        if valid_msgs.empty:
-            st.info("No hay suficientes mensajes para jugar.")
-        else:
-            # Inicializar estado del juego
-            if 'game_score' not in st.session_state:
-                st.session_state['game_score'] = 0
-            if 'game_attempts' not in st.session_state:
-                st.session_state['game_attempts'] = 0
-            if 'game_idx' not in st.session_state:
-                st.session_state['game_idx'] = np.random.randint(len(valid_msgs))
+    if section == tab9:
+        st.header("📬 Comparador de Chats Individuales")
 
-            # Seleccionar mensaje actual
-            msg_row = valid_msgs.iloc[st.session_state['game_idx']]
-            st.write(f"**Mensaje:** _{msg_row['message']}_")
-
-            # Opciones de usuario (4 aleatorias, incluyendo la correcta)
-            all_users = df['user'].dropna().unique().tolist()
-            opciones = set(np.random.choice(all_users, min(4, len(all_users)), replace=False))
-            opciones.add(msg_row['user'])
-            opciones = list(opciones)
-            np.random.shuffle(opciones)
-
-            respuesta = st.radio(
-                "¿Quién lo dijo?",
-                opciones,
-                key=f"radio_game_{st.session_state['game_idx']}_{st.session_state['game_attempts']}"
-            )
+        st.markdown("Sube **dos o más archivos de WhatsApp** para compararlos y selecciona quién eres tú.")
 
-            col1, col2 = st.columns(2)
-            with col1:
-                if st.button("Comprobar"):
-                    st.session_state['game_attempts'] += 1
-                    if respuesta == msg_row['user']:
-                        st.success("¡Correcto! 🎉")
-                        st.session_state['game_score'] += 1
-                    else:
-                        st.error(f"Incorrecto. Era: {msg_row['user']}")
-            with col2:
-                if st.button("Siguiente"):
-                    st.session_state['game_idx'] = np.random.randint(len(valid_msgs))
-
-            st.write(f"Puntaje: {st.session_state['game_score']} / {st.session_state['game_attempts']}")
-
-        st.header("🎲 ¿Quién dijo esta palabra más veces?")
-        st.write("Adivina quién ha dicho más veces una palabra elegida al azar.")
-
-        # Preparar palabras candidatas
-        all_words = re.findall(r'\b\w+\b', ' '.join(df['message'].tolist()).lower())
-        stopwords = set([
-            "multimedia", "media", "omitido", "enlace", "link", "null", "mensaje", "este", "eliminado",
-            "elimino", "eliminó", "omitted", "https", "status", "deleted", "para", "pero", "como", "todo",
-            "esta", "con", "que", "los", "las", "por", "una", "unos", "unas", "del", "sus", "muy",
-            "más", "menos", "tiene", "tienen", "fue", "son", "era", "eres", "soy", "han", "hay", "aqui",
-            "aquí", "ese", "esa"
-        ])
-        words = [w for w in all_words if len(w) > 3 and w not in stopwords]
-
-        if words:
-            if 'word_game_score' not in st.session_state:
-                st.session_state['word_game_score'] = 0
-            if 'word_game_attempts' not in st.session_state:
-                st.session_state['word_game_attempts'] = 0
-            if 'word_game_word' not in st.session_state:
-                st.session_state['word_game_word'] = np.random.choice(words)
-
-            word = st.session_state['word_game_word']
-            st.write(f"**Palabra:** _{word}_")
-
-            # Contar ocurrencias por usuario
-            user_counts = df.groupby('user')['message'].apply(lambda msgs: msgs.str.lower().str.count(rf'\b{re.escape(word)}\b').sum())
-            user_counts = user_counts[user_counts > 0]
-            opciones_word = user_counts.index.tolist()
-
-            if len(opciones_word) < 2:
-                st.info("No hay suficientes usuarios que hayan dicho esta palabra. Se elige otra palabra.")
-                st.session_state['word_game_word'] = np.random.choice(words)
-            else:
-                np.random.shuffle(opciones_word)
-                respuesta_word = st.radio(
-                    "¿Quién dijo esta palabra más veces?",
-                    opciones_word,
-                    key=f"radio_word_{word}_{st.session_state['word_game_attempts']}"
-                )
+        st.file_uploader(
+            "Chats (.txt)", type="txt", accept_multiple_files=True, key="compare_chats",
+            on_change=remember_compare_files,
+        )
+        files = st.session_state.get("compare_files", [])
+        if files and not st.session_state.get("compare_chats"):
+            st.caption("Comparando los chats subidos antes: " + ", ".join(name for name, _ in files))
 
-                colw1, colw2 = st.columns(2)
-                with colw1:
-                    if st.button("Comprobar palabra"):
-                        st.session_state['word_game_attempts'] += 1
-                        ganador = user_counts.idxmax()
-                        if respuesta_word == ganador:
-                            st.success(f"¡Correcto! {ganador} dijo '{word}' {user_counts.max()} veces.")
-                            st.session_state['word_game_score'] += 1
-                        else:
-                            st.error(f"Incorrecto. Era: {ganador} ({user_counts.max()} veces).")
-                with colw2:
-                    if st.button("Siguiente palabra"):
-                        st.session_state['word_game_word'] = np.random.choice(words)
-
-                st.write(f"Puntaje: {st.session_state['word_game_score']} / {st.session_state['word_game_attempts']}")
+        if len(files) < 2:
+            st.info("Sube al menos dos chats para compararlos.")
         else:
-            st.info("No hay suficientes palabras para jugar a este juego.")
+            # Chats ya procesados (también el de la vista principal) salen de la caché
+            with stage("compare:load"):
+                compare_keys, compare_datasets = load_compare_chats(files, tone_classifier, sentiment_method)
 
-    with tab9:
-        st.header("📬 Comparador de Chats Individuales")
-    
-        st.markdown("Sube **dos archivos de WhatsApp** para compararlos y selecciona quién eres tú.")
-    
-        file1 = st.file_uploader("Chat 1 (.txt)", type="txt", key="chat1")
-        file2 = st.file_uploader("Chat 2 (.txt)", type="txt", key="chat2")
-    
-        def parse_chat(uploaded_file):
-            raw = uploaded_file.read().decode("utf-8")
-            lines = raw.splitlines()
-            rows = []
-            pattern = r'^(\d{1,2}/\d{1,2}/\d{2,4}), (\d{1,2}:\d{2}) - ([^:]+): (.*)$'
-            for line in lines:
-                match = re.match(pattern, line)
-                if match:
-                    date, time, user, msg = match.groups()
-                    try:
-                        dt = datetime.strptime(f"{date} {time}", "%d/%m/%Y %H:%M")
-                    except:
-                        try:
-                            dt = datetime.strptime(f"{date} {time}", "%d/%m/%y %H:%M")
-                        except:
-                            continue
-                    rows.append({'datetime': dt, 'user': user.strip(), 'message': msg.strip()})
-            return pd.DataFrame(rows)
-    
-        if file1 and file2:
-            df1 = parse_chat(file1)
-            df2 = parse_chat(file2)
-    
-            if df1.empty or df2.empty:
+            if any(d.df.empty for d in compare_datasets):
                 st.warning("No se pudieron leer correctamente los archivos.")
                 st.stop()
-    
-            users_1 = sorted(df1['user'].unique().tolist())
-            users_2 = sorted(df2['user'].unique().tolist())
-            all_users = list(set(users_1 + users_2))
-    
-            selected_user = st.selectbox("¿Cuál es tu nombre en los chats?", all_users)
-    
-            # Eliminar tus propios mensajes
-            df1 = df1[df1['user'] != selected_user]
-            df2 = df2[df2['user'] != selected_user]
-    
-            # Preparar métricas
-            def enrich(df):
-                df['date'] = df['datetime'].dt.date
-                df['hour'] = df['datetime'].dt.hour
-                df['num_words'] = df['message'].apply(lambda x: len(x.split()))
-                df['sentiment'] = df['message'].apply(get_sentiment)
-                return df
-    
-            df1 = enrich(df1)
-            df2 = enrich(df2)
-    
-            col_a, col_b = st.columns(2)
-    
-            with col_a:
-                st.subheader("📁 Chat 1")
-                st.metric("Mensajes totales", len(df1))
-                st.metric("Palabras totales", df1['num_words'].sum())
-                st.metric("Media de palabras por mensaje", round(df1['num_words'].mean(), 2))
-                st.metric("Sentimiento medio", round(df1['sentiment'].mean(), 2))
-                st.metric("Media de mensajes por día", round(df1.groupby('date').size().mean(), 2))
-    
-            with col_b:
-                st.subheader("📁 Chat 2")
-                st.metric("Mensajes totales", len(df2))
-                st.metric("Palabras totales", df2['num_words'].sum())
-                st.metric("Media de palabras por mensaje", round(df2['num_words'].mean(), 2))
-                st.metric("Sentimiento medio", round(df2['sentiment'].mean(), 2))
-                st.metric("Media de mensajes por día", round(df2.groupby('date').size().mean(), 2))
-    
+
+            # Nombre de archivo como etiqueta (numerado si se repite)
+            labels = [name for name, _ in files]
+            labels = [f"{name} ({i + 1})" if labels.count(name) > 1 else name for i, name in enumerate(labels)]
+
+            all_users = sorted(set().union(*(d.df['user'].cat.categories for d in compare_datasets)))
+            drop_stale_choice("compare_user", all_users)
+            selected_user = st.selectbox("¿Cuál es tu nombre en los chats?", all_users, key="compare_user")
+
+            # Eliminar tus propios mensajes: máscara sobre los datos cacheados, sin reprocesar
+            cubes = {
+                label: get_activity_cube(d, key).without([selected_user])
+                for label, key, d in zip(labels, compare_keys, compare_datasets)
+            }
+            words = {
+                label: d.df['num_words'][(d.df['user'] != selected_user).to_numpy()]
+                for label, d in zip(labels, compare_datasets)
+            }
+
+            summary = pd.DataFrame({
+                label: {
+                    "Mensajes totales": cube.cells['messages'].sum(),
+                    "Palabras totales": cube.cells['words'].sum(),
+                    "Media de palabras por mensaje": cube.cells['words'].sum() / max(cube.cells['messages'].sum(), 1),
+                    "Sentimiento medio": cube.cells['sentiment'].sum() / max(cube.cells['messages'].sum(), 1),
+                    "Media de mensajes por día": cube.reduce('day').mean(),
+                }
+                for label, cube in cubes.items()
+            })
+            st.dataframe(summary.round(2))
+
             st.subheader("📊 Evolución temporal (mensajes por día)")
-            df1_daily = df1.groupby('date').size().rename("Chat 1")
-            df2_daily = df2.groupby('date').size().rename("Chat 2")
-            combined = pd.concat([df1_daily, df2_daily], axis=1).fillna(0)
-            st.line_chart(combined)
-    
+            st.line_chart(pd.concat({label: cube.reduce('day') for label, cube in cubes.items()}, axis=1, sort=True).fillna(0))
+
             st.subheader("📉 Sentimiento por día")
-            sent_1 = df1.groupby('date')['sentiment'].mean().rename("Chat 1")
-            sent_2 = df2.groupby('date')['sentiment'].mean().rename("Chat 2")
-            st.line_chart(pd.concat([sent_1, sent_2], axis=1).fillna(0))
-    
+            st.line_chart(
+                pd.concat({label: cube.mean('day', 'sentiment') for label, cube in cubes.items()}, axis=1, sort=True).fillna(0)
+            )
+
             st.subheader("📈 Palabras por mensaje (distribución)")
-            fig, ax = plt.subplots()
-            sns.histplot(df1['num_words'], label="Chat 1", color="blue", kde=True)
-            sns.histplot(df2['num_words'], label="Chat 2", color="green", kde=True)
-            ax.legend()
-            ax.set_xlabel("Palabras por mensaje")
-            st.pyplot(fig)
-    
+            def draw(ax, labels, *per_chat):
+                for label, values in zip(labels, per_chat):
+                    sns.histplot(values, label=label, kde=True, ax=ax)
+                ax.legend()
+                ax.set_xlabel("Palabras por mensaje")
+            show_chart("compare_words", draw, labels, *words.values())
+
             st.subheader("🔁 Actividad por hora")
-            fig2, ax2 = plt.subplots()
-            sns.histplot(df1['hour'], bins=24, color="blue", label="Chat 1", kde=False, alpha=0.6)
-            sns.histplot(df2['hour'], bins=24, color="green", label="Chat 2", kde=False, alpha=0.6)
-            ax2.legend()
-            ax2.set_xlabel("Hora del día")
-            st.pyplot(fig2)
+            def draw(ax, labels, *per_chat):
+                for label, hourly in zip(labels, per_chat):
+                    sns.histplot(x=hourly.index, weights=hourly.to_numpy(), bins=24, label=label, kde=False,
+                                 alpha=0.6, ax=ax)
+                ax.legend()
+                ax.set_xlabel("Hora del día")
+            show_chart("compare_hours", draw, labels, *(cube.reduce('hour') for cube in cubes.values()))
+
+    if profiler is not None:
+        profiler.add(f"section:{section}", section_start)
 
 else:
     st.info("Please upload a WhatsApp chat file to begin.")
+
+if profiler is not None:
+    show_profile(profiler)
@@ -0,0 +1,218 @@
+"""Headless analysis of every WhatsApp export in a directory.
+
+Usage: python batch_report.py EXPORTS_DIR [-o REPORTS_DIR] [-j WORKERS]
+                              [--sentiment pattern|lexicon] [--format parquet|json]
+
+Each export is parsed and enriched with the same pipeline as the app, in a
+process pool, and gets a folder in REPORTS_DIR with summary.json (totals,
+per-user stats, sentiment, tone, top terms and emojis, streaks and timings)
+plus the activity cube, reply matrix, mentions, tone per user and daily
+sentiment as Parquet (or JSON) tables. index.json lists every chat with the
+run's throughput. Sentiment defaults to 'pattern', the app's default, so the
+numbers match what the app shows; 'lexicon' is much faster on large exports.
+"""
+import argparse
+import json
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+import pandas as pd
+
+from analytics import ActivityCube, MentionCounts, activity_streaks, count_replies
+from emoji_stats import EmojiStats
+from pipeline import build_chat_dataset, chat_key
+from term_frequency import TermFrequencyStore
+from tone import KEYWORDS_PATH, load_tone_classifier
+
+TOP_ITEMS = 20
+
+
+def find_exports(directory):
+    """Sorted paths of the .txt exports in directory (not recursive)."""
+    return sorted(
+        os.path.join(directory, name) for name in os.listdir(directory)
+        if name.lower().endswith('.txt') and os.path.isfile(os.path.join(directory, name))
+    )
+
+
+def _keywords_path(path):
+    # The default path is relative to the repository, not to the working directory
+    if os.path.exists(path) or os.path.isabs(path):
+        return path
+    return os.path.join(os.path.dirname(os.path.abspath(__file__)), path)
+
+
+def user_stats(df):
+    stats = df.groupby('user', observed=True).agg(
+        messages=('message', 'size'),
+        words=('num_words', 'sum'),
+        links=('num_links', 'sum'),
+        media=('has_media', 'sum'),
+        emojis=('num_emojis', 'sum'),
+        mean_sentiment=('sentiment', 'mean'),
+    )
+    return {user: {k: (float(v) if k == 'mean_sentiment' else int(v)) for k, v in row.items()}
+            for user, row in stats.iterrows()}
+
+
+def _series_dict(series):
+    return {str(k): int(v) for k, v in series.items()}
+
+
+def chat_tables(df):
+    """Per-chat tables written next to summary.json, as DataFrames."""
+    cube = ActivityCube(df)
+    replies = count_replies(df).rename_axis(index='replied_to', columns='replier').stack().rename('replies')
+    mentions = MentionCounts(df)
+    names = pd.Series(mentions.users, dtype=object)
+    per_day = mentions.per_day.assign(
+        sender=names.to_numpy()[mentions.per_day['sender'].to_numpy()],
+        target=names.to_numpy()[mentions.per_day['target'].to_numpy()],
+    )
+    tone = df[df['tone'] != 'other'].groupby(['user', 'tone'], observed=True).size().rename('messages')
+    sentiment = pd.DataFrame({
+        'messages': cube.reduce('day'),
+        'mean_sentiment': cube.mean('day', 'sentiment'),
+    })
+    return {
+        'activity_cube': cube.cells,
+        'replies': replies[replies > 0].reset_index(),
+        'mentions': per_day,
+        'tone_by_user': tone.reset_index(),
+        'sentiment_daily': sentiment.reset_index(),
+    }
+
+
+def write_table(df, path_stem, table_format):
+    if table_format == 'parquet':
+        df.to_parquet(path_stem + '.parquet', index=False)
+    else:
+        df.to_json(path_stem + '.json', orient='records', date_format='iso', force_ascii=False)
+
+
+def analyze_export(path, output_dir, sentiment_method='pattern', table_format='parquet', keywords_path=KEYWORDS_PATH):
+    """Build one chat's report; returns its index entry (counts and timings)."""
+    timings = {}
+    start = time.perf_counter()
+    with open(path, 'rb') as f:
+        raw = f.read()
+    tone_classifier = load_tone_classifier(_keywords_path(keywords_path))
+    dataset = build_chat_dataset(raw, tone_classifier, sentiment_method, os.path.basename(path))
+    df = dataset.df
+    timings['parse_enrich'] = time.perf_counter() - start
+
+    name = os.path.splitext(os.path.basename(path))[0]
+    chat_dir = os.path.join(output_dir, name)
+    os.makedirs(chat_dir, exist_ok=True)
+    # Same key the app caches the chat under (content, pipeline, sentiment, tone keywords)
+    entry = {'name': name, 'path': path, 'bytes': len(raw), 'messages': len(df),
+             'key': list(chat_key(raw, sentiment_method, tone_classifier))}
+    if df.empty:
+        entry['seconds'] = {**timings, 'total': time.perf_counter() - start}
+        with open(os.path.join(chat_dir, 'summary.json'), 'w', encoding='utf-8') as f:
+            json.dump(entry, f, ensure_ascii=False, indent=2)
+        return entry
+
+    step = time.perf_counter()
+    terms = TermFrequencyStore(df)
+    emojis = EmojiStats(df)
+    streaks = activity_streaks(df, n=5)
+    tones = df['tone'].value_counts()
+    summary = {
+        **entry,
+        'chat_format': df.attrs.get('chat_format'),
+        'first_message': df['datetime'].iloc[0].isoformat(),
+        'last_message': df['datetime'].iloc[-1].isoformat(),
+        'users': int(df['user'].nunique()),
+        'words': int(df['num_words'].sum()),
+        'links': int(df['num_links'].sum()),
+        'media': int(df['has_media'].sum()),
+        'emojis': int(df['num_emojis'].sum()),
+        'message_types': _series_dict(df['message_type'].value_counts()),
+        'sentiment': {k: float(v) for k, v in df['sentiment'].describe().drop('count').items()},
+        'tone': _series_dict(tones[tones > 0]),
+        'per_user': user_stats(df),
+        'top_terms': _series_dict(terms.top_terms(TOP_ITEMS)),
+        'top_emojis': _series_dict(emojis.top(TOP_ITEMS)),
+        'streaks': json.loads(streaks.to_json(orient='records', date_format='iso')),
+    }
+    tables = chat_tables(df)
+    timings['aggregates'] = time.perf_counter() - step
+
+    step = time.perf_counter()
+    for table, frame in tables.items():
+        write_table(frame, os.path.join(chat_dir, table), table_format)
+    timings['write'] = time.perf_counter() - step
+    timings['total'] = time.perf_counter() - start
+    summary['seconds'] = timings
+    with open(os.path.join(chat_dir, 'summary.json'), 'w', encoding='utf-8') as f:
+        json.dump(summary, f, ensure_ascii=False, indent=2)
+    return {**entry, 'seconds': timings}
+
+
+def run_batch(paths, output_dir, workers=None, sentiment_method='pattern', table_format='parquet',
+              keywords_path=KEYWORDS_PATH):
+    """Analyze every export in a process pool; returns the index written to index.json."""
+    os.makedirs(output_dir, exist_ok=True)
+    workers = workers or os.cpu_count() or 1
+    start = time.perf_counter()
+    chats, failed = [], []
+    args = (output_dir, sentiment_method, table_format, keywords_path)
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        futures = {pool.submit(analyze_export, path, *args): path for path in paths}
+        for future in as_completed(futures):
+            path = futures[future]
+            try:
+                entry = future.result()
+            except Exception as e:
+                failed.append({'path': path, 'error': repr(e)})
+                print(f"FAILED {path}: {e!r}", file=sys.stderr)
+                continue
+            chats.append(entry)
+            print(f"{entry['name']}: {entry['messages']:,} messages in {entry['seconds']['total']:.2f}s")
+
+    seconds = time.perf_counter() - start
+    messages = sum(c['messages'] for c in chats)
+    size = sum(c['bytes'] for c in chats)
+    index = {
+        'workers': workers,
+        'sentiment_method': sentiment_method,
+        'seconds': seconds,
+        'chats': sorted(chats, key=lambda c: c['name']),
+        'failed': failed,
+        'messages': messages,
+        'messages_per_second': messages / seconds if seconds else 0.0,
+        'megabytes_per_second': size / 2 ** 20 / seconds if seconds else 0.0,
+    }
+    with open(os.path.join(output_dir, 'index.json'), 'w', encoding='utf-8') as f:
+        json.dump(index, f, ensure_ascii=False, indent=2)
+    return index
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Batch WhatsApp chat reports.")
+    parser.add_argument('exports', help="directory with exported .txt chats")
+    parser.add_argument('-o', '--output', default='reports', help="reports directory (default: reports)")
+    parser.add_argument('-j', '--workers', type=int, default=None, help="worker processes (default: all cores)")
+    parser.add_argument('--sentiment', choices=['pattern', 'lexicon'], default='pattern',
+                        help="sentiment method (default: pattern, as in the app)")
+    parser.add_argument('--format', choices=['parquet', 'json'], default='parquet', help="format of the tables")
+    parser.add_argument('--keywords', default=KEYWORDS_PATH, help="tone keyword CSV")
+    args = parser.parse_args(argv)
+
+    if not os.path.isdir(args.exports):
+        parser.error(f"not a directory: {args.exports}")
+    paths = find_exports(args.exports)
+    if not paths:
+        parser.error(f"no .txt exports in {args.exports}")
+    index = run_batch(paths, args.output, args.workers, args.sentiment, args.format, args.keywords)
+    print(f"{len(index['chats'])} chats, {index['messages']:,} messages in {index['seconds']:.1f}s "
+          f"({index['messages_per_second']:,.0f} msg/s, {index['megabytes_per_second']:.1f} MB/s, "
+          f"{index['workers']} workers)")
+    return 1 if index['failed'] else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
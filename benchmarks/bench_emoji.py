@@ -0,0 +1,67 @@
+"""Emoji extraction: the old per-character scan against features.extract_emojis.
+
+Usage: python benchmarks/bench_emoji.py [chat.txt] [repeat]
+
+Without a chat file a synthetic corpus with skin tones, flags and ZWJ
+families is used. Both timings and the top emojis of each method are printed;
+the character scan splits multi-codepoint emojis into their parts.
+"""
+import os
+import sys
+import time
+from collections import Counter
+
+import emoji
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from data_parser import read_chat  # noqa: E402
+from features import emoji_tables, extract_emojis  # noqa: E402
+
+SAMPLES = [
+    "jajaja 😂😂", "vale 👍🏽", "¡vamos! 🇪🇸", "familia 👨‍👩‍👧‍👦", "te quiero ❤️",
+    "ok", "nos vemos mañana", "#️⃣ hashtag", "🙏🏻 gracias", "buenas noches 😴",
+]
+
+
+def synthetic_messages(n, seed=0):
+    rng = np.random.default_rng(seed)
+    return pd.Series(np.asarray(SAMPLES, dtype=object)[rng.integers(len(SAMPLES), size=n)])
+
+
+def char_scan(messages):
+    # What tab4 used to do
+    all_words = ' '.join(messages.tolist())
+    return Counter(c for c in all_words if c in emoji.EMOJI_DATA)
+
+
+def engine(messages):
+    return Counter(extract_emojis(messages).tolist())
+
+
+def best_of(func, messages, repeat):
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = func(messages)
+        times.append(time.perf_counter() - start)
+    return min(times), result
+
+
+def main():
+    path = sys.argv[1] if len(sys.argv) > 1 else None
+    repeat = int(sys.argv[2]) if len(sys.argv) > 2 else 3
+    messages = read_chat(path)['message'] if path else synthetic_messages(200_000)
+    emoji_tables()  # build once, outside the timings
+
+    for name, func in (("char scan", char_scan), ("features", engine)):
+        seconds, counts = best_of(func, messages, repeat)
+        print(f"{name:12} {seconds:8.3f}s  {len(messages) / seconds:12,.0f} msg/s  "
+              f"{sum(counts.values()):,} emojis")
+        print("             top:", ' '.join(f"{e}×{c}" for e, c in counts.most_common(8)))
+
+
+if __name__ == "__main__":
+    main()
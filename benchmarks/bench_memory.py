@@ -0,0 +1,53 @@
+"""Bytes per message of the enriched frame: previous layout against the compact one.
+
+Usage: python benchmarks/bench_memory.py chat.txt
+
+The previous layout is rebuilt from the compact frame (object date/day/time
+columns, Period month, string weekday/user/tone, int64 counters and a
+message_length copy of num_words), so both reports describe the same chat.
+"""
+import os
+import sys
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from pipeline import build_chat_frame, memory_report  # noqa: E402
+
+
+def legacy_layout(df):
+    dt = df['datetime']
+    return pd.DataFrame({
+        'datetime': dt,
+        'user': df['user'].astype(str),
+        'message': df['message'],
+        'date': dt.dt.date,
+        'time': dt.dt.time,
+        'hour': dt.dt.hour,
+        'day': dt.dt.date,
+        'month': dt.dt.to_period('M'),
+        'weekday': dt.dt.day_name(),
+        'num_words': df['num_words'].astype(np.int64),
+        'has_media': df['has_media'],
+        'num_links': df['num_links'].astype(np.int64),
+        'sentiment': df['sentiment'].astype(np.float64),
+        'tone': df['tone'].astype(str),
+        'message_length': df['num_words'].astype(np.int64),
+    })
+
+
+def main():
+    df = build_chat_frame(sys.argv[1], sentiment_method='lexicon')
+    before, after = memory_report(legacy_layout(df)), memory_report(df)
+    table = pd.concat({'before': before['bytes_per_message'], 'after': after['bytes_per_message']}, axis=1)
+    print(f"{len(df):,} messages")
+    print(table.fillna(0).round(1).to_string())
+    total_before, total_after = before['bytes'].sum(), after['bytes'].sum()
+    print(f"total: {total_before / len(df):.1f} -> {total_after / len(df):.1f} bytes/message "
+          f"({total_before / 2 ** 20:.1f} MiB -> {total_after / 2 ** 20:.1f} MiB)")
+
+
+if __name__ == "__main__":
+    main()
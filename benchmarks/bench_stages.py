@@ -0,0 +1,253 @@
+"""Time and memory per pipeline stage, written as a JSON baseline.
+
+Usage: python benchmarks/bench_stages.py [--chat chat.txt | -n MESSAGES [generator options]]
+           [--repeat N] [--stages parse,features,...] [--sentiment-sample N]
+           [-o results.json] [--baseline previous.json]
+
+Without --chat a synthetic export is generated (see synthetic_chat.py) with
+the same options (--users, --format, --locale, --days, --start, the
+--multiline/--media/--links/--emojis/--deleted/--mentions rates and --seed),
+so two runs with the same arguments time the same bytes.
+Every stage runs --repeat times and keeps the best wall time; the peak
+traced allocation (tracemalloc: Python objects and NumPy buffers, not Arrow
+memory) comes from one extra run, so tracing does not slow the timings.
+Scorers and classifiers are rebuilt for each run, so no stage is timed
+against a warm cache. With --baseline, each stage is printed with its ratio
+to the stored result.
+"""
+import argparse
+import json
+import os
+import platform
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+
+import numpy as np
+import pandas as pd
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from analytics import (  # noqa: E402
+    ActivityCube, DateRangeIndex, MentionCounts, Sessions, activity_streaks, count_replies,
+)
+from chat_cache import DiskChatCache  # noqa: E402
+from data_parser import parse_whatsapp_chat, read_chat  # noqa: E402
+from emoji_stats import EmojiStats  # noqa: E402
+from features import message_features  # noqa: E402
+from pipeline import build_chat_frame  # noqa: E402
+from search_index import ChatSearchIndex  # noqa: E402
+from sentiment import SentimentScorer  # noqa: E402
+from synthetic_chat import FORMATS, LOCALES, RATES, add_rate_options, generate_chat  # noqa: E402
+from term_frequency import TermFrequencyStore  # noqa: E402
+from tone import KEYWORDS_PATH, ToneClassifier  # noqa: E402
+
+SEARCH_QUERIES = ['hola', 'cena OR party', 'ca*', '"vamos a"', 'the weekend']
+
+
+def _tone_classifier(ctx):
+    return ToneClassifier(ctx['keywords']) if ctx['keywords'] is not None else None
+
+
+def _tone(ctx):
+    if ctx['keywords'] is None:
+        return None
+    return lambda: _tone_classifier(ctx).classify(ctx['df']['message']), len(ctx['df'])
+
+
+def _sentiment(method, sample=False):
+    def stage(ctx):
+        messages = ctx['df']['message']
+        if sample:
+            messages = messages.iloc[:ctx['sentiment_sample']]
+        return lambda: SentimentScorer(method).score(messages), len(messages)
+    return stage
+
+
+def _on_frame(build):
+    def stage(ctx):
+        return lambda: build(ctx['df']), len(ctx['df'])
+    return stage
+
+
+def _search(ctx):
+    index = ChatSearchIndex(ctx['df'])
+    return lambda: [index.search(q) for q in SEARCH_QUERIES], len(SEARCH_QUERIES)
+
+
+def _cache_write(ctx):
+    cache = DiskChatCache(ctx['tmp'])
+    return lambda: cache.put(('bench', 'write'), ctx['df'], name='bench'), len(ctx['df'])
+
+
+def _cache_read(ctx):
+    cache = DiskChatCache(ctx['tmp'])
+    cache.put(('bench', 'read'), ctx['df'], name='bench')
+    # Materialize every column, as the app does when it filters the frame
+    return lambda: cache.get(('bench', 'read'))[0].memory_usage(deep=True), len(ctx['df'])
+
+
+# name -> stage(ctx) returning (callable to time, items it processes), or None to skip
+STAGES = {
+    'parse': lambda ctx: (lambda: read_chat(ctx['path']), ctx['messages']),
+    'parse_whatsapp_chat': lambda ctx: (lambda: parse_whatsapp_chat(ctx['path']), ctx['messages']),
+    'features': _on_frame(lambda df: message_features(df['message'])),
+    'sentiment_lexicon': _sentiment('lexicon'),
+    'sentiment_pattern': _sentiment('pattern', sample=True),
+    'tone': _tone,
+    'enrich': lambda ctx: (
+        lambda: build_chat_frame(ctx['path'], _tone_classifier(ctx), 'lexicon'), ctx['messages']
+    ),
+    'date_index': _on_frame(DateRangeIndex),
+    'activity_cube': _on_frame(ActivityCube),
+    'term_store': _on_frame(TermFrequencyStore),
+    'emoji_stats': _on_frame(EmojiStats),
+    'mentions': _on_frame(MentionCounts),
+    'replies': _on_frame(count_replies),
+    'sessions': _on_frame(Sessions),
+    'streaks': _on_frame(lambda df: activity_streaks(df, by_user=True)),
+    'search_index': _on_frame(ChatSearchIndex),
+    'search_queries': _search,
+    'cache_write': _cache_write,
+    'cache_read': _cache_read,
+}
+
+
+def time_stage(run, repeat):
+    runs = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        run()
+        runs.append(time.perf_counter() - start)
+    tracemalloc.start()
+    try:
+        run()
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    return runs, peak
+
+
+def git_commit():
+    try:
+        return subprocess.run(['git', 'rev-parse', 'HEAD'], cwd=ROOT, capture_output=True, text=True,
+                              check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def environment():
+    import pyarrow
+    return {
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'cpu_count': os.cpu_count(),
+        'numpy': np.__version__,
+        'pandas': pd.__version__,
+        'pyarrow': pyarrow.__version__,
+        'git_commit': git_commit(),
+    }
+
+
+def run_benchmarks(path, names, repeat=3, sentiment_sample=20_000, keywords_path=KEYWORDS_PATH):
+    """{stage: result} for the export at path; the enriched frame is built once, untimed."""
+    keywords = pd.read_csv(keywords_path) if os.path.exists(keywords_path) else None
+    if keywords is None:
+        print(f"{keywords_path} not found: tone is not benchmarked", file=sys.stderr)
+    df = build_chat_frame(path, ToneClassifier(keywords) if keywords is not None else None, 'lexicon')
+    results = {}
+    with tempfile.TemporaryDirectory() as tmp:
+        ctx = {
+            'path': path, 'df': df, 'messages': len(df), 'tmp': tmp,
+            'keywords': keywords, 'sentiment_sample': sentiment_sample,
+        }
+        for name in names:
+            stage = STAGES[name](ctx)
+            if stage is None:
+                continue
+            run, items = stage
+            runs, peak = time_stage(run, repeat)
+            best = min(runs)
+            results[name] = {
+                'seconds': best,
+                'runs': runs,
+                'items': items,
+                'items_per_second': items / best if best else None,
+                'peak_traced_bytes': peak,
+            }
+            print(f"{name:<20} {best:9.4f}s  {items / best if best else 0:>14,.0f}/s  "
+                  f"peak {peak / 2 ** 20:8.1f} MiB", flush=True)
+    return results
+
+
+def compare(results, baseline):
+    """Print each stage's time against the baseline's (ratio < 1 is faster)."""
+    if baseline.get('meta', {}).get('params') != results['meta']['params']:
+        print("\nwarning: the baseline was run with different parameters", file=sys.stderr)
+    print(f"\n{'stage':<20} {'baseline':>10} {'now':>10} {'ratio':>7}")
+    for name, result in results['stages'].items():
+        before = baseline.get('stages', {}).get(name)
+        if before is None:
+            print(f"{name:<20} {'-':>10} {result['seconds']:>10.4f}")
+            continue
+        ratio = result['seconds'] / before['seconds'] if before['seconds'] else float('nan')
+        print(f"{name:<20} {before['seconds']:>10.4f} {result['seconds']:>10.4f} {ratio:>7.2f}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark each pipeline stage.")
+    parser.add_argument('--chat', help="existing export to benchmark (default: generate one)")
+    parser.add_argument('-n', '--messages', type=int, default=100_000)
+    parser.add_argument('--users', type=int, default=8)
+    parser.add_argument('--format', dest='chat_format', choices=sorted(FORMATS), default='android-eu')
+    parser.add_argument('--locale', choices=sorted(LOCALES), default='es')
+    parser.add_argument('--days', type=int, default=730, help="date span in days")
+    parser.add_argument('--start', default='2022-01-01')
+    add_rate_options(parser)
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--repeat', type=int, default=3)
+    parser.add_argument('--stages', help=f"comma-separated subset of: {', '.join(STAGES)}")
+    parser.add_argument('--sentiment-sample', type=int, default=20_000,
+                        help="messages scored by the slow 'pattern' method")
+    parser.add_argument('--keywords', default=os.path.join(ROOT, KEYWORDS_PATH), help="tone keyword CSV")
+    parser.add_argument('-o', '--output', default='bench_results.json')
+    parser.add_argument('--baseline', help="previous results JSON to compare against")
+    args = parser.parse_args()
+
+    names = args.stages.split(',') if args.stages else list(STAGES)
+    unknown = [n for n in names if n not in STAGES]
+    if unknown:
+        parser.error(f"unknown stages: {', '.join(unknown)}")
+
+    params = {'repeat': args.repeat, 'sentiment_sample': args.sentiment_sample}
+    with tempfile.TemporaryDirectory() as tmp:
+        if args.chat:
+            path = args.chat
+            params['chat'] = os.path.abspath(path)
+        else:
+            path = os.path.join(tmp, 'synthetic_chat.txt')
+            generator = {'messages': args.messages, 'users': args.users, 'chat_format': args.chat_format,
+                         'locale': args.locale, 'days': args.days, 'start': args.start,
+                         **{rate: getattr(args, rate) for rate in RATES}, 'seed': args.seed}
+            generate_chat(path, **generator)
+            params['synthetic'] = generator
+        params['bytes'] = os.path.getsize(path)
+        stages = run_benchmarks(path, names, args.repeat, args.sentiment_sample, args.keywords)
+
+    results = {'meta': {**environment(), 'params': params, 'created': time.strftime('%Y-%m-%dT%H:%M:%S')},
+               'stages': stages}
+    with open(args.output, 'w', encoding='utf-8') as f:
+        json.dump(results, f, ensure_ascii=False, indent=2)
+    print(f"\nwrote {args.output}")
+
+    if args.baseline:
+        with open(args.baseline, encoding='utf-8') as f:
+            compare(results, json.load(f))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,106 @@
+"""Cold-start report: import times of the app's modules and time to first render.
+
+Usage: python benchmarks/bench_startup.py [--runs N] [--top N] [-o startup.json] [--baseline previous.json]
+
+Every measurement runs in a fresh interpreter, so nothing is already in
+sys.modules. Imports are measured with python -X importtime on the modules
+app.py imports (top-level entries, cumulative, slowest first); the first
+render runs app.py once with streamlit's AppTest, without a chat, and times
+only the script (streamlit itself is imported before the clock starts).
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from bench_stages import ROOT, environment  # noqa: E402
+
+APP = os.path.join(ROOT, 'app.py')
+
+FIRST_RENDER = """
+import time
+from streamlit.testing.v1 import AppTest
+app = AppTest.from_file({app!r}, default_timeout=300)
+start = time.perf_counter()
+app.run()
+print(time.perf_counter() - start)
+"""
+
+
+def app_imports():
+    """Top-level modules app.py imports, in order."""
+    modules = []
+    with open(APP, encoding='utf-8') as f:
+        for line in f:
+            words = line.split()
+            if len(words) > 1 and words[0] in ('import', 'from') and not line.startswith((' ', '\t')):
+                modules.append(words[1].rstrip(','))
+    return list(dict.fromkeys(modules))
+
+
+def import_times(modules):
+    """[(module, self seconds, cumulative seconds)] of the top-level imports, slowest first."""
+    code = 'import ' + ', '.join(modules)
+    result = subprocess.run([sys.executable, '-X', 'importtime', '-c', code], cwd=ROOT, capture_output=True,
+                            text=True, check=True)
+    times = []
+    for line in result.stderr.splitlines():
+        if not line.startswith('import time:') or 'self [us]' in line:
+            continue
+        self_us, cumulative_us, name = line[len('import time:'):].split('|')
+        # Nested imports are indented; interpreter startup imports are not the app's
+        if not name.startswith('  ', 1) and name.strip() in modules:
+            times.append((name.strip(), int(self_us) / 1e6, int(cumulative_us) / 1e6))
+    return sorted(times, key=lambda t: t[2], reverse=True)
+
+
+def first_render_seconds():
+    result = subprocess.run([sys.executable, '-c', FIRST_RENDER.format(app=APP)], cwd=ROOT, capture_output=True,
+                            text=True, check=True)
+    return float(result.stdout.strip().splitlines()[-1])
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Measure the app's cold-start cost.")
+    parser.add_argument('--runs', type=int, default=3, help="fresh processes per measurement")
+    parser.add_argument('--top', type=int, default=15, help="imports listed")
+    parser.add_argument('-o', '--output', default='startup_results.json')
+    parser.add_argument('--baseline', help="previous results JSON to compare against")
+    args = parser.parse_args()
+
+    modules = app_imports()
+    runs = [import_times(modules) for _ in range(args.runs)]
+    totals = [sum(t[2] for t in run) for run in runs]
+    best = runs[totals.index(min(totals))]
+    print(f"{'module':<30} {'self':>8} {'cumulative':>11}")
+    for name, self_s, cumulative_s in best[:args.top]:
+        print(f"{name:<30} {self_s:>8.3f} {cumulative_s:>11.3f}")
+    print(f"imports: {min(totals):.3f}s (best of {args.runs})")
+
+    renders = [first_render_seconds() for _ in range(args.runs)]
+    print(f"first render: {min(renders):.3f}s (best of {args.runs})")
+
+    results = {
+        'meta': {**environment(), 'params': {'runs': args.runs}, 'created': time.strftime('%Y-%m-%dT%H:%M:%S')},
+        'imports': [{'module': n, 'self_seconds': s, 'cumulative_seconds': c} for n, s, c in best],
+        'import_seconds': min(totals),
+        'first_render_seconds': min(renders),
+        'first_render_runs': renders,
+    }
+    with open(args.output, 'w', encoding='utf-8') as f:
+        json.dump(results, f, indent=2)
+    print(f"wrote {args.output}")
+
+    if args.baseline:
+        with open(args.baseline, encoding='utf-8') as f:
+            baseline = json.load(f)
+        for key in ('import_seconds', 'first_render_seconds'):
+            print(f"{key}: {baseline[key]:.3f}s -> {results[key]:.3f}s ({results[key] / baseline[key]:.2f}x)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,199 @@
+"""Deterministic synthetic WhatsApp exports for benchmarks.
+
+Usage: python benchmarks/synthetic_chat.py OUTPUT.txt [-n MESSAGES] [--users N]
+           [--format android-eu|android-us|android-de|ios|ios-us] [--locale es|en]
+           [--days SPAN] [--start YYYY-MM-DD] [--multiline RATE] [--media RATE]
+           [--links RATE] [--emojis RATE] [--deleted RATE] [--mentions RATE] [--seed N]
+
+The same arguments always give the same bytes. Bodies are drawn from a pool
+of Zipf-distributed words, users have skewed activity and messages cluster in
+the evening, so term, emoji, mention and search workloads look like a real
+chat. Output is written in blocks, so 10M-message exports do not need the
+whole text in memory.
+"""
+import argparse
+import os
+import string
+
+import numpy as np
+import pandas as pd
+
+# (date layout, time layout, header template); {stamp} is the date and time
+FORMATS = {
+    'android-eu': ('{d}/{m}/{y2}', '{H}:{M}', '{stamp} - '),
+    'android-us': ('{mu}/{du}/{y2}', '{h}:{M} {p}', '{stamp} - '),
+    'android-de': ('{d}.{m}.{y2}', '{H}:{M}', '{stamp} - '),
+    'ios': ('{d}/{m}/{y4}', '{H}:{M}:{S}', '[{stamp}] '),
+    'ios-us': ('{mu}/{du}/{y2}', '{h}:{M}:{S} {p}', '[{stamp}] '),
+}
+
+LOCALES = {
+    'es': {
+        'media': '<Multimedia omitido>',
+        'deleted': 'Se eliminó este mensaje',
+        'words': (
+            "que de no la el en y a los se del las un por con una para es lo como más pero sus le ya o "
+            "fue este ha sí porque esta son entre cuando muy sin sobre también me hasta hay donde quien "
+            "desde todo nos durante todos uno les ni contra otros ese eso ante ellos esto antes algunos "
+            "qué unos yo otro otras otra él tanto esa estos mucho quienes nada muchos cual poco ella "
+            "jaja vale hola bueno mañana hoy luego casa cena quedamos vamos genial gracias perfecto "
+            "fiesta cumpleaños trabajo playa película partido viaje foto comida café cerveza noche"
+        ).split(),
+    },
+    'en': {
+        'media': '<Media omitted>',
+        'deleted': 'This message was deleted',
+        'words': (
+            "the be to of and a in that have it for not on with he as you do at this but his by from "
+            "they we say her she or an will my one all would there their what so up out if about who "
+            "get which go me when make can like time no just him know take people into year your good "
+            "some could them see other than then now look only come its over think also back after "
+            "lol ok hi great thanks tomorrow today later home dinner meet party birthday work beach "
+            "movie game trip photo food coffee beer night weekend"
+        ).split(),
+    },
+}
+
+FIRST_NAMES = ["Ana", "Luis", "Marta", "Pablo", "Lucía", "Javier", "Sara", "Diego", "Elena", "Carlos",
+               "Laura", "Miguel", "Paula", "Andrés", "Irene", "Jorge", "Clara", "Raúl", "Nuria", "Hugo"]
+LAST_NAMES = ["García", "Pérez", "Ruiz", "López", "Martín", "Sánchez", "Gómez", "Díaz", "Moreno", "Romero"]
+
+EMOJIS = ["😂", "❤️", "👍", "👍🏽", "🙏🏻", "😍", "🎉", "😭", "🔥", "🇪🇸", "👨‍👩‍👧‍👦", "#️⃣", "😴", "🤔"]
+
+# Relative message volume per hour of the day (quiet nights, busy evenings)
+HOURLY_WEIGHTS = np.array([2, 1, 1, 1, 1, 1, 2, 4, 6, 7, 8, 8, 9, 9, 8, 8, 9, 10, 12, 14, 15, 13, 9, 5], float)
+
+# Default share of messages with each feature
+RATES = {'multiline': 0.03, 'media': 0.05, 'links': 0.03, 'emojis': 0.15, 'deleted': 0.01, 'mentions': 0.05}
+
+BODY_POOL = 50_000
+BLOCK_MESSAGES = 500_000
+
+
+def user_names(n, rng):
+    names = [f"{f} {l}" for l in LAST_NAMES for f in FIRST_NAMES]
+    picked = rng.choice(len(names), size=min(n, len(names)), replace=False)
+    names = [names[i] for i in picked]
+    # Beyond 200 users, numbered names
+    return names + [f"User {i}" for i in range(len(names), n)]
+
+
+def body_pool(words, size, rng):
+    """Message bodies with Zipf-distributed words and 1-20 words each."""
+    lengths = np.clip(rng.geometric(0.18, size=size), 1, 20)
+    ranks = np.minimum(rng.zipf(1.3, size=int(lengths.sum())) - 1, len(words) - 1)
+    tokens = np.asarray(words, dtype=object)[ranks]
+    ends = np.cumsum(lengths)
+    return [' '.join(tokens[end - n:end]) for end, n in zip(ends.tolist(), lengths.tolist())]
+
+
+def message_times(n, start, days, rng):
+    """Sorted datetimes: uniform days, evening-heavy hours, random minutes and seconds."""
+    day = rng.integers(0, days, size=n)
+    hour = rng.choice(24, size=n, p=HOURLY_WEIGHTS / HOURLY_WEIGHTS.sum())
+    seconds = rng.integers(0, 3600, size=n)
+    offsets = np.sort(day * 86400 + hour * 3600 + seconds)
+    return pd.Timestamp(start) + pd.to_timedelta(offsets, unit='s')
+
+
+def _pad(values):
+    return pd.Series(values).map('{:02d}'.format)
+
+
+def format_stamps(times, chat_format):
+    date_layout, time_layout, header = FORMATS[chat_format]
+    times = pd.DatetimeIndex(times)
+    hour12 = times.hour % 12
+    parts = {
+        'd': _pad(times.day), 'm': _pad(times.month), 'du': pd.Series(times.day).astype(str),
+        'mu': pd.Series(times.month).astype(str), 'y2': _pad(times.year % 100), 'y4': pd.Series(times.year).astype(str),
+        'H': _pad(times.hour), 'M': _pad(times.minute), 'S': _pad(times.second),
+        'h': pd.Series(np.where(hour12 == 0, 12, hour12)).astype(str),
+        'p': pd.Series(np.where(times.hour < 12, 'AM', 'PM')),
+    }
+    layout = header.format(stamp=f"{date_layout}, {time_layout}")
+    # Split the layout into literal text and {field} references, then concatenate column-wise
+    stamps = pd.Series('', index=range(len(times)), dtype=object)
+    for literal, field, _, _ in string.Formatter().parse(layout):
+        if literal:
+            stamps = stamps + literal
+        if field:
+            stamps = stamps + parts[field].to_numpy(dtype=object)
+    return stamps
+
+
+def generate_block(times, users, weights, pool, locale, rates, rng, chat_format):
+    n = len(times)
+    names = np.asarray(users, dtype=object)
+    senders = rng.choice(len(users), size=n, p=weights)
+    bodies = pd.Series(np.asarray(pool, dtype=object)[rng.integers(len(pool), size=n)], dtype=object)
+
+    def flagged(rate):
+        return rng.random(n) < rate
+
+    mention = flagged(rates['mentions'])
+    targets = rng.choice(len(users), size=int(mention.sum()), p=weights)
+    first_names = pd.Series([u.split()[0] for u in users], dtype=object).to_numpy()
+    bodies[mention] = first_names[targets] + ' ' + bodies[mention]
+
+    emoji = flagged(rates['emojis'])
+    bodies[emoji] = bodies[emoji] + ' ' + np.asarray(EMOJIS, dtype=object)[rng.integers(len(EMOJIS), size=int(emoji.sum()))]
+
+    link = flagged(rates['links'])
+    bodies[link] = bodies[link] + ' https://example' + pd.Series(rng.integers(1000, size=int(link.sum()))).astype(str).to_numpy() + '.com/p'
+
+    multiline = flagged(rates['multiline'])
+    extra = np.asarray(pool, dtype=object)[rng.integers(len(pool), size=int(multiline.sum()))]
+    bodies[multiline] = bodies[multiline] + '\n' + extra
+
+    bodies[flagged(rates['media'])] = LOCALES[locale]['media']
+    bodies[flagged(rates['deleted'])] = LOCALES[locale]['deleted']
+
+    lines = format_stamps(times, chat_format) + names[senders] + ': ' + bodies.to_numpy()
+    return '\n'.join(lines.tolist()) + '\n'
+
+
+def generate_chat(path, messages=100_000, users=8, chat_format='android-eu', locale='es', days=730,
+                  start='2022-01-01', multiline=RATES['multiline'], media=RATES['media'], links=RATES['links'],
+                  emojis=RATES['emojis'], deleted=RATES['deleted'], mentions=RATES['mentions'], seed=0):
+    """Write a synthetic export to path; returns its size in bytes."""
+    rng = np.random.default_rng(seed)
+    names = user_names(users, rng)
+    # Skewed activity: a few users write most messages
+    weights = rng.dirichlet(np.full(users, 0.8))
+    pool = body_pool(LOCALES[locale]['words'], min(BODY_POOL, max(messages, 1)), rng)
+    times = message_times(messages, start, days, rng)
+    rates = {'multiline': multiline, 'media': media, 'links': links, 'emojis': emojis, 'deleted': deleted,
+             'mentions': mentions}
+    with open(path, 'w', encoding='utf-8', newline='\n') as f:
+        for block in range(0, messages, BLOCK_MESSAGES):
+            f.write(generate_block(times[block:block + BLOCK_MESSAGES], names, weights, pool, locale, rates, rng,
+                                   chat_format))
+    return os.path.getsize(path)
+
+
+def add_rate_options(parser):
+    """Add a --<rate> option per RATES entry, defaulting to generate_chat's."""
+    for rate, default in RATES.items():
+        parser.add_argument(f'--{rate}', type=float, default=default, help=f"share of messages (default {default})")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Write a deterministic synthetic WhatsApp export.")
+    parser.add_argument('output')
+    parser.add_argument('-n', '--messages', type=int, default=100_000)
+    parser.add_argument('--users', type=int, default=8)
+    parser.add_argument('--format', dest='chat_format', choices=sorted(FORMATS), default='android-eu')
+    parser.add_argument('--locale', choices=sorted(LOCALES), default='es')
+    parser.add_argument('--days', type=int, default=730, help="date span in days")
+    parser.add_argument('--start', default='2022-01-01')
+    add_rate_options(parser)
+    parser.add_argument('--seed', type=int, default=0)
+    args = vars(parser.parse_args())
+    output = args.pop('output')
+    size = generate_chat(output, **args)
+    print(f"{output}: {args['messages']:,} messages, {size / 2 ** 20:.1f} MiB")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,94 @@
+import hashlib
+import io
+import threading
+import time
+from collections import OrderedDict
+
+import numpy as np
+import pandas as pd
+
+from lazy_imports import LazyModule, is_loaded
+from profiling import stage
+
+# pyplot takes ~0.7 s to import: only when the first chart is drawn
+plt = LazyModule('matplotlib.pyplot')
+
+# Same output st.pyplot produces
+RENDER_OPTIONS = {'format': 'png', 'dpi': 200, 'bbox_inches': 'tight'}
+
+
+def data_hash(*parts):
+    """Digest of a chart's inputs: pandas objects, arrays or plain values."""
+    digest = hashlib.blake2b(digest_size=16)
+    for part in parts:
+        if isinstance(part, (pd.Series, pd.DataFrame, pd.Index)):
+            digest.update(pd.util.hash_pandas_object(part, index=not isinstance(part, pd.Index)).to_numpy().tobytes())
+            labels = part.columns if isinstance(part, pd.DataFrame) else [getattr(part, 'name', None)]
+            digest.update(repr((type(part).__name__, part.shape, list(labels))).encode())
+        elif isinstance(part, np.ndarray):
+            digest.update(repr((part.dtype.str, part.shape)).encode())
+            digest.update(np.ascontiguousarray(part).tobytes())
+        else:
+            digest.update(repr(part).encode())
+    return digest.hexdigest()
+
+
+class ChartCache:
+    """Rendered charts as PNG bytes, keyed by chart name and input hash.
+
+    A chart is drawn only when its inputs change; the figure is closed right
+    after rendering, so no matplotlib figure outlives the call. Least recently
+    used images are dropped beyond max_bytes.
+    """
+
+    def __init__(self, max_bytes=64 * 1024 ** 2):
+        self.max_bytes = max_bytes
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.render_seconds = 0.0
+
+    def render(self, name, draw, *data, figsize=None):
+        """PNG of draw(ax, *data) on a new figure, reused while data hashes the same."""
+        key = (name, data_hash(*data))
+        with self._lock:
+            if key in self._entries:
+                self.hits += 1
+                self._entries.move_to_end(key)
+                return self._entries[key]
+
+        start = time.perf_counter()
+        with stage(f"chart:{name}"):
+            fig, ax = plt.subplots(figsize=figsize)
+            try:
+                draw(ax, *data)
+                buffer = io.BytesIO()
+                fig.savefig(buffer, **RENDER_OPTIONS)
+            finally:
+                plt.close(fig)
+        png = buffer.getvalue()
+
+        with self._lock:
+            self.misses += 1
+            self.render_seconds += time.perf_counter() - start
+            if key not in self._entries:
+                self._entries[key] = png
+                self.bytes += len(png)
+            while self.bytes > self.max_bytes and len(self._entries) > 1:
+                _, evicted = self._entries.popitem(last=False)
+                self.bytes -= len(evicted)
+        return png
+
+    def stats(self):
+        """Counters for the debug sidebar."""
+        with self._lock:
+            return {
+                'charts': len(self._entries),
+                'bytes': self.bytes,
+                'hits': self.hits,
+                'misses': self.misses,
+                'render_seconds': self.render_seconds,
+                'open_figures': len(plt.get_fignums()) if is_loaded('matplotlib.pyplot') else 0,
+            }
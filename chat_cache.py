@@ -0,0 +1,151 @@
+import hashlib
+import json
+import os
+import threading
+from collections import OrderedDict
+
+import pyarrow as pa
+
+
+def content_hash(raw):
+    """SHA-256 of the raw upload bytes, used as the dataset identity."""
+    return hashlib.sha256(raw).hexdigest()
+
+
+class ChatCache:
+    """Bounded LRU cache of processed chat frames, safe to share between sessions."""
+
+    def __init__(self, max_entries=4):
+        self.max_entries = max_entries
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            if key not in self._entries:
+                return None
+            self._entries.move_to_end(key)
+            return self._entries[key]
+
+    def put(self, key, value):
+        with self._lock:
+            self._entries[key] = value
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def items(self):
+        """Snapshot of (key, value) pairs, most recently used first."""
+        with self._lock:
+            return list(reversed(self._entries.items()))
+
+    def __contains__(self, key):
+        with self._lock:
+            return key in self._entries
+
+    def __len__(self):
+        with self._lock:
+            return len(self._entries)
+
+
+class DiskChatCache:
+    """Processed chat frames as Arrow IPC files, reloaded through a memory map.
+
+    Files are named after the cache key and survive restarts. Reading a file
+    touches its mtime; once the directory grows past max_bytes the files with
+    the oldest mtime are deleted first.
+    """
+
+    SUFFIX = '.arrow'
+
+    def __init__(self, directory, max_bytes=2 * 1024 ** 3):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        os.makedirs(directory, exist_ok=True)
+
+    def _path(self, key):
+        return os.path.join(self.directory, '__'.join(map(str, key)) + self.SUFFIX)
+
+    def get(self, key, **expected):
+        """(df, metadata dict) for the key, or None if it is not on disk.
+
+        expected metadata values (e.g. tone=fingerprint) must match the ones
+        stored with put, otherwise the file counts as a miss.
+        """
+        path = self._path(key)
+        try:
+            reader = pa.ipc.open_file(pa.memory_map(path))
+            meta = self._meta(reader.schema)
+            if any(meta.get(name) != value for name, value in expected.items()):
+                return None
+            table = reader.read_all()
+        except (FileNotFoundError, pa.ArrowInvalid):
+            return None
+        try:
+            os.utime(path)
+        except OSError:
+            # Read-only directory or evicted meanwhile: still a hit
+            pass
+        # Uncompressed numeric and string columns stay backed by the mapped file
+        return table.to_pandas(split_blocks=True), meta
+
+    def metadata(self, key):
+        """The keyword arguments given to put, read without loading any column."""
+        try:
+            return self._meta(pa.ipc.open_file(pa.memory_map(self._path(key))).schema)
+        except (FileNotFoundError, pa.ArrowInvalid):
+            return None
+
+    @staticmethod
+    def _meta(schema):
+        return json.loads((schema.metadata or {}).get(b'chat_cache', b'{}'))
+
+    def put(self, key, df, **meta):
+        table = pa.Table.from_pandas(df, preserve_index=False)
+        table = table.replace_schema_metadata({
+            **(table.schema.metadata or {}), b'chat_cache': json.dumps(meta).encode()
+        })
+        path = self._path(key)
+        tmp = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        with pa.OSFile(tmp, 'wb') as sink:
+            with pa.ipc.new_file(sink, table.schema) as writer:
+                writer.write_table(table)
+        os.replace(tmp, path)
+        self._evict(keep=path)
+
+    def keys(self):
+        """Cached keys, most recently used first."""
+        return [
+            tuple(os.path.basename(path)[:-len(self.SUFFIX)].split('__'))
+            for path, _ in self._files()
+        ]
+
+    def _files(self):
+        # (path, stat) of the cache files, newest mtime first
+        files = []
+        for entry in os.scandir(self.directory):
+            if entry.name.endswith(self.SUFFIX):
+                try:
+                    files.append((entry.path, entry.stat()))
+                except FileNotFoundError:
+                    continue
+        return sorted(files, key=lambda f: f[1].st_mtime, reverse=True)
+
+    def _evict(self, keep=None):
+        with self._lock:
+            total = 0
+            for path, stat in self._files():
+                total += stat.st_size
+                if total > self.max_bytes and path != keep:
+                    try:
+                        os.remove(path)
+                    except OSError:
+                        continue
+                    total -= stat.st_size
+
+    def __contains__(self, key):
+        return os.path.exists(self._path(key))
+
+    def __len__(self):
+        return len(self._files())
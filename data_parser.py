@@ -1,24 +1,421 @@
+import codecs
+import io
+import os
 import re
-from collections import Counter
-from datetime import datetime
+from collections import Counter, namedtuple
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.compute as pc
+
+from profiling import profiled
+
+COLUMNS = ['datetime', 'user', 'message']
+
+# Bytes read per block in streaming mode
+CHUNK_BYTES = 8 * 1024 * 1024
+
+# Message lines sampled to detect the export's timestamp format
+DETECT_SAMPLE_LINES = 300
+
+# name: shown to the user; header_pattern: start of a message line, as an
+# RE2 pattern for Arrow; separator: what follows the timestamp; stamp_pattern:
+# start of a message line for Python's re; stamp_fields: what each run of
+# digits in the timestamp is (and 'ampm' for 12-hour clocks);
+# datetime_formats: tried in order on the stamps the digits do not make a
+# valid date of.
+ChatFormat = namedtuple(
+    'ChatFormat',
+    ['name', 'header_pattern', 'separator', 'stamp_pattern', 'stamp_fields', 'datetime_formats', 'twelve_hour'],
+)
+
+_AMPM = r"[ \u202f\xa0]?[AaPp]\.?[ \xa0]?[Mm]\.?"
+# Same suffix, capturing the A/P letter
+_AMPM_FIELD = r"[ \u202f\xa0]?([AaPp])\.?[ \xa0]?[Mm]\.?"
+
+# Most digits in one stamp field (four-digit years)
+_MAX_DIGITS = 4
+
+# Unit pd.to_datetime gives parsed strings (ns in pandas 2, us in pandas 3),
+# so stamps built from their numeric fields match the fallback
+_DATETIME_DTYPE = pd.to_datetime(pd.Series(['2000-01-01 00:00']), format='%Y-%m-%d %H:%M').dtype
+
+# Loose header probes per export family, only used on the detection sample:
+# Android "31/12/23, 23:59 - User: msg", iOS "[31/12/23, 23:59:10] User: msg"
+_FORMAT_PROBES = {
+    'Android': re.compile(
+        rf"^(\d{{1,2}})([/.-])(\d{{1,2}})\2(\d{{2,4}})(,?) (\d{{1,2}}):(\d{{2}})(:\d{{2}})?({_AMPM})? - "
+    ),
+    'iOS': re.compile(
+        rf"^\u200e?\[(\d{{1,2}})([/.-])(\d{{1,2}})\2(\d{{2,4}})(,?) (\d{{1,2}}):(\d{{2}})(:\d{{2}})?({_AMPM})?\] "
+    ),
+}
+
+
+def _re2(pattern):
+    # RE2 spells \uXXXX as \x{XXXX}
+    return re.sub(r"\\u([0-9a-fA-F]{4})", r"\\x{\1}", pattern)
+
+
+def _compile_format(name, stamp_re, family, stamp_fields, datetime_formats, twelve_hour=False):
+    # stamp_re captures the stamp_fields, in order; the line-start patterns
+    # need no groups
+    bare = re.sub(r"\((?!\?)", "(?:", stamp_re)
+    if family == 'iOS':
+        start, separator = rf"\u200e?\[{bare}\] ", '] '
+    else:
+        start, separator = rf"{bare} - ", ' - '
+    return ChatFormat(
+        name, _re2('^' + start), separator, re.compile(start), tuple(stamp_fields), tuple(datetime_formats),
+        twelve_hour,
+    )
+
+
+# Used when nothing in the sample looks like a message (same behaviour as the
+# original parser: Android, day first, four- or two-digit years)
+DEFAULT_FORMAT = _compile_format(
+    "Android (dd/mm/yy, 24h)",
+    r"(\d{1,2})/(\d{1,2})/(\d{2,4}), (\d{1,2}):(\d{2})",
+    'Android',
+    ('day', 'month', 'year', 'hour', 'minute'),
+    ("%d/%m/%Y, %H:%M", "%d/%m/%y, %H:%M"),
+)
+
+
+def _majority(values):
+    return Counter(values).most_common(1)[0][0]
+
+
+def _is_day_first(hits, twelve_hour):
+    first = np.array([int(h[0]) for h in hits])
+    second = np.array([int(h[2]) for h in hits])
+    if (first > 12).any():
+        return True
+    if (second > 12).any():
+        return False
+    # Ambiguous sample: exports are chronological, so keep the reading with
+    # fewer backwards jumps
+    years = np.array([int(h[3]) for h in hits])
+    hours = np.array([int(h[5]) for h in hits])
+    if twelve_hour:
+        pm = np.array([bool(h[8]) and h[8].strip(' \u202f\xa0')[0] in 'Pp' for h in hits])
+        hours = hours % 12 + 12 * pm
+    minutes = np.array([int(h[6]) for h in hits])
+    clock = hours * 100 + minutes
+
+    def backwards(month, day):
+        key = years * 10 ** 8 + month * 10 ** 6 + day * 10 ** 4 + clock
+        return int((np.diff(key) < 0).sum())
+
+    day_first, month_first = backwards(second, first), backwards(first, second)
+    if day_first != month_first:
+        return day_first < month_first
+    # 12-hour clocks are mostly US exports (month first)
+    return not twelve_hour
+
+
+def detect_chat_format(text, sample_lines=DETECT_SAMPLE_LINES):
+    """Pick one header regex and one datetime format from the first message lines.
+
+    Returns None when no line in the text looks like a WhatsApp message.
+    """
+    hits = {family: [] for family in _FORMAT_PROBES}
+    matched = 0
+    for line in io.StringIO(text):
+        for family, probe in _FORMAT_PROBES.items():
+            m = probe.match(line)
+            if m:
+                hits[family].append(m.groups())
+                matched += 1
+                break
+        if matched >= sample_lines:
+            break
+    if not matched:
+        return None
+
+    family = max(hits, key=lambda f: len(hits[f]))
+    hits = hits[family]
+    sep = _majority(h[1] for h in hits)
+    long_year = _majority(len(h[3]) == 4 for h in hits)
+    comma = _majority(h[4] for h in hits)
+    seconds = _majority(bool(h[7]) for h in hits)
+    twelve_hour = _majority(bool(h[8]) for h in hits)
+    day_first = _is_day_first(hits, twelve_hour)
+
+    esc = re.escape(sep)
+    stamp_re = (
+        rf"(\d{{1,2}}){esc}(\d{{1,2}}){esc}" + (r"(\d{4})" if long_year else r"(\d{2})")
+        + comma + r" (\d{1,2}):(\d{2})" + (r":(\d{2})" if seconds else "") + (_AMPM_FIELD if twelve_hour else "")
+    )
+    stamp_fields = (
+        (('day', 'month') if day_first else ('month', 'day')) + ('year', 'hour', 'minute')
+        + (('second',) if seconds else ()) + (('ampm',) if twelve_hour else ())
+    )
+    date_fmt = sep.join(['%d', '%m'] if day_first else ['%m', '%d']) + sep + ('%Y' if long_year else '%y')
+    time_fmt = ('%I' if twelve_hour else '%H') + ':%M' + (':%S' if seconds else '') + (' %p' if twelve_hour else '')
+
+    date_label = sep.join(['dd', 'mm'] if day_first else ['mm', 'dd']) + sep + ('yyyy' if long_year else 'yy')
+    clock_label = ('12h' if twelve_hour else '24h') + (', con segundos' if seconds else '')
+    return _compile_format(
+        f"{family} ({date_label}, {clock_label})",
+        stamp_re,
+        family,
+        stamp_fields,
+        [f"{date_fmt}{comma} {time_fmt}"],
+        twelve_hour,
+    )
+
+
+def _normalize_ampm(stamps):
+    # "3:45\u202fp. m." / "3:45 pm" -> "3:45 PM" so a single %p format applies
+    stamps = stamps.str.replace(r"[\u202f\xa0]", " ", regex=True)
+    return stamps.str.replace(
+        r" ?([AaPp])\.? ?[Mm]\.?$", lambda m: " " + m.group(1).upper() + "M", regex=True
+    )
 
-def parse_whatsapp_chat(filepath):
-    with open(filepath, encoding='utf-8') as f:
-        lines = f.readlines()
 
-    messages = []
-    pattern = r"(\d{1,2}/\d{1,2}/\d{2,4}), (\d{1,2}:\d{2}) - (.*?): (.*)"
+def _stamp_numbers(stamps, count):
+    # The count runs of ASCII digits in each stamp, read from the Arrow
+    # buffers: (n, count) arrays of their values and of their digit counts
+    stamps = stamps.cast(pa.large_string())
+    offsets = np.frombuffer(stamps.buffers()[1], np.int64)[stamps.offset:stamps.offset + len(stamps) + 1]
+    # Padded so the last run can be read as _MAX_DIGITS bytes too
+    data = np.frombuffer(stamps.buffers()[2], np.uint8)[offsets[0]:offsets[-1]]
+    data = np.append(data, np.zeros(_MAX_DIGITS, np.uint8))
+    digit = (data >= ord('0')) & (data <= ord('9'))
+    stamp_start = np.zeros(len(data), dtype=bool)
+    stamp_start[offsets[:-1] - offsets[0]] = True
+    # A run starts after a non-digit or at the start of a stamp, and ends
+    # before a non-digit or the start of the next stamp
+    starts = np.flatnonzero(digit & (np.append(True, ~digit[:-1]) | stamp_start))
+    stop = ~digit | stamp_start
+    number = np.zeros(len(starts), dtype=np.int64)
+    digits = np.zeros(len(starts), dtype=np.int64)
+    present = np.ones(len(starts), dtype=bool)
+    for i in range(_MAX_DIGITS):
+        if i:
+            present &= ~stop[starts + i]
+        number = np.where(present, number * 10 + data[starts + i] - ord('0'), number)
+        digits += present
+    return number.reshape(-1, count), digits.reshape(-1, count)
 
-    for line in lines:
-        match = re.match(pattern, line)
-        if match:
-            date_str, time_str, user, message = match.groups()
-            messages.append((user, message))
 
-    return messages
+def _stamp_datetimes(stamps, chat_format):
+    """Datetimes built from the stamps' digits, and the mask of those that are valid dates."""
+    names = [field for field in chat_format.stamp_fields if field != 'ampm']
+    numbers, digits = _stamp_numbers(stamps, len(names))
+    values = dict(zip(names, numbers.T))
+    year, year_digits = values['year'], digits[:, names.index('year')]
+    # %y: 69-99 -> 19xx, 00-68 -> 20xx
+    year = np.where(year_digits == 2, year + np.where(year < 69, 2000, 1900), year)
+    month, day = values['month'], values['day']
+    hour, minute = values['hour'], values['minute']
+    second = values.get('second', np.zeros(len(stamps), dtype=np.int64))
+    if chat_format.twelve_hour:
+        valid = (hour >= 1) & (hour <= 12)
+        # The A/P letter is the only one in the stamp
+        pm = pc.match_substring(stamps, 'p', ignore_case=True).to_numpy(zero_copy_only=False)
+        hour = hour % 12 + 12 * pm
+    else:
+        valid = hour <= 23
+    valid &= (year_digits != 3) & (year > 1677) & (year < 2262) & (month >= 1) & (month <= 12)
+    valid &= (minute <= 59) & (second <= 59)
+
+    months = np.where(valid, (year - 1970) * 12 + month - 1, 0).astype('datetime64[M]')
+    month_days = ((months + 1).astype('datetime64[D]') - months.astype('datetime64[D]')).astype(np.int64)
+    valid &= (day >= 1) & (day <= month_days)
+    seconds = ((day - 1) * 24 + hour) * 3600 + minute * 60 + second
+    result = months.astype('datetime64[s]') + seconds.astype('timedelta64[s]')
+    result = result.astype(_DATETIME_DTYPE)
+    result[~valid] = np.datetime64('NaT')
+    return result, valid
+
+
+def _strptime(stamps, chat_format):
+    # Each distinct stamp parsed once with the file's formats
+    codes, uniques = pd.factorize(np.asarray(stamps, dtype=object))
+    uniques = pd.Series(uniques, dtype=object)
+    if chat_format.twelve_hour:
+        uniques = _normalize_ampm(uniques)
+    formats = chat_format.datetime_formats
+    parsed = pd.to_datetime(uniques, format=formats[0], errors='coerce')
+    for fmt in formats[1:]:
+        missing = parsed.isna()
+        if not missing.any():
+            break
+        parsed[missing] = pd.to_datetime(uniques[missing], format=fmt, errors='coerce')
+    return parsed.to_numpy()[codes]
+
+
+@profiled('parse:strptime')
+def parse_timestamps(stamps, chat_format=DEFAULT_FORMAT):
+    """Vectorized strptime for stamps (strings or an Arrow string array) written in chat_format.
+
+    The stamps' digits are turned into datetimes with NumPy; only the stamps
+    that do not form a valid date go through pd.to_datetime.
+    """
+    if not isinstance(stamps, pa.Array):
+        stamps = pa.array(stamps, pa.large_string())
+    result, valid = _stamp_datetimes(stamps, chat_format)
+    if not valid.all():
+        rest = np.flatnonzero(~valid)
+        result[rest] = _strptime(stamps.take(rest).to_pylist(), chat_format)
+    return pd.Series(result)
+
+
+def _split_once(values, separator):
+    # Text before and after the first separator (null after when there is none)
+    parts = pc.split_pattern(values, separator, max_splits=1)
+    first = parts.offsets.to_numpy()
+    split = np.diff(first) == 2
+    first = first[:-1]
+    return parts.values.take(first), parts.values.take(pa.array(first + 1, mask=~split))
+
+
+def parse_chat_text(text, chat_format=None):
+    """Parse a whole export into a DataFrame with datetime, user and message columns.
+
+    The timestamp format is detected from the text unless chat_format is given;
+    its name is kept in df.attrs['chat_format'].
+    """
+    if '\r' in text:
+        text = text.replace('\r\n', '\n')
+    if chat_format is None:
+        chat_format = detect_chat_format(text) or DEFAULT_FORMAT
+
+    # Lines are split and matched in Arrow; a line that does not start with a
+    # stamp continues the message above, lines before the first one are dropped
+    lines = pc.split_pattern(pa.array([text], pa.large_string()), '\n').values
+    is_header = pc.match_substring_regex(lines, chat_format.header_pattern)
+    starts = np.flatnonzero(is_header.to_numpy(zero_copy_only=False))
+    if not len(starts):
+        df = pd.DataFrame(columns=COLUMNS)
+        df.attrs['chat_format'] = chat_format.name
+        return df
+    lines, is_header = lines[starts[0]:], is_header[starts[0]:]
+
+    # "stamp<separator>user: body", where the user runs up to the first colon
+    # if a space follows it (iOS stamps start with "[", maybe after an LRM)
+    stamps, rest = _split_once(lines.filter(is_header), chat_format.separator)
+    stamps = pc.utf8_ltrim(stamps, '\u200e[')
+    users, after = _split_once(rest, ':')
+    has_user = pc.fill_null(pc.and_(pc.starts_with(after, ' '), pc.greater(pc.utf8_length(users), 0)), False)
+    # Header lines replaced by their body, then each message's lines joined
+    bodies = pc.replace_with_mask(lines, is_header, pc.if_else(has_user, pc.utf8_slice_codeunits(after, 1), rest))
+    offsets = np.append(starts - starts[0], len(bodies))
+    messages = pc.binary_join(pa.LargeListArray.from_arrays(offsets, bodies), pa.scalar('\n', pa.large_string()))
+    df = pd.DataFrame({
+        'datetime': parse_timestamps(stamps, chat_format),
+        'user': pc.utf8_trim_whitespace(pc.if_else(has_user, users, '')).to_pandas(),
+        'message': pc.utf8_trim_whitespace(messages).to_pandas(),
+    })
+
+    # System messages ("X created group", "Messages are end-to-end encrypted")
+    # have no user; unparseable dates are dropped as before
+    keep = (df['user'] != '') & df['datetime'].notna()
+    if not keep.all():
+        df = df[keep].reset_index(drop=True)
+    df.attrs['chat_format'] = chat_format.name
+    return df
+
+
+def _last_message_start(text, stamp_pattern):
+    # Offset of the last line that starts a message, 0 if there is none
+    pos = len(text)
+    while pos > 0:
+        line_start = text.rfind('\n', 0, pos) + 1
+        if stamp_pattern.match(text, line_start):
+            return line_start
+        pos = line_start - 1
+    return 0
+
+
+class _BinarySource:
+    # Opens paths itself; buffers (uploads, BytesIO) are rewound and left open
+    def __init__(self, source):
+        self.source = source
+        self.owned = isinstance(source, (str, os.PathLike))
+
+    def __enter__(self):
+        if self.owned:
+            self.f = open(self.source, 'rb')
+        else:
+            self.f = self.source
+            if hasattr(self.f, 'seek'):
+                self.f.seek(0)
+        return self.f
+
+    def __exit__(self, *exc):
+        if self.owned:
+            self.f.close()
+
+
+def iter_chat_chunks(source, chunk_bytes=CHUNK_BYTES, chat_format=None):
+    """Yield parsed DataFrames from a path or binary buffer, one block at a time.
+
+    Bytes are decoded incrementally and the last, possibly unfinished message of
+    each block is carried over, so peak memory follows chunk_bytes, not file size.
+    The timestamp format is detected from the first block unless chat_format
+    is given.
+    """
+    decoder = codecs.getincrementaldecoder('utf-8')()
+    pending = ''
+    with _BinarySource(source) as f:
+        while True:
+            block = f.read(chunk_bytes)
+            final = not block
+            pending += decoder.decode(block, final=final)
+            if final:
+                text, pending = pending, ''
+            else:
+                # The format is fixed once a full detection sample is buffered
+                if chat_format is None:
+                    if pending.count('\n') < DETECT_SAMPLE_LINES:
+                        continue
+                    chat_format = detect_chat_format(pending)
+                if chat_format is None:
+                    cut = 0
+                else:
+                    cut = _last_message_start(pending, chat_format.stamp_pattern)
+                if cut == 0:
+                    if chat_format is None or not chat_format.stamp_pattern.match(pending):
+                        # Preamble before the first message: only the last
+                        # (maybe partial) line can still become a header
+                        pending = pending[pending.rfind('\n') + 1:]
+                    continue
+                text, pending = pending[:cut], pending[cut:]
+            df = parse_chat_text(text, chat_format)
+            if not df.empty:
+                yield df
+            if final:
+                break
+
+
+def iter_messages(source, chunk_bytes=CHUNK_BYTES):
+    """Yield (datetime, user, message) records without loading the whole export."""
+    for chunk in iter_chat_chunks(source, chunk_bytes):
+        yield from zip(chunk['datetime'], chunk['user'], chunk['message'])
+
+
+@profiled('parse')
+def read_chat(source, chunk_bytes=CHUNK_BYTES, chat_format=None):
+    """Parse a path or binary buffer into a single DataFrame via the streaming reader."""
+    chunks = list(iter_chat_chunks(source, chunk_bytes, chat_format))
+    if not chunks:
+        df = pd.DataFrame(columns=COLUMNS)
+        df.attrs['chat_format'] = None
+        return df
+    if len(chunks) == 1:
+        return chunks[0]
+    return pd.concat(chunks, ignore_index=True)
+
+
+def parse_whatsapp_chat(filepath):
+    return [(user, message) for _, user, message in iter_messages(filepath)]
+
 
 if __name__ == "__main__":
-    msgs = parse_whatsapp_chat("sample_chat.txt")
-    user_counts = Counter([msg[0] for msg in msgs])
+    user_counts = Counter(user for _, user, _ in iter_messages("sample_chat.txt"))
     print("Message count per user:")
     print(user_counts)
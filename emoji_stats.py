@@ -0,0 +1,53 @@
+import numpy as np
+import pandas as pd
+
+from analytics import ItemCounts
+from features import extract_emojis
+
+
+class EmojiStats:
+    """Per-user and per-day emoji counts from one extraction pass."""
+
+    def __init__(self, df, counts=None, per_message=None):
+        if counts is None:
+            emojis = extract_emojis(df['message'])
+            counts = ItemCounts(df, emojis.index.to_numpy(), emojis.to_numpy())
+            per_message = np.bincount(emojis.index.to_numpy(dtype=np.int64), minlength=len(df))
+        self.counts = counts
+        self.emojis = counts.items
+        self.per_message = per_message
+
+    def append(self, tail):
+        """Stats with the tail messages counted too."""
+        emojis = extract_emojis(tail['message'])
+        positions = emojis.index.to_numpy(dtype=np.int64)
+        return EmojiStats(
+            None,
+            self.counts.append(tail, positions, emojis.to_numpy()),
+            np.concatenate([self.per_message, np.bincount(positions, minlength=len(tail))]),
+        )
+
+    def __len__(self):
+        return len(self.emojis)
+
+    def top(self, n=10, start=None, end=None):
+        """Series emoji -> count, most used first, optionally for days in [start, end]."""
+        return self.counts.ranked(self.counts.frequencies(start, end), n)
+
+    def user_top(self, user, n=5, start=None, end=None):
+        return self.counts.ranked(self.counts.user_row(user, start, end), n)
+
+    def profiles(self, n=3, start=None, end=None):
+        """One row per user who wrote in [start, end]: emojis sent, emojis per message and their favourites."""
+        counts = self.counts
+        user_items = counts.user_items(start, end)
+        sent = np.asarray(user_items.sum(axis=1)).ravel()
+        messages = counts.user_messages(start, end)
+        rows = [
+            (user, int(sent[i]), sent[i] / messages[i],
+             ' '.join(counts.ranked(user_items[i].toarray().ravel(), n).index))
+            for i, user in enumerate(counts.users)
+            if messages[i]
+        ]
+        profiles = pd.DataFrame(rows, columns=['user', 'emojis', 'emojis_per_message', 'favourites'])
+        return profiles.sort_values('emojis', ascending=False, kind='stable').reset_index(drop=True)
@@ -0,0 +1,155 @@
+import re
+from functools import lru_cache
+
+import emoji
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.compute as pc
+
+from profiling import profiled
+
+# Messages scanned per block; the block is held as UTF-32 codepoints
+CHUNK_MESSAGES = 100_000
+
+_KEYCAP_BASES = [ord(c) for c in '#*0123456789']
+
+MESSAGE_TYPES = ['text', 'media', 'deleted', 'system']
+
+# iOS prefixes system-generated bodies with a left-to-right mark
+_START = '^\u200e?'
+
+# Placeholders the export writes instead of the attachment (Android and iOS,
+# English and Spanish)
+MEDIA_PATTERN = (
+    _START + r'(?:<Media omitted>|<Multimedia omitido>|<attached: [^>]*>|<adjunto: [^>]*>'
+    r'|(?:image|video|audio|sticker|GIF|document) omitted'
+    r'|(?:imagen|video|vídeo|audio|sticker|GIF|documento) omitid[oa])'
+)
+DELETED_PATTERN = (
+    _START + r'(?:This message was deleted|You deleted this message'
+    r'|Se eliminó este mensaje|Eliminaste este mensaje)\.?$'
+)
+# Events the export logs under a user: missed calls, view-once ("null") and
+# messages that could not be decrypted
+SYSTEM_PATTERN = (
+    _START + r'(?:Missed (?:voice|video|group voice|group video) call|Llamada (?:de voz |de video |de vídeo )?perdida'
+    r'|null$|Waiting for this message|Esperando el mensaje)'
+)
+
+# URLExtract only finds hosts with a dot before their TLD, IP addresses and
+# localhost (e.g. http://localhost:8501/), so rows with no dot followed by a
+# non-space character, no '://' and no 'localhost' (any case) are skipped
+# without calling it
+URL_CANDIDATE_PATTERN = r'\.\S|://|localhost'
+
+
+@lru_cache(maxsize=1)
+def url_extractor():
+    """URLExtract instance, built once per process.
+
+    It reads the TLD list bundled with the package and never downloads a new
+    one (that only happens on an explicit update()).
+    """
+    from urlextract import URLExtract
+
+    return URLExtract()
+
+
+@lru_cache(maxsize=1)
+def emoji_tables():
+    """(codepoint lookup table, emoji sequence regex) built from emoji.EMOJI_DATA.
+
+    The table marks every non-ASCII codepoint that appears in some emoji, so
+    candidate runs are found with one vectorized lookup instead of testing
+    each character. Only the distinct runs then go through the regex, longest
+    sequence first so skin tones, flags and ZWJ families stay one emoji.
+    """
+    keys = sorted(emoji.EMOJI_DATA, key=len, reverse=True)
+    table = np.zeros(0x110000, dtype=bool)
+    table[[ord(c) for k in keys for c in k if not c.isascii()]] = True
+    sequences = re.compile('|'.join(map(re.escape, keys)))
+    return table, sequences
+
+
+def _candidate_runs(messages):
+    # (message position, text) of every run of emoji codepoints in the block
+    table, _ = emoji_tables()
+    text = '\n'.join(messages)
+    codepoints = np.frombuffer(text.encode('utf-32-le'), dtype=np.uint32)
+    mask = table[codepoints]
+    # Keycaps are the only emojis starting with an ASCII character
+    mask[:-1] |= np.isin(codepoints[:-1], _KEYCAP_BASES) & mask[1:]
+    edges = np.flatnonzero(np.diff(np.r_[False, mask, False].astype(np.int8)))
+    starts, ends = edges[::2], edges[1::2]
+    message_ends = np.cumsum([len(m) + 1 for m in messages])
+    positions = np.searchsorted(message_ends, starts, side='right')
+    return positions, [text[a:b] for a, b in zip(starts.tolist(), ends.tolist())]
+
+
+@profiled('features:emojis')
+def extract_emojis(messages):
+    """Flat Series of emojis in message order, indexed by message position."""
+    _, sequences = emoji_tables()
+    messages = pd.Series(messages).astype(str).tolist()
+    positions, runs = [], []
+    for start in range(0, len(messages), CHUNK_MESSAGES):
+        block_positions, block_runs = _candidate_runs(messages[start:start + CHUNK_MESSAGES])
+        positions.append(block_positions + start)
+        runs.extend(block_runs)
+    if not runs:
+        return pd.Series(dtype=object)
+    codes, uniques = pd.factorize(pd.Series(runs, dtype=object))
+    split = pd.Series([sequences.findall(r) for r in uniques], dtype=object)
+    emojis = pd.Series(split.to_numpy()[codes], index=np.concatenate(positions)).explode().dropna()
+    return emojis.astype(object)
+
+
+@profiled('features:urls')
+def count_links(messages):
+    """URLs per message; URLExtract only runs on rows the prefilter flags."""
+    counts = np.zeros(len(messages), dtype=np.int64)
+    candidates = np.flatnonzero(messages.str.contains(URL_CANDIDATE_PATTERN, case=False).to_numpy(dtype=bool))
+    if len(candidates):
+        extractor = url_extractor()
+        counts[candidates] = [len(extractor.find_urls(m)) for m in messages.iloc[candidates]]
+    return counts
+
+
+@profiled('features:types')
+def message_type(messages):
+    """Categorical text / media / deleted / system per message."""
+    codes = np.select(
+        [messages.str.match(p).to_numpy(dtype=bool) for p in (MEDIA_PATTERN, DELETED_PATTERN, SYSTEM_PATTERN)],
+        [1, 2, 3],
+        0,
+    )
+    return pd.Categorical.from_codes(codes, MESSAGE_TYPES)
+
+
+@profiled('features')
+def message_features(messages):
+    """Per-message features, one vectorized pass each, indexed like messages.
+
+    Columns: num_words (whitespace-separated words, as str.split), num_chars,
+    message_type, has_media, num_links and num_emojis.
+    """
+    messages = pd.Series(messages).astype(str)
+    arrow = pa.array(messages.to_numpy(dtype=object), type=pa.string())
+    # Arrow keeps an empty first/last piece for edge whitespace and counts '' as one word
+    trimmed = pc.utf8_trim_whitespace(arrow)
+    num_words = pc.if_else(
+        pc.equal(pc.utf8_length(trimmed), 0), 0, pc.list_value_length(pc.utf8_split_whitespace(trimmed))
+    )
+    kind = message_type(messages)
+    emojis = extract_emojis(messages)
+    return pd.DataFrame({
+        'num_words': pd.to_numeric(num_words.to_numpy(), downcast='unsigned'),
+        'num_chars': pd.to_numeric(pc.utf8_length(arrow).to_numpy(), downcast='unsigned'),
+        'message_type': kind,
+        'has_media': kind == 'media',
+        'num_links': pd.to_numeric(count_links(messages), downcast='unsigned'),
+        'num_emojis': pd.to_numeric(
+            np.bincount(emojis.index.to_numpy(dtype=np.int64), minlength=len(messages)), downcast='unsigned'
+        ),
+    }, index=messages.index)
@@ -0,0 +1,58 @@
+import io
+
+import numpy as np
+import pandas as pd
+
+from data_parser import CHUNK_BYTES, detect_chat_format, read_chat
+
+# Trailing messages whose hashes identify the end of a stored export
+FINGERPRINT_WINDOW = 20
+
+# A re-export is parsed from this many bytes before the previous export's
+# length, so small edits earlier in the history (deleted messages) still leave
+# the fingerprint inside the parsed tail; it is also all a different chat
+# under the same name costs before it is rejected
+OVERLAP_BYTES = 256 * 1024
+
+
+def message_hashes(df):
+    return pd.util.hash_pandas_object(df[['datetime', 'user', 'message']], index=False).to_numpy()
+
+
+def _window_end(parsed, last_datetime, window):
+    # Position just after the first run of messages matching the window, or None
+    candidates = np.flatnonzero(parsed['datetime'].to_numpy() == np.datetime64(last_datetime))
+    candidates = candidates[candidates >= len(window) - 1]
+    if not len(candidates):
+        return None
+    hashes = message_hashes(parsed)
+    for end in candidates + 1:
+        if np.array_equal(hashes[end - len(window):end], window):
+            return end
+    return None
+
+
+def read_new_messages(raw, previous_df, previous_length):
+    """Messages of a re-export that come after the stored frame's last message.
+
+    The end of the stored history is found from its last timestamp plus the
+    hashes of its last FINGERPRINT_WINDOW messages. Only the bytes from
+    OVERLAP_BYTES before the previous export's end are parsed. Returns None
+    when the fingerprint is not there: raw is another chat, or its history
+    changed by more than the overlap, and needs a full build.
+    """
+    if previous_df.empty:
+        return None
+    last_datetime = previous_df['datetime'].iloc[-1]
+    window = message_hashes(previous_df.tail(FINGERPRINT_WINDOW))
+    # Same first block as the original export, so the same format is detected
+    chat_format = detect_chat_format(raw[:CHUNK_BYTES].decode('utf-8', errors='ignore'))
+
+    # A re-export whose window starts later can be shorter than the stored one
+    start = max(0, min(previous_length, len(raw)) - OVERLAP_BYTES)
+    start = raw.rfind(b'\n', 0, start) + 1 if start else 0
+    parsed = read_chat(io.BytesIO(raw[start:]), chat_format=chat_format)
+    end = _window_end(parsed, last_datetime, window)
+    if end is None:
+        return None
+    return parsed.iloc[end:].reset_index(drop=True)
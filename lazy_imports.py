@@ -0,0 +1,54 @@
+import importlib
+import sys
+import threading
+import time
+
+from profiling import stage
+
+# Module name -> seconds its first import took in this process
+IMPORT_SECONDS = {}
+
+_lock = threading.Lock()
+
+
+def import_module(name):
+    """importlib.import_module that records how long the first import took."""
+    module = sys.modules.get(name)
+    if module is not None:
+        return module
+    with _lock:
+        start = time.perf_counter()
+        with stage(f"import:{name}"):
+            module = importlib.import_module(name)
+        IMPORT_SECONDS.setdefault(name, time.perf_counter() - start)
+    return module
+
+
+class LazyModule:
+    """Stand-in for a module, imported the first time one of its attributes is used.
+
+    For dependencies only some sections or code paths need (seaborn, pyplot),
+    so a cold start does not pay for them.
+    """
+
+    def __init__(self, name):
+        self._name = name
+        self._module = None
+
+    def __getattr__(self, attr):
+        if self._module is None:
+            self._module = import_module(self._name)
+        return getattr(self._module, attr)
+
+    def __repr__(self):
+        state = 'loaded' if self._module is not None else 'not loaded'
+        return f"<LazyModule {self._name} ({state})>"
+
+
+def is_loaded(name):
+    return name in sys.modules
+
+
+def import_report():
+    """(module, seconds) of the lazy imports done so far, slowest first."""
+    return sorted(IMPORT_SECONDS.items(), key=lambda item: item[1], reverse=True)
@@ -0,0 +1,175 @@
+import io
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from itertools import repeat
+
+import numpy as np
+import pandas as pd
+from pandas.api.types import union_categoricals
+
+from chat_cache import content_hash
+from data_parser import read_chat
+from features import message_features
+from incremental import read_new_messages
+from profiling import profiled, stage
+from sentiment import score_sentiment
+from tone import load_tone_classifier, tone_fingerprint
+
+# Bump whenever parsing or enrichment changes so cached frames get rebuilt
+PIPELINE_VERSION = "9"
+
+
+def chat_key(raw, sentiment_method, tone_classifier):
+    """Cache key of a processed export: content, pipeline version, sentiment method and tone keywords."""
+    return (content_hash(raw), PIPELINE_VERSION, sentiment_method, tone_fingerprint(tone_classifier))
+
+
+WEEKDAYS = ['Monday', 'Tuesday', 'Wednesday', 'Thursday', 'Friday', 'Saturday', 'Sunday']
+
+
+@profiled('enrich')
+def enrich_chat(df, tone_classifier=None, sentiment_method='pattern'):
+    # Compact layout: categorical labels, small ints and no per-row Python
+    # date/time objects; calendar days come from message_days
+    df['user'] = df['user'].astype('category')
+    df['hour'] = df['datetime'].dt.hour.astype(np.int8)
+    df['weekday'] = pd.Categorical.from_codes(df['datetime'].dt.dayofweek, WEEKDAYS)
+
+    # Word/char counts, message type, links and emojis in one pass
+    features = message_features(df['message'])
+    for col in features.columns:
+        df[col] = features[col]
+
+    # Sentiment
+    df['sentiment'] = score_sentiment(df['message'], sentiment_method).astype(np.float32)
+
+    # Tone (only when the keyword file is available)
+    if tone_classifier is not None:
+        df['tone'] = tone_classifier.classify(df['message']).astype('category')
+    else:
+        df['tone'] = pd.Categorical(['other'] * len(df))
+    return df
+
+
+def message_days(df):
+    """Calendar day of each message as datetime64 (midnight), derived on demand."""
+    return df['datetime'].dt.normalize().rename('day')
+
+
+def concat_frames(frames):
+    """pd.concat that keeps categorical columns categorical (categories are unioned)."""
+    frames = [f for f in frames if not f.empty] or frames[:1]
+    if len(frames) == 1:
+        return frames[0]
+    columns = {
+        col: union_categoricals([f[col] for f in frames])
+        for col in frames[0].columns
+        if all(isinstance(f[col].dtype, pd.CategoricalDtype) for f in frames)
+    }
+    df = pd.concat(frames, ignore_index=True)
+    for col, values in columns.items():
+        df[col] = values
+    df.attrs = dict(frames[0].attrs)
+    return df
+
+
+def memory_report(df):
+    """Deep bytes per column and per message, largest columns first."""
+    usage = df.memory_usage(deep=True, index=False).sort_values(ascending=False)
+    return pd.DataFrame({'bytes': usage, 'bytes_per_message': usage / max(len(df), 1)})
+
+
+def build_chat_frame(source, tone_classifier=None, sentiment_method='pattern'):
+    """Parse an export (path or binary buffer) and add every per-message column the app needs."""
+    df = read_chat(source)
+    if df.empty:
+        return df
+    # Kept in time order so date ranges are searchsorted slices
+    if not df['datetime'].is_monotonic_increasing:
+        df = df.sort_values('datetime', kind='stable', ignore_index=True)
+    return enrich_chat(df, tone_classifier, sentiment_method)
+
+
+class ChatDataset:
+    """An enriched chat frame plus the aggregates built from it.
+
+    Aggregates are built on first use. Those registered with an append
+    function are carried over to the extended dataset when newer messages are
+    added, instead of being rebuilt from the whole history.
+    """
+
+    def __init__(self, df, raw_length=0, name=None):
+        self.df = df
+        self.raw_length = raw_length
+        # Upload file name; re-exports of a chat keep the same one
+        self.name = name
+        # Rows added by the last incremental update, None for a full build
+        self.appended = None
+        self._aggregates = {}
+        self._lock = threading.Lock()
+
+    def aggregate(self, name, build, append=None):
+        """build(df) once per dataset; append(value, tail) extends it, None means rebuild."""
+        with self._lock:
+            if name not in self._aggregates:
+                with stage(f"aggregate:{name[0] if isinstance(name, tuple) else name}"):
+                    self._aggregates[name] = (build(self.df), append)
+            return self._aggregates[name][0]
+
+    def append(self, tail, raw_length, name=None):
+        """New dataset with the enriched tail rows after the current ones."""
+        df = concat_frames([self.df, tail])
+        extended = ChatDataset(df, raw_length, name or self.name)
+        extended.appended = len(tail)
+        with self._lock:
+            aggregates = dict(self._aggregates)
+        for key, (value, append) in aggregates.items():
+            if append is None:
+                continue
+            value = value if tail.empty else append(value, tail)
+            if value is not None:
+                extended._aggregates[key] = (value, append)
+        return extended
+
+
+def build_chat_dataset(raw, tone_classifier=None, sentiment_method='pattern', name=None):
+    df = build_chat_frame(io.BytesIO(raw), tone_classifier, sentiment_method)
+    return ChatDataset(df, len(raw), name)
+
+
+def _build_frame_in_worker(raw, keywords_path, sentiment_method):
+    # The tone classifier is loaded in each worker (once per process) instead
+    # of being pickled
+    tone_classifier = load_tone_classifier(keywords_path) if keywords_path else None
+    return build_chat_frame(io.BytesIO(raw), tone_classifier, sentiment_method)
+
+
+def build_chat_datasets(raws, keywords_path=None, sentiment_method='pattern', names=None, workers=None):
+    """build_chat_dataset for several exports, parsed and enriched in parallel processes."""
+    names = names or [None] * len(raws)
+    workers = min(len(raws), workers or os.cpu_count() or 1)
+    if workers <= 1:
+        frames = [_build_frame_in_worker(raw, keywords_path, sentiment_method) for raw in raws]
+    else:
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            frames = list(pool.map(_build_frame_in_worker, raws, repeat(keywords_path), repeat(sentiment_method)))
+    return [ChatDataset(df, len(raw), name) for df, raw, name in zip(frames, raws, names)]
+
+
+def update_chat_dataset(previous, raw, tone_classifier=None, sentiment_method='pattern', name=None):
+    """previous plus the messages a newer export of the same chat adds.
+
+    Only the new tail is parsed and enriched. Returns None when raw does not
+    continue previous, or when its new messages are older than the stored ones.
+    """
+    tail = read_new_messages(raw, previous.df, previous.raw_length)
+    if tail is None:
+        return None
+    if not tail.empty:
+        tail = tail.sort_values('datetime', kind='stable', ignore_index=True)
+        if tail['datetime'].iloc[0] < previous.df['datetime'].iloc[-1]:
+            # Appending would break the time order of the stored frame
+            return None
+        tail = enrich_chat(tail, tone_classifier, sentiment_method)
+    return previous.append(tail, len(raw), name)
@@ -0,0 +1,155 @@
+import functools
+import json
+import os
+import threading
+import time
+import tracemalloc
+from contextlib import nullcontext
+
+import pandas as pd
+
+# WHATSAPP_ANALYZER_PROFILE=1 records wall time and calls per stage;
+# =memory also records each stage's peak allocation with tracemalloc (slower)
+PROFILE_ENV = 'WHATSAPP_ANALYZER_PROFILE'
+PROFILE_MODE = os.environ.get(PROFILE_ENV, '').strip().lower()
+ENABLED = PROFILE_MODE not in ('', '0', 'false', 'off', 'no')
+TRACE_MEMORY = PROFILE_MODE == 'memory'
+
+_NULL = nullcontext()
+_local = threading.local()
+
+
+class _Stage:
+    __slots__ = ('profiler', 'name', 'start', 'memory_start', 'memory_peak')
+
+    def __init__(self, profiler, name):
+        self.profiler = profiler
+        self.name = name
+
+    def __enter__(self):
+        if self.profiler.trace_memory:
+            current, peak = tracemalloc.get_traced_memory()
+            stack = self.profiler._memory_stack
+            if stack:
+                stack[-1].memory_peak = max(stack[-1].memory_peak, peak)
+            tracemalloc.reset_peak()
+            self.memory_start = self.memory_peak = current
+            stack.append(self)
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        end = time.perf_counter()
+        peak = None
+        if self.profiler.trace_memory:
+            self.memory_peak = max(self.memory_peak, tracemalloc.get_traced_memory()[1])
+            stack = self.profiler._memory_stack
+            stack.pop()
+            if stack:
+                stack[-1].memory_peak = max(stack[-1].memory_peak, self.memory_peak)
+            tracemalloc.reset_peak()
+            peak = self.memory_peak - self.memory_start
+        self.profiler.events.append((self.name, self.start, end - self.start, threading.get_ident(), peak))
+        return False
+
+
+class Profiler:
+    """Wall time, call count and (optionally) peak traced memory per named stage.
+
+    Stages nest; a stage's time and peak include its children. tracemalloc is
+    process-wide, so with trace_memory the peaks of concurrent sessions mix.
+    """
+
+    def __init__(self, trace_memory=False):
+        self.trace_memory = trace_memory
+        self.events = []
+        self._memory_stack = []
+        self.started = time.perf_counter()
+        if trace_memory and not tracemalloc.is_tracing():
+            tracemalloc.start()
+
+    def stage(self, name):
+        return _Stage(self, name)
+
+    def add(self, name, start):
+        """Record a stage that started at start (perf_counter) and ends now, without memory."""
+        self.events.append((name, start, time.perf_counter() - start, threading.get_ident(), None))
+
+    def elapsed(self):
+        return time.perf_counter() - self.started
+
+    def summary(self):
+        """One row per stage: calls, total/mean/max milliseconds and peak MiB, slowest first."""
+        columns = ['stage', 'calls', 'total_ms', 'mean_ms', 'max_ms', 'peak_mib']
+        if not self.events:
+            return pd.DataFrame(columns=columns)
+        events = pd.DataFrame(self.events, columns=['stage', 'start', 'seconds', 'thread', 'peak'])
+        events['ms'] = events['seconds'] * 1000
+        summary = events.groupby('stage', sort=False).agg(
+            calls=('ms', 'size'), total_ms=('ms', 'sum'), mean_ms=('ms', 'mean'), max_ms=('ms', 'max'),
+            peak_mib=('peak', 'max'),
+        )
+        summary['peak_mib'] = summary['peak_mib'] / 2 ** 20
+        if not self.trace_memory:
+            summary = summary.drop(columns='peak_mib')
+        return summary.sort_values('total_ms', ascending=False).reset_index()
+
+    def chrome_trace(self):
+        """Events in Chrome trace format (chrome://tracing, Perfetto), as a JSON string."""
+        pid = os.getpid()
+        events = []
+        for name, start, seconds, thread, peak in self.events:
+            event = {
+                'name': name, 'cat': name.split(':', 1)[0], 'ph': 'X', 'pid': pid, 'tid': thread,
+                'ts': (start - self.started) * 1e6, 'dur': seconds * 1e6,
+            }
+            if peak is not None:
+                event['args'] = {'peak_bytes': peak}
+            events.append(event)
+        return json.dumps({'traceEvents': events, 'displayTimeUnit': 'ms'})
+
+
+def activate(profiler):
+    """Make profiler the one stage() records into on this thread (None to stop)."""
+    _local.profiler = profiler
+    return profiler
+
+
+def stage(name):
+    """Context manager timing name in this thread's profiler; a shared no-op when none is active."""
+    profiler = getattr(_local, 'profiler', None)
+    return profiler.stage(name) if profiler is not None else _NULL
+
+
+def profiled(name):
+    """Decorator recording each call as a stage; returns func unchanged when profiling is off."""
+    def decorate(func):
+        if not ENABLED:
+            return func
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            with stage(name):
+                return func(*args, **kwargs)
+        return wrapper
+    return decorate
+
+
+def unprofiled(func):
+    """Decorator running func with no active profiler on this thread, restored afterwards.
+
+    For code that can run on its own after the profile was shown (Streamlit
+    fragment reruns), which would otherwise record into the previous run's profiler.
+    """
+    if not ENABLED:
+        return func
+
+    @functools.wraps(func)
+    def wrapper(*args, **kwargs):
+        profiler = getattr(_local, 'profiler', None)
+        activate(None)
+        try:
+            return func(*args, **kwargs)
+        finally:
+            activate(profiler)
+    return wrapper
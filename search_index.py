@@ -0,0 +1,213 @@
+import re
+
+import numpy as np
+import pandas as pd
+
+from profiling import profiled
+
+TOKEN_PATTERN = r'\w+'
+
+# BM25 parameters
+K1 = 1.2
+B = 0.75
+
+_QUERY_PATTERN = re.compile(r'"([^"]*)"|(\S+)')
+
+
+_EMPTY = (np.zeros(0, dtype=np.int64), np.zeros(0, dtype=np.float64))
+
+
+def _combine(docs, scores, ufunc):
+    # Merge duplicate doc ids (sorted result), reducing their scores with ufunc
+    if not len(docs):
+        return _EMPTY
+    order = np.argsort(docs, kind='stable')
+    docs, scores = docs[order], scores[order]
+    starts = np.flatnonzero(np.r_[True, docs[1:] != docs[:-1]])
+    return docs[starts], ufunc.reduceat(scores, starts)
+
+
+def _and(parts):
+    # Docs present in every part, scores summed
+    if not parts:
+        return _EMPTY
+    docs = parts[0][0]
+    for part_docs, _ in parts[1:]:
+        docs = np.intersect1d(docs, part_docs, assume_unique=True)
+    scores = np.zeros(len(docs))
+    for part_docs, part_scores in parts:
+        scores += part_scores[np.searchsorted(part_docs, docs)]
+    return docs, scores
+
+
+def _bitmap(mask):
+    return np.packbits(mask)
+
+
+def _bits(bitmap, docs):
+    # Membership test for a handful of doc ids without unpacking the bitmap
+    return ((bitmap[docs >> 3] >> (7 - (docs & 7))) & 1).astype(bool)
+
+
+class ChatSearchIndex:
+    """Inverted index over message tokens with BM25 ranking.
+
+    Doc ids are row positions in the frame the index was built from. Query
+    syntax: words are OR-ed like the old search, ``AND``/``OR`` combine them
+    explicitly (AND binds tighter), ``pre*`` matches a prefix and
+    ``"two words"`` an exact phrase.
+    """
+
+    def __init__(self, df):
+        tokens, self.doc_len = self._tokenize(df)
+        term_codes, terms = pd.factorize(tokens, sort=True)
+        self.terms = np.asarray(terms, dtype=object)
+        # Token stream in message order, for phrase adjacency checks
+        self.flat_terms = term_codes.astype(np.int32)
+        self.flat_docs = tokens.index.to_numpy(dtype=np.int64)
+        self._doc_users = df['user'].astype(str).to_numpy(dtype=object)
+        self._doc_months = df['datetime'].dt.to_period('M').astype(str).to_numpy(dtype=object)
+        self._build()
+
+    @staticmethod
+    def _tokenize(df):
+        tokens = df['message'].astype(str).reset_index(drop=True).str.lower().str.findall(TOKEN_PATTERN)
+        doc_len = tokens.str.len().fillna(0).to_numpy(dtype=np.float64)
+        return tokens.explode().dropna(), doc_len
+
+    def _build(self):
+        self.n_docs = n = len(self.doc_len)
+        self.avg_len = self.doc_len.mean() if n else 0.0
+
+        # Postings sorted by (term, doc) with term frequencies
+        key = self.flat_terms.astype(np.int64) * max(n, 1) + self.flat_docs
+        key, tf = np.unique(key, return_counts=True)
+        post_terms = key // max(n, 1)
+        self.post_docs = (key % max(n, 1)).astype(np.int64)
+        self.post_tf = tf.astype(np.float64)
+        self.offsets = np.searchsorted(post_terms, np.arange(len(self.terms) + 1))
+
+        # Filters: one packed bitmap per user and per month
+        users = self._doc_users
+        self.user_bitmaps = {u: _bitmap(users == u) for u in pd.unique(users)}
+        months = self._doc_months
+        self.months = pd.unique(months).tolist()
+        self.month_bitmaps = {m: _bitmap(months == m) for m in self.months}
+
+    def append(self, tail):
+        """Index with the tail messages added as docs n_docs, n_docs + 1, ...
+
+        Only the tail is tokenized; existing term ids are remapped onto the
+        merged vocabulary and the postings are rebuilt from the token stream.
+        """
+        tokens, tail_len = self._tokenize(tail)
+        terms = np.union1d(self.terms, pd.unique(tokens)).astype(object) if len(tokens) else self.terms
+        index = ChatSearchIndex.__new__(ChatSearchIndex)
+        index.terms = terms
+        index.flat_terms = np.concatenate([
+            np.searchsorted(terms, self.terms).astype(np.int32)[self.flat_terms],
+            pd.Index(terms).get_indexer(tokens.to_numpy()).astype(np.int32),
+        ])
+        index.flat_docs = np.concatenate([self.flat_docs, tokens.index.to_numpy(dtype=np.int64) + self.n_docs])
+        index.doc_len = np.concatenate([self.doc_len, tail_len])
+        index._doc_users = np.concatenate([self._doc_users, tail['user'].astype(str).to_numpy(dtype=object)])
+        index._doc_months = np.concatenate([
+            self._doc_months, tail['datetime'].dt.to_period('M').astype(str).to_numpy(dtype=object)
+        ])
+        index._build()
+        return index
+
+    # -- term lookup -------------------------------------------------------
+
+    def _term_range(self, term, prefix=False):
+        lo = np.searchsorted(self.terms, term, side='left')
+        if prefix:
+            hi = np.searchsorted(self.terms, term + '\U0010ffff', side='left')
+        else:
+            hi = lo + 1 if lo < len(self.terms) and self.terms[lo] == term else lo
+        return lo, hi
+
+    def _term_scores(self, term, prefix=False):
+        # BM25 contribution of one (possibly prefix-expanded) term: (docs, scores)
+        lo, hi = self._term_range(term, prefix)
+        start, end = self.offsets[lo], self.offsets[hi]
+        docs = self.post_docs[start:end]
+        tf = self.post_tf[start:end]
+        df_counts = np.diff(self.offsets[lo:hi + 1])
+        n_postings = np.repeat(df_counts, df_counts)
+        idf = np.log(1 + (self.n_docs - n_postings + 0.5) / (n_postings + 0.5))
+        norm = tf + K1 * (1 - B + B * self.doc_len[docs] / self.avg_len)
+        return _combine(docs, idf * tf * (K1 + 1) / norm, np.add)
+
+    def _phrase_scores(self, phrase):
+        words = re.findall(TOKEN_PATTERN, phrase.lower())
+        if not words:
+            return _EMPTY
+        docs, scores = _and([self._term_scores(w) for w in words])
+        if len(words) == 1 or not len(docs):
+            return docs, scores
+        # Keep docs where the words are consecutive tokens of the same message
+        ids = [self._term_range(w)[0] for w in words]
+        last = len(words) - 1
+        pos = np.flatnonzero(self.flat_terms[:len(self.flat_terms) - last] == ids[0])
+        for j, t in enumerate(ids[1:], 1):
+            pos = pos[self.flat_terms[pos + j] == t]
+        pos = pos[self.flat_docs[pos + last] == self.flat_docs[pos]]
+        keep = np.isin(docs, self.flat_docs[pos])
+        return docs[keep], scores[keep]
+
+    # -- queries -----------------------------------------------------------
+
+    def _parse(self, query):
+        # Returns OR-ed groups of AND-ed clauses
+        groups, current, pending_and = [], [], False
+        for phrase, word in _QUERY_PATTERN.findall(query):
+            if word in ('AND', 'OR'):
+                pending_and = word == 'AND'
+                continue
+            clause = ('phrase', phrase) if phrase or not word else (
+                ('prefix', word[:-1].lower()) if word.endswith('*') and len(word) > 1
+                else ('term', word.lower())
+            )
+            if current and not pending_and:
+                groups.append(current)
+                current = []
+            current.append(clause)
+            pending_and = False
+        if current:
+            groups.append(current)
+        return groups
+
+    def _clause_scores(self, kind, value):
+        if kind == 'phrase':
+            return self._phrase_scores(value)
+        if kind == 'prefix':
+            return self._term_scores(value, prefix=True)
+        # Plain words may contain punctuation; require all their tokens
+        words = re.findall(TOKEN_PATTERN, value)
+        return _and([self._term_scores(w) for w in words])
+
+    @profiled('search')
+    def search(self, query, user=None, month=None, doc_range=None):
+        """Return (doc ids, scores) for the query, best first.
+
+        user / month restrict results with the precomputed bitmaps; doc_range is
+        an optional (start, stop) slice of doc positions.
+        """
+        groups = [_and([self._clause_scores(*c) for c in group]) for group in self._parse(query)]
+        if groups:
+            docs, values = _combine(
+                np.concatenate([g[0] for g in groups]), np.concatenate([g[1] for g in groups]), np.maximum
+            )
+        else:
+            docs, values = _EMPTY
+        keep = np.ones(len(docs), dtype=bool)
+        if user is not None:
+            keep &= _bits(self.user_bitmaps[user], docs) if user in self.user_bitmaps else False
+        if month is not None:
+            keep &= _bits(self.month_bitmaps[month], docs) if month in self.month_bitmaps else False
+        if doc_range is not None:
+            keep &= (docs >= doc_range[0]) & (docs < doc_range[1])
+        docs, values = docs[keep], values[keep]
+        order = np.lexsort((docs, -values))
+        return docs[order], values[order]
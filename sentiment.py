@@ -0,0 +1,108 @@
+import threading
+from functools import lru_cache
+
+import numpy as np
+import pandas as pd
+
+from lazy_imports import LazyModule
+from profiling import profiled
+
+# textblob imports nltk (~1 s): loaded on the first score, not at startup. The
+# Pattern lexicon ships with textblob, nothing is downloaded
+textblob_en = LazyModule('textblob.en')
+
+# Unique texts scored per batch and kept in the shared cache
+BATCH_SIZE = 5000
+CACHE_MAX_TEXTS = 500_000
+
+METHODS = ('pattern', 'lexicon')
+
+
+def normalize_messages(messages):
+    # Same text up to surrounding/repeated whitespace gets the same score
+    return messages.astype(str).str.strip().str.replace(r'\s+', ' ', regex=True)
+
+
+@lru_cache(maxsize=1)
+def _lexicon_polarity():
+    # word -> polarity averaged over all its senses (Pattern's None entry)
+    lexicon = textblob_en.sentiment
+    lexicon.load()
+    return {word: tags[None][0] for word, tags in dict.items(lexicon)}
+
+
+def score_lexicon(texts):
+    """Fast path: mean lexicon polarity of the words in each text (no negation/intensifiers)."""
+    texts = pd.Series(texts, dtype=object).reset_index(drop=True)
+    words = texts.str.lower().str.findall(r"[a-z']+").explode()
+    polarity = words.map(_lexicon_polarity()).dropna()
+    scores = polarity.astype(float).groupby(level=0).mean()
+    return scores.reindex(texts.index, fill_value=0.0).to_numpy()
+
+
+class SentimentScorer:
+    """Scores each distinct normalized message once and keeps the result for later calls.
+
+    'pattern' gives exactly TextBlob's PatternAnalyzer polarity; 'lexicon' is
+    the vectorized approximation.
+    """
+
+    def __init__(self, method='pattern', max_entries=CACHE_MAX_TEXTS, batch_size=BATCH_SIZE):
+        if method not in METHODS:
+            raise ValueError(f"Unknown sentiment method: {method}")
+        self.method = method
+        self.max_entries = max_entries
+        self.batch_size = batch_size
+        self._cache = {}
+        self._lock = threading.Lock()
+
+    def _score_batch(self, texts):
+        if self.method == 'lexicon':
+            return score_lexicon(texts)
+        pattern_sentiment = textblob_en.sentiment
+        return np.fromiter((pattern_sentiment(t)[0] for t in texts), dtype=float, count=len(texts))
+
+    @profiled('sentiment')
+    def score(self, messages):
+        messages = pd.Series(messages)
+        if messages.empty:
+            return pd.Series(dtype=float, index=messages.index)
+        codes, uniques = pd.factorize(normalize_messages(messages))
+        uniques = pd.Series(uniques, dtype=object)
+
+        with self._lock:
+            values = uniques.map(self._cache).to_numpy(dtype=float, copy=True)
+        missing = np.flatnonzero(np.isnan(values))
+        for start in range(0, len(missing), self.batch_size):
+            idx = missing[start:start + self.batch_size]
+            texts = uniques.iloc[idx].tolist()
+            scores = self._score_batch(texts)
+            values[idx] = scores
+            with self._lock:
+                self._cache.update(zip(texts, scores))
+
+        with self._lock:
+            # Oldest entries go first once the cache is full
+            overflow = len(self._cache) - self.max_entries
+            if overflow > 0:
+                for key in list(self._cache)[:overflow]:
+                    del self._cache[key]
+        return pd.Series(values[codes], index=messages.index)
+
+    def __len__(self):
+        return len(self._cache)
+
+
+@lru_cache(maxsize=None)
+def get_scorer(method='pattern'):
+    """Process-wide scorer, shared by every chat enriched in this process.
+
+    In the app that is the main view and its incremental updates; when the
+    comparator or a batch job builds several chats at once they run in worker
+    processes, each with its own scorer.
+    """
+    return SentimentScorer(method)
+
+
+def score_sentiment(messages, method='pattern'):
+    return get_scorer(method).score(messages)
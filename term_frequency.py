@@ -0,0 +1,79 @@
+import os
+from functools import lru_cache
+
+import numpy as np
+import pandas as pd
+
+from analytics import ItemCounts
+
+STOPWORDS_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "stopwords-hinglish.txt")
+
+# Export placeholders and common Spanish words (the lists tab4 and the word game used)
+EXTRA_STOPWORDS = {
+    "multimedia", "media", "omitido", "enlace", "link", "null", "mensaje", "este", "eliminado",
+    "elimino", "eliminó", "omitted", "https", "status", "deleted", "para", "pero", "como", "todo",
+    "esta", "con", "que", "los", "las", "por", "una", "unos", "unas", "del", "sus", "muy",
+    "más", "menos", "tiene", "tienen", "fue", "son", "era", "eres", "soy", "han", "hay", "aqui",
+    "aquí", "ese", "esa",
+}
+
+MIN_WORD_LENGTH = 4
+
+TOKEN_PATTERN = r'\w+'
+
+
+@lru_cache(maxsize=1)
+def load_stopwords(path=STOPWORDS_PATH):
+    """Words from the stopword file plus EXTRA_STOPWORDS, lowercased."""
+    words = set(EXTRA_STOPWORDS)
+    if os.path.exists(path):
+        with open(path, encoding="utf-8") as f:
+            words.update(line.strip().lower() for line in f if line.strip())
+    return frozenset(words)
+
+
+class TermFrequencyStore:
+    """Sparse user x term and day x term counts, built in one pass over the messages.
+
+    Only words of at least MIN_WORD_LENGTH characters that are not stopwords are
+    kept.
+    """
+
+    def __init__(self, df, stopwords=None, counts=None):
+        self.stopwords = load_stopwords() if stopwords is None else stopwords
+        self.counts = ItemCounts(df, *self._tokens(df)) if counts is None else counts
+        self.terms = self.counts.items
+
+    def _tokens(self, df):
+        tokens = df['message'].astype(str).str.lower().str.findall(TOKEN_PATTERN)
+        tokens = tokens.reset_index(drop=True).explode().dropna()
+        keep = (tokens.str.len() >= MIN_WORD_LENGTH) & ~tokens.isin(self.stopwords)
+        tokens = tokens[keep]
+        return tokens.index.to_numpy(), tokens.to_numpy()
+
+    def append(self, tail):
+        """Store with the tail messages counted too."""
+        return TermFrequencyStore(None, self.stopwords, self.counts.append(tail, *self._tokens(tail)))
+
+    def __len__(self):
+        return len(self.terms)
+
+    def frequencies(self, start=None, end=None):
+        """Series term -> count, optionally restricted to days in [start, end]."""
+        counts = self.counts.frequencies(start, end)
+        nonzero = np.flatnonzero(counts)
+        return pd.Series(counts[nonzero], index=self.terms[nonzero])
+
+    def top_terms(self, n=10, start=None, end=None):
+        return self.counts.ranked(self.counts.frequencies(start, end), n)
+
+    def user_counts(self, word, start=None, end=None):
+        """Series user -> times the user wrote the word (users who never did are left out)."""
+        return self.counts.item_column(word, start, end)
+
+    def random_term(self, start=None, end=None, rng=np.random):
+        """A term drawn with probability proportional to its count; None if there are none."""
+        counts = self.counts.frequencies(start, end)
+        if not counts.sum():
+            return None
+        return self.terms[rng.choice(len(self.terms), p=counts / counts.sum())]
@@ -0,0 +1,18 @@
+import os
+import sys
+
+import pytest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+sys.path.insert(0, os.path.join(ROOT, 'benchmarks'))
+
+from synthetic_chat import generate_chat  # noqa: E402
+
+
+@pytest.fixture(scope='session')
+def chat_path(tmp_path_factory):
+    """A small synthetic export with multi-line messages, media, links and mentions."""
+    path = tmp_path_factory.mktemp('chats') / 'chat.txt'
+    generate_chat(str(path), messages=3000, users=5, days=120, multiline=0.1, seed=1)
+    return str(path)
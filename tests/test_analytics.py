@@ -0,0 +1,124 @@
+import re
+from collections import defaultdict
+
+import numpy as np
+import pandas as pd
+
+from analytics import ItemCounts, MentionCounts, Sessions
+from pipeline import build_chat_frame
+from synthetic_chat import generate_chat
+
+
+def baseline_reply_matrix(df, max_gap_minutes=10):
+    # The reply count the app did before sessions existed, with a stable sort
+    # (quicksort could reorder messages sent in the same minute)
+    df_sorted = df.sort_values('datetime', kind='stable').reset_index(drop=True)
+    df_sorted['prev_user'] = df_sorted['user'].shift(1)
+    df_sorted['prev_time'] = df_sorted['datetime'].shift(1)
+    df_sorted['time_diff'] = (df_sorted['datetime'] - df_sorted['prev_time']).dt.total_seconds() / 60
+    mask = (df_sorted['user'] != df_sorted['prev_user']) & (df_sorted['time_diff'] <= max_gap_minutes)
+    reply_pairs = df_sorted.loc[mask, ['prev_user', 'user']]
+    reply_counts = reply_pairs.groupby(['prev_user', 'user']).size().reset_index(name='responses')
+    return reply_counts.pivot(index='prev_user', columns='user', values='responses').fillna(0).astype(int)
+
+
+def test_reply_matrix_matches_baseline_pivot(chat_path):
+    df = build_chat_frame(chat_path, None, 'lexicon')
+    expected = baseline_reply_matrix(df.assign(user=df['user'].astype(str)))
+    matrix = Sessions(df, 10).reply_matrix()
+    pd.testing.assert_frame_equal(matrix, expected, check_names=False, check_dtype=False,
+                                  check_index_type=False, check_column_type=False)
+
+
+def test_sessions_split_on_gaps():
+    df = pd.DataFrame({
+        'datetime': pd.to_datetime(['2024-01-01 10:00', '2024-01-01 10:05', '2024-01-01 10:20',
+                                    '2024-01-01 10:21', '2024-01-01 10:25']),
+        'user': pd.Categorical(['Ana', 'Bea', 'Ana', 'Ana', 'Carla']),
+    })
+    sessions = Sessions(df, 10)
+
+    table = sessions.table()
+    assert table['messages'].tolist() == [2, 3]
+    assert table['users'].tolist() == [2, 2]
+    assert table['starter'].tolist() == ['Ana', 'Ana']
+    assert table['ender'].tolist() == ['Bea', 'Carla']
+    assert table['minutes'].tolist() == [5.0, 5.0]
+
+    by_user = sessions.by_user()
+    assert by_user.loc['Ana', 'started'] == 2 and by_user.loc['Ana', 'replies'] == 0
+    assert by_user.loc['Bea', 'median_reply_minutes'] == 5.0
+    assert by_user.loc['Carla', 'median_reply_minutes'] == 4.0
+    # A range starting at the second session only counts what is in it
+    assert sessions.table(2, 5)['starter'].tolist() == ['Ana']
+    assert sessions.reply_matrix(2, 5).loc['Ana', 'Carla'] == 1
+
+
+def baseline_mentions(df):
+    # The iterrows count the app did before MentionCounts
+    users = df['user'].dropna().unique().tolist()
+    users_clean = [u for u in users if isinstance(u, str) and not u.strip().isdigit() and len(u.strip()) > 0]
+    name_map = defaultdict(list)
+    for full_name in users_clean:
+        for token in full_name.lower().split():
+            name_map[token].append(full_name)
+    mention_counts = pd.DataFrame(0, index=users_clean, columns=users_clean)
+    for _, row in df.iterrows():
+        msg = str(row['message']).lower()
+        sender = row['user']
+        if sender not in users_clean:
+            continue
+        for token in set(re.findall(r'\b\w+\b', msg)):
+            for target in name_map.get(token, []):
+                if target != sender:
+                    mention_counts.loc[sender, target] += 1
+    return mention_counts
+
+
+def test_mention_matrix_matches_iterrows_count(tmp_path):
+    path = tmp_path / 'chat.txt'
+    # 30 users, so several share a first or last name
+    generate_chat(str(path), messages=3000, users=30, days=90, mentions=0.3, seed=4)
+    df = build_chat_frame(str(path), None, 'lexicon')
+    extra = pd.DataFrame({
+        'datetime': pd.to_datetime(['2030-01-01 10:00'] * 4),
+        'user': ['12345', df['user'].iloc[0], df['user'].iloc[1], df['user'].iloc[1]],
+        'message': [df['user'].iloc[0], df['user'].iloc[0].upper() + ' y ' + df['user'].iloc[0], None,
+                    'banana' + df['user'].iloc[0].split()[0].lower()],
+    })
+    df = pd.concat([df[['datetime', 'user', 'message']].astype({'user': object}), extra], ignore_index=True)
+
+    expected = baseline_mentions(df)
+    matrix = MentionCounts(df).matrix()
+    assert expected.to_numpy().sum() > 0
+    pd.testing.assert_frame_equal(matrix, expected, check_dtype=False)
+    np.testing.assert_array_equal(MentionCounts(df.iloc[:2000]).append(df.iloc[2000:]).matrix(), matrix)
+
+
+def test_item_counts_match_grouped_counts():
+    rng = np.random.default_rng(6)
+    n = 500
+    df = pd.DataFrame({
+        'datetime': pd.Timestamp('2024-01-01') + pd.to_timedelta(np.sort(rng.integers(0, 60 * 24 * 40, n)), 'min'),
+        'user': rng.choice(['Ana', 'Bea', 'Carla', 'Dani'], n),
+    })
+    msg_ids = rng.integers(0, n, 2000)
+    items = rng.choice(['x', 'y', 'z', 'w', 'v'], 2000)
+    hits = pd.DataFrame({'user': df['user'].to_numpy()[msg_ids], 'item': items,
+                         'day': df['datetime'].dt.normalize().to_numpy()[msg_ids]})
+    start, end = pd.Timestamp('2024-01-10'), pd.Timestamp('2024-01-25')
+    in_range = hits[(hits['day'] >= start) & (hits['day'] <= end)]
+
+    head = msg_ids < 300
+    counts = ItemCounts(df, msg_ids, items)
+    appended = ItemCounts(df.iloc[:300], msg_ids[head], items[head]).append(
+        df.iloc[300:].reset_index(drop=True), msg_ids[~head] - 300, items[~head])
+    for c in (counts, appended):
+        assert dict(zip(c.items, c.frequencies())) == hits['item'].value_counts().to_dict()
+        for item in ['x', 'v']:
+            expected = in_range[in_range['item'] == item]['user'].value_counts()
+            assert c.item_column(item, start, end).to_dict() == expected.to_dict()
+            assert c.item_column(item).to_dict() == hits[hits['item'] == item]['user'].value_counts().to_dict()
+        row = dict(zip(c.items, c.user_row('Bea', start, end)))
+        assert {k: v for k, v in row.items() if v} == in_range[in_range['user'] == 'Bea']['item'].value_counts().to_dict()
+        assert c.item_column('missing').empty
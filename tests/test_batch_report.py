@@ -0,0 +1,21 @@
+import json
+import os
+
+import pytest
+
+from batch_report import analyze_export
+from pipeline import build_chat_frame, chat_key
+
+
+def test_report_matches_the_app_defaults(chat_path, tmp_path):
+    entry = analyze_export(chat_path, str(tmp_path), table_format='json', keywords_path=str(tmp_path / 'none.csv'))
+    with open(chat_path, 'rb') as f:
+        raw = f.read()
+    # The app's default sentiment method and the key it caches the chat under
+    assert entry['key'] == list(chat_key(raw, 'pattern', None))
+
+    df = build_chat_frame(chat_path, None, 'pattern')
+    with open(os.path.join(tmp_path, entry['name'], 'summary.json'), encoding='utf-8') as f:
+        summary = json.load(f)
+    assert summary['messages'] == len(df)
+    assert summary['sentiment']['mean'] == pytest.approx(float(df['sentiment'].mean()))
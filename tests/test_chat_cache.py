@@ -0,0 +1,33 @@
+import pandas as pd
+
+from chat_cache import DiskChatCache
+from pipeline import build_chat_frame
+from tone import ToneClassifier
+
+KEYWORDS = pd.DataFrame({
+    'tone': ['joy', 'joy', 'anger', 'sadness'],
+    'word': ['jaja', 'fiesta', 'odio', 'triste'],
+})
+
+
+def test_disk_cache_round_trip(chat_path, tmp_path):
+    df = build_chat_frame(chat_path, ToneClassifier(KEYWORDS), 'lexicon')
+    cache = DiskChatCache(str(tmp_path))
+    key = ('0' * 64, '8', 'lexicon', 'abc')
+    cache.put(key, df, raw_length=123, name='chat.txt', tone='abc')
+
+    cached, meta = cache.get(key, tone='abc')
+    pd.testing.assert_frame_equal(cached, df)
+    assert meta == {'raw_length': 123, 'name': 'chat.txt', 'tone': 'abc'}
+    assert cache.metadata(key) == meta
+    assert key in cache.keys()
+
+
+def test_disk_cache_misses(chat_path, tmp_path):
+    df = build_chat_frame(chat_path, None, 'lexicon')
+    cache = DiskChatCache(str(tmp_path))
+    key = ('0' * 64, '8', 'lexicon', 'none')
+    cache.put(key, df, tone='none')
+
+    assert cache.get(key, tone='other') is None
+    assert cache.get(('1' * 64, '8', 'lexicon', 'none')) is None
@@ -0,0 +1,46 @@
+import pandas as pd
+import pytest
+
+from data_parser import iter_messages, parse_chat_text, read_chat
+from synthetic_chat import FORMATS, generate_chat
+
+
+@pytest.mark.parametrize('chat_format', sorted(FORMATS))
+def test_chunked_parse_matches_whole_file(tmp_path, chat_format):
+    path = tmp_path / 'chat.txt'
+    generate_chat(str(path), messages=2000, users=4, chat_format=chat_format, days=60, multiline=0.1, seed=2)
+    whole = parse_chat_text(path.read_text(encoding='utf-8'))
+    chunked = read_chat(str(path), chunk_bytes=4096)
+    assert len(whole) == 2000
+    pd.testing.assert_frame_equal(chunked, whole)
+    assert chunked.attrs['chat_format'] == whole.attrs['chat_format']
+
+
+def test_iter_messages_streams_every_message(chat_path):
+    with open(chat_path, encoding='utf-8') as f:
+        whole = parse_chat_text(f.read())
+    records = list(iter_messages(chat_path, chunk_bytes=1024))
+    assert records == list(zip(whole['datetime'], whole['user'], whole['message']))
+
+
+@pytest.mark.parametrize('text, expected', [
+    (
+        "Preámbulo\n12/01/2023, 10:00 - Ana: hola\n13/01/2023, 10:00 - Los mensajes están cifrados\n"
+        "14/01/2023, 11:05 - Luis: a: b\nsegunda línea\n\n15/01/2023, 09:00 - Ana:  \n"
+        "31/02/2023, 10:00 - Ana: fecha mala\n16/01/23, 10:00 - Ana: año corto\n"
+        "17/01/2023, 10:00 - Ana:sin espacio\n17/01/2023, 10:01 - : vacío\n",
+        [('2023-01-12 10:00', 'Ana', 'hola'), ('2023-01-14 11:05', 'Luis', 'a: b\nsegunda línea'),
+         ('2023-01-15 09:00', 'Ana', '')],
+    ),
+    (
+        "[1/2/22, 3:45:10 p. m.] Ana: hola\r\n‎[1/2/22, 3:46:00 PM] Luis: x\r\nsigue\r\n"
+        "[13/2/22, 12:00:00 a.m.] Ana: medianoche\n[1/2/22, 13:46:00 PM] Ana: hora mala\n",
+        [('2022-02-01 15:45:10', 'Ana', 'hola'), ('2022-02-01 15:46:00', 'Luis', 'x\nsigue'),
+         ('2022-02-13 00:00:00', 'Ana', 'medianoche')],
+    ),
+])
+def test_parse_chat_text_edge_cases(text, expected):
+    df = parse_chat_text(text)
+    assert list(zip(df['datetime'], df['user'], df['message'])) == [
+        (pd.Timestamp(stamp), user, message) for stamp, user, message in expected
+    ]
@@ -0,0 +1,41 @@
+import emoji
+import numpy as np
+import pandas as pd
+from urlextract import URLExtract
+
+from data_parser import read_chat
+from features import count_links, extract_emojis, message_features
+
+MESSAGES = [
+    "hola 😂😂 👍🏽", "🇪🇸🇫🇷", "👨‍👩‍👧‍👦 y #️⃣ 1️⃣", "❤ ❤️ ☺️ ©️ ™", "sin nada", "", "🏳️‍🌈🏴‍☠️", "🫶🏼👋🏿👋🏻",
+    "mira https://example.com/a?b=1 y www.test.es", "http://localhost:8501/", "HTTP://LOCALHOST/x",
+    "http://127.0.0.1:8000", "fin de frase. Otra", "correo a@b.com", "localhost sin esquema", "a.b", "   ", " dos  palabras\t", "a\xa0b\u202fc", "x\ny",
+]
+
+
+def messages(chat_path):
+    return pd.Series(MESSAGES + read_chat(chat_path)['message'].tolist())
+
+
+def test_extract_emojis_matches_emoji_list(chat_path):
+    texts = messages(chat_path)
+    emojis = extract_emojis(texts)
+    assert len(emojis) > 100
+    for i, text in enumerate(texts):
+        assert emojis[emojis.index == i].tolist() == [e['emoji'] for e in emoji.emoji_list(text)], text
+
+
+def test_count_links_matches_urlextract_on_every_row(chat_path):
+    texts = messages(chat_path)
+    extractor = URLExtract()
+    expected = np.array([len(extractor.find_urls(t)) for t in texts])
+    assert expected[MESSAGES.index("http://localhost:8501/")] == 1
+    np.testing.assert_array_equal(count_links(texts), expected)
+
+
+def test_message_features_columns(chat_path):
+    texts = messages(chat_path)
+    features = message_features(texts)
+    assert features['num_words'].tolist() == [len(t.split()) for t in texts]
+    assert features['num_chars'].tolist() == [len(t) for t in texts]
+    assert features['has_media'].sum() == texts.str.startswith('<Multimedia omitido>').sum()
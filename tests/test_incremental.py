@@ -0,0 +1,95 @@
+import numpy as np
+import pandas as pd
+
+import incremental
+from analytics import ActivityCube, DateRangeIndex, ToneCube
+from data_parser import detect_chat_format
+from pipeline import build_chat_dataset, update_chat_dataset
+from synthetic_chat import generate_chat
+from tone import ToneClassifier
+
+KEYWORDS = pd.DataFrame({
+    'tone': ['joy', 'joy', 'anger', 'sadness'],
+    'word': ['jaja', 'fiesta', 'odio', 'triste'],
+})
+
+
+def message_starts(raw):
+    """Byte offsets of the lines that start a message."""
+    stamp_pattern = detect_chat_format(raw.decode('utf-8')).stamp_pattern
+    starts, pos = [], 0
+    for line in raw.splitlines(keepends=True):
+        if stamp_pattern.match(line.decode('utf-8')):
+            starts.append(pos)
+        pos += len(line)
+    return starts
+
+
+def cut_at(raw, fraction):
+    """Offset of the first message that starts after fraction of raw."""
+    return next(start for start in message_starts(raw) if start >= len(raw) * fraction)
+
+
+def read_raw(path):
+    with open(path, 'rb') as f:
+        return f.read()
+
+
+def test_update_matches_full_build(chat_path):
+    raw = read_raw(chat_path)
+    cut = cut_at(raw, 0.8)
+    tone_classifier = ToneClassifier(KEYWORDS)
+    aggregates = [
+        ('date_index', DateRangeIndex, DateRangeIndex.append),
+        ('activity_cube', ActivityCube, ActivityCube.append),
+        ('tone_cube', ToneCube, ToneCube.append),
+    ]
+
+    previous = build_chat_dataset(raw[:cut], tone_classifier, 'lexicon', 'chat.txt')
+    for aggregate in aggregates:
+        previous.aggregate(*aggregate)
+    updated = update_chat_dataset(previous, raw, tone_classifier, 'lexicon', 'chat.txt')
+    full = build_chat_dataset(raw, tone_classifier, 'lexicon', 'chat.txt')
+
+    assert updated is not None and updated.appended == len(full.df) - len(previous.df) > 0
+    pd.testing.assert_frame_equal(updated.df, full.df)
+    for name, build, _ in aggregates:
+        # Carried over through append, not rebuilt
+        appended, rebuilt = updated._aggregates[name][0], full.aggregate(name, build)
+        if name == 'date_index':
+            np.testing.assert_array_equal(appended.datetimes, rebuilt.datetimes)
+            assert appended.totals(0, len(full.df)) == rebuilt.totals(0, len(full.df))
+        else:
+            pd.testing.assert_frame_equal(appended.cells, rebuilt.cells)
+
+
+def test_update_tolerates_edits_before_the_previous_end(chat_path):
+    raw = read_raw(chat_path)
+    starts = message_starts(raw)
+    cut = cut_at(raw, 0.8)
+    previous = build_chat_dataset(raw[:cut], None, 'lexicon', 'chat.txt')
+    full = build_chat_dataset(raw, None, 'lexicon', 'chat.txt')
+    new_rows = len(full.df) - len(previous.df)
+
+    # A message deleted shortly before the previous end, and an export window
+    # that starts a few messages later
+    deleted = starts.index(cut) - 50
+    edited = raw[:starts[deleted]] + raw[starts[deleted + 1]:]
+    later = raw[starts[10]:]
+    for reexport in (edited, later):
+        updated = update_chat_dataset(previous, reexport, None, 'lexicon', 'chat.txt')
+        assert updated is not None and updated.appended == new_rows
+        pd.testing.assert_frame_equal(updated.df.iloc[len(previous.df):].reset_index(drop=True),
+                                      full.df.iloc[len(previous.df):].reset_index(drop=True))
+
+
+def test_update_rejects_a_different_chat_with_one_bounded_parse(chat_path, tmp_path, monkeypatch):
+    other = tmp_path / 'other.txt'
+    generate_chat(str(other), messages=3500, users=5, days=120, seed=3)
+    previous = build_chat_dataset(read_raw(chat_path), None, 'lexicon', 'chat.txt')
+
+    parsed = []
+    read_chat = incremental.read_chat
+    monkeypatch.setattr(incremental, 'read_chat', lambda source, **kw: parsed.append(1) or read_chat(source, **kw))
+    assert update_chat_dataset(previous, other.read_bytes(), None, 'lexicon', 'chat.txt') is None
+    assert len(parsed) == 1
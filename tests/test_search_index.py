@@ -0,0 +1,65 @@
+import re
+
+import numpy as np
+import pandas as pd
+
+from data_parser import read_chat
+from search_index import ChatSearchIndex
+
+
+def has(*patterns):
+    """Brute-force filter: every pattern is found as whole words in the lowercased message."""
+    regexes = [re.compile(r'(?<!\w)' + p + r'(?!\w)') for p in patterns]
+    return lambda text: all(r.search(text) for r in regexes)
+
+
+# query -> the substring filter it should reproduce
+QUERIES = {
+    'noche': has('noche'),
+    'Paula': has('paula'),
+    'paula multimedia': lambda t: has('paula')(t) or has('multimedia')(t),
+    'que AND noche': has('que', 'noche'),
+    'paula OR sobre AND entre': lambda t: has('paula')(t) or has('sobre', 'entre')(t),
+    'cuan*': has(r'cuan\w*'),
+    '"multimedia omitido"': has(r'multimedia\W+omitido'),
+    '"de la"': has(r'de\W+la'),
+    'https://': has('https'),
+    'zzzz': has('zzzz'),
+}
+
+
+def brute_force(df, predicate, user=None, month=None):
+    keep = df['message'].astype(str).str.lower().map(predicate).to_numpy(dtype=bool).copy()
+    if user is not None:
+        keep &= (df['user'] == user).to_numpy()
+    if month is not None:
+        keep &= (df['datetime'].dt.to_period('M').astype(str) == month).to_numpy()
+    return np.flatnonzero(keep)
+
+
+def test_search_matches_substring_filtering(chat_path):
+    df = read_chat(chat_path)
+    cut = len(df) * 3 // 4
+    index = ChatSearchIndex(df)
+    appended = ChatSearchIndex(df.iloc[:cut]).append(df.iloc[cut:].reset_index(drop=True))
+    user, month = df['user'].iloc[0], '2022-02'
+
+    for query, predicate in QUERIES.items():
+        for filters in ({}, {'user': user}, {'month': month}, {'user': user, 'month': month}):
+            expected = brute_force(df, predicate, **filters)
+            docs, scores = index.search(query, **filters)
+            np.testing.assert_array_equal(np.sort(docs), expected, err_msg=f'{query} {filters}')
+            assert (np.diff(scores) <= 0).all()
+            again, _ = appended.search(query, **filters)
+            np.testing.assert_array_equal(again, docs, err_msg=f'{query} {filters} after append')
+
+        docs, _ = index.search(query, doc_range=(100, 2000))
+        expected = brute_force(df, predicate)
+        np.testing.assert_array_equal(np.sort(docs), expected[(expected >= 100) & (expected < 2000)])
+
+    assert len(index.search('noche')[0]) > 1000
+    assert not len(index.search('noche', user='Nadie')[0])
+    assert not len(index.search('')[0])
+    assert not len(ChatSearchIndex(pd.DataFrame({
+        'datetime': pd.to_datetime([]), 'user': [], 'message': []
+    })).search('noche')[0])
@@ -0,0 +1,40 @@
+import numpy as np
+import pandas as pd
+from textblob import TextBlob
+from textblob.sentiments import PatternAnalyzer
+
+from data_parser import read_chat
+from sentiment import SentimentScorer
+from synthetic_chat import generate_chat
+
+MESSAGES = [
+    "This is great!", "this  is   great!", "not bad at all", "I really hate Mondays", "", "   ",
+    "Very very good", "😂😂", "<Media omitted>", "great\nbut sad", "Qué bien, genial", "great",
+]
+
+
+def textblob_polarity(messages):
+    # The per-row call the app made before the scoring engine
+    return np.array([TextBlob(m, analyzer=PatternAnalyzer()).sentiment[0] for m in messages])
+
+
+def test_pattern_scores_match_textblob(tmp_path):
+    path = tmp_path / 'chat.txt'
+    generate_chat(str(path), messages=1500, users=4, locale='en', days=30, seed=5)
+    messages = MESSAGES + read_chat(str(path))['message'].tolist()
+    scorer = SentimentScorer('pattern', batch_size=100)
+
+    scores = scorer.score(pd.Series(messages, index=np.arange(len(messages)) * 2))
+    expected = textblob_polarity(messages)
+    assert (expected != 0).sum() > 50
+    np.testing.assert_allclose(scores.to_numpy(), expected)
+    assert scores.index.equals(pd.Index(np.arange(len(messages)) * 2))
+    # Second call is answered from the cache
+    np.testing.assert_allclose(scorer.score(messages).to_numpy(), expected)
+
+
+def test_cache_keeps_the_newest_entries():
+    scorer = SentimentScorer('pattern', max_entries=3)
+    scorer.score(MESSAGES)
+    assert len(scorer) == 3
+    np.testing.assert_allclose(scorer.score(MESSAGES).to_numpy(), textblob_polarity(MESSAGES))
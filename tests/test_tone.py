@@ -0,0 +1,56 @@
+import re
+from collections import defaultdict
+
+import pandas as pd
+from rapidfuzz import fuzz
+
+from data_parser import read_chat
+from tone import ToneClassifier
+
+KEYWORDS = pd.DataFrame({
+    'tone': ['alegria', 'alegria', 'alegria', 'enfado', 'tristeza', 'tristeza', 'fiesta', 'fiesta'],
+    'word': ['jaja', ' Genial', 'feliz', 'odio', 'triste', 'noche', 'fiest', 'jaja'],
+})
+
+MESSAGES = [
+    "jajaja qué genial", "JAJA", "odio los lunes", "estoy triste esta noche", "fiesta!!", "nada que ver",
+    "", "a", "genial genial triste triste", "feliz cumpleaños jaja", "Fiestaaa en casa",
+]
+
+
+def baseline_tones(messages, keywords_df, threshold=85):
+    # The nested loop the app ran per message before the match matrix
+    keywords_df = keywords_df.assign(tone=keywords_df['tone'].str.strip(),
+                                     word=keywords_df['word'].str.strip().str.lower())
+    tone_keywords = defaultdict(list)
+    for _, row in keywords_df.iterrows():
+        tone_keywords[row['tone']].append(row['word'])
+
+    def classify_tone_fuzzy(msg):
+        tokens = re.findall(r'\b\w{2,}\b', msg.lower())
+        matches = defaultdict(int)
+        for tone, words in tone_keywords.items():
+            for word in words:
+                for token in tokens:
+                    if fuzz.partial_ratio(token, word) >= threshold:
+                        matches[tone] += 1
+        return max(matches, key=matches.get) if matches else 'other'
+
+    return [classify_tone_fuzzy(m) for m in messages]
+
+
+def test_classify_matches_the_nested_fuzzy_loop(chat_path):
+    messages = MESSAGES + read_chat(chat_path)['message'].head(1500).tolist()
+    classifier = ToneClassifier(KEYWORDS)
+    assert classifier.classify(messages).tolist() == baseline_tones(messages, KEYWORDS)
+    # Second call served from the token cache
+    assert classifier.classify(messages).tolist() == baseline_tones(messages, KEYWORDS)
+
+
+def test_token_cache_is_bounded_and_holds_copies():
+    classifier = ToneClassifier(KEYWORDS, max_tokens=3)
+    expected = baseline_tones(MESSAGES, KEYWORDS)
+    assert classifier.classify(MESSAGES).tolist() == expected
+    assert len(classifier._token_tones) == 3
+    assert all(row.base is None for row in classifier._token_tones.values())
+    assert classifier.classify(MESSAGES).tolist() == expected
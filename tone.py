@@ -0,0 +1,121 @@
+import hashlib
+import os
+import threading
+from functools import lru_cache
+
+import numpy as np
+import pandas as pd
+from rapidfuzz import fuzz, process
+
+from profiling import profiled
+
+KEYWORDS_PATH = "data/emotion_keywords.csv"
+
+DEFAULT_THRESHOLD = 85
+
+# Vocabulary rows matched against the keyword list per cdist call
+CDIST_BATCH = 20000
+
+# Distinct tokens whose tone counts are kept between calls
+CACHE_MAX_TOKENS = 500_000
+
+TOKEN_PATTERN = r'\b\w{2,}\b'
+
+
+class ToneClassifier:
+    """Fuzzy tone labels from a keyword list, matched once per distinct token.
+
+    A message gets the tone with the most (token, keyword) pairs whose
+    partial_ratio reaches the threshold, ties going to the tone listed first in
+    the CSV, and 'other' when nothing matches.
+    """
+
+    def __init__(self, keywords_df, threshold=DEFAULT_THRESHOLD, max_tokens=CACHE_MAX_TOKENS):
+        keywords_df = keywords_df.assign(
+            tone=keywords_df['tone'].str.strip(),
+            word=keywords_df['word'].str.strip().str.lower(),
+        )
+        self.threshold = threshold
+        # Identifies the keyword list and threshold in cache keys: frames
+        # labelled with another list are never reused
+        digest = hashlib.blake2b(repr(threshold).encode(), digest_size=8)
+        digest.update(pd.util.hash_pandas_object(keywords_df[['tone', 'word']], index=False).to_numpy().tobytes())
+        self.fingerprint = digest.hexdigest()
+        self.tones = pd.unique(keywords_df['tone']).tolist()
+        # keyword x tone weights; a word listed twice for a tone counts twice
+        weights = pd.crosstab(keywords_df['word'], keywords_df['tone'])
+        weights = weights.reindex(columns=self.tones, fill_value=0)
+        self.keywords = weights.index.tolist()
+        self.weights = weights.to_numpy(dtype=np.int32)
+        self.max_tokens = max_tokens
+        self._token_tones = {}
+        self._lock = threading.Lock()
+
+    @profiled('tone:fuzzy')
+    def token_tones(self, vocab):
+        """(len(vocab), len(tones)) matrix of matching keyword counts, cached per token."""
+        result = np.zeros((len(vocab), len(self.tones)), dtype=np.int32)
+        missing = []
+        with self._lock:
+            for i, token in enumerate(vocab):
+                row = self._token_tones.get(token)
+                if row is None:
+                    missing.append(i)
+                else:
+                    result[i] = row
+        for start in range(0, len(missing), CDIST_BATCH):
+            rows = missing[start:start + CDIST_BATCH]
+            batch = [vocab[i] for i in rows]
+            scores = process.cdist(
+                batch, self.keywords, scorer=fuzz.partial_ratio,
+                score_cutoff=self.threshold, dtype=np.float32, workers=-1,
+            )
+            counts = (scores >= self.threshold).astype(np.int32) @ self.weights
+            result[rows] = counts
+            with self._lock:
+                # Copied rows: a view would keep the whole batch matrix alive
+                self._token_tones.update((token, row.copy()) for token, row in zip(batch, counts))
+        with self._lock:
+            # Oldest tokens go first once the cache is full
+            overflow = len(self._token_tones) - self.max_tokens
+            if overflow > 0:
+                for token in list(self._token_tones)[:overflow]:
+                    del self._token_tones[token]
+        return result
+
+    @profiled('tone')
+    def classify(self, messages):
+        messages = pd.Series(messages)
+        n = len(messages)
+        tokens = messages.astype(str).str.lower().str.findall(TOKEN_PATTERN)
+        tokens = tokens.reset_index(drop=True).explode().dropna()
+        codes, vocab = pd.factorize(tokens)
+        per_token = self.token_tones(vocab.tolist())[codes]
+
+        msg_ids = tokens.index.to_numpy()
+        counts = np.column_stack([
+            np.bincount(msg_ids, weights=per_token[:, t], minlength=n)
+            for t in range(len(self.tones))
+        ]) if self.tones else np.zeros((n, 0))
+
+        labels = np.asarray(self.tones + ['other'], dtype=object)
+        best = counts.argmax(axis=1) if self.tones else np.zeros(n, dtype=np.intp)
+        best[counts.sum(axis=1) == 0] = len(self.tones)
+        return pd.Series(labels[best], index=messages.index)
+
+
+def tone_fingerprint(tone_classifier):
+    """Cache key part for the tone labels: the classifier's fingerprint, or 'none' without one."""
+    return tone_classifier.fingerprint if tone_classifier is not None else 'none'
+
+
+@lru_cache(maxsize=4)
+def _load_classifier(path, mtime, threshold):
+    return ToneClassifier(pd.read_csv(path), threshold)
+
+
+def load_tone_classifier(path=KEYWORDS_PATH, threshold=DEFAULT_THRESHOLD):
+    """Classifier for the keyword CSV, built once per file version; None if it is missing."""
+    if not os.path.exists(path):
+        return None
+    return _load_classifier(path, os.path.getmtime(path), threshold)